@@ -5,4 +5,40 @@ from gravity_sim.simulation_runner import SimulationRunner
 def main():
     """Run program."""
     args = handle_cli()
-    SimulationRunner.run(args.config_file)
+    if args.command == "profile":
+        SimulationRunner.profile(
+            args.config_file,
+            steps=args.steps,
+            output=args.output,
+            force_only=args.force_only,
+            top=args.top,
+            precision=args.precision,
+            threads=args.threads,
+        )
+    elif args.replay:
+        SimulationRunner.replay(args.config_file)
+    elif args.headless:
+        SimulationRunner.run_headless(
+            args.config_file,
+            steps=args.steps,
+            seconds=args.seconds,
+            record_file=args.record,
+            record_every=args.record_every,
+            checkpoint_file=args.checkpoint,
+            checkpoint_every=args.checkpoint_every,
+            resume=args.resume,
+            precision=args.precision,
+            threads=args.threads,
+            metrics_file=args.metrics,
+            metrics_every=args.metrics_every,
+            diagnostics_file=args.diagnostics,
+            diagnostics_every=args.diagnostics_every,
+            diagnostics_exact_limit=args.diagnostics_exact_limit,
+        )
+    else:
+        SimulationRunner.run(
+            args.config_file,
+            precision=args.precision,
+            threads=args.threads,
+            steps_per_second=args.steps_per_second,
+        )
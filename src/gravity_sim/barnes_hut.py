@@ -0,0 +1,320 @@
+import math
+from typing import Optional
+
+import numpy as np
+
+from gravity_sim.direct import DirectEngine
+from gravity_sim.force_engine import ForceEngine
+from gravity_sim.linear_quadtree import LinearQuadTree
+
+
+class BarnesHutEngine(ForceEngine):
+    """Barnes-Hut force engine using a LinearQuadTree rebuilt on every evaluation. O(nlogn).
+
+    Two traversals are available. "body" walks the tree separately for each target body.
+    "group" walks the tree once per spatially compact group of bodies, building an interaction list of
+    accepted nodes and leaf bodies shared by the whole group, which is then evaluated with array math.
+    """
+
+    TRAVERSALS = ("body", "group")
+
+    def __init__(self, theta: float = 0.5, leaf_size: int = 8, traversal: str = "group", group_size: int = 32):
+        """Create a new Barnes-Hut engine.
+
+        Args:
+            theta (float, optional): Opening angle, nodes whose width / distance is below theta are
+                approximated by their center of mass. Defaults to 0.5.
+            leaf_size (int, optional): The maximum number of bodies in a leaf of the tree. Defaults to 8.
+            traversal (str, optional): The traversal to use, "body" or "group". Defaults to "group".
+            group_size (int, optional): The maximum number of bodies sharing a walk in the group traversal,
+                unless they share a leaf. Defaults to 32.
+
+        Raises:
+            ValueError: If the traversal is not recognised.
+        """
+        if traversal not in self.TRAVERSALS:
+            raise ValueError(f"Unknown traversal '{traversal}', expected one of {self.TRAVERSALS}.")
+        self.theta = theta
+        self.leaf_size = leaf_size
+        self.traversal = traversal
+        self.group_size = group_size
+
+    def build_tree(self, positions: np.ndarray, masses: np.ndarray) -> LinearQuadTree:
+        """Build the tree used for an evaluation and keep it as last_tree.
+
+        Args:
+            positions (np.ndarray): Positions of all bodies, shape (n, 2).
+            masses (np.ndarray): Masses of all bodies, shape (n,).
+
+        Returns:
+            LinearQuadTree: The new tree.
+        """
+        with self.metrics.timer("tree_build"):
+            self.last_tree = LinearQuadTree(positions, masses, leaf_size=self.leaf_size)
+        self.metrics.gauge("tree_depth", int(self.last_tree.levels[-1]))
+        return self.last_tree
+
+    def accelerations(
+        self,
+        positions: np.ndarray,
+        masses: np.ndarray,
+        grav_constant: float,
+        targets: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Compute the acceleration of the target bodies using the selected traversal.
+
+        Args:
+            positions (np.ndarray): Positions of all bodies, shape (n, 2).
+            masses (np.ndarray): Masses of all bodies, shape (n,).
+            grav_constant (float): The gravitational constant.
+            targets (Optional[np.ndarray], optional): Indices of the bodies to compute accelerations for.
+                Defaults to None for every body.
+
+        Returns:
+            np.ndarray: Accelerations of the targets in order, shape (len(targets), 2).
+        """
+        targets = self.resolve_targets(len(masses), targets)
+        return self.evaluate(self.prepare(positions, masses), positions, masses, grav_constant, targets)
+
+    def prepare(self, positions: np.ndarray, masses: np.ndarray) -> dict[str, np.ndarray]:
+        """Build the tree of all bodies, returning its arrays along with the groups of the group traversal.
+
+        The rank of every body along the tree's curve and the groups are found once here, so each call to
+        evaluate() only does work for its own targets, however many chunks the targets are split into.
+
+        Args:
+            positions (np.ndarray): Positions of all bodies, shape (n, 2).
+            masses (np.ndarray): Masses of all bodies, shape (n,).
+
+        Returns:
+            dict[str, np.ndarray]: The arrays of the tree, the ranks and the groups.
+        """
+        tree = self.build_tree(positions, masses)
+        prepared = tree.arrays()
+        prepared["ranks"] = np.empty_like(tree.order)
+        prepared["ranks"][tree.order] = np.arange(len(tree.order))
+        prepared["groups"] = tree.groups(self.group_size)
+        prepared["group_starts"] = tree.starts[prepared["groups"]]
+        return prepared
+
+    def evaluate(
+        self,
+        prepared: dict[str, np.ndarray],
+        positions: np.ndarray,
+        masses: np.ndarray,
+        grav_constant: float,
+        targets: np.ndarray,
+    ) -> np.ndarray:
+        """Compute the acceleration of the target bodies by walking the prepared tree.
+
+        Args:
+            prepared (dict[str, np.ndarray]): The arrays of the tree returned by prepare().
+            positions (np.ndarray): Positions of all bodies, shape (n, 2).
+            masses (np.ndarray): Masses of all bodies, shape (n,).
+            grav_constant (float): The gravitational constant.
+            targets (np.ndarray): Indices of the bodies to compute accelerations for.
+
+        Returns:
+            np.ndarray: Accelerations of the targets in order, shape (len(targets), 2).
+        """
+        tree = LinearQuadTree.from_arrays(prepared)
+        if self.traversal == "group":
+            result = self.group_walk(tree, prepared["ranks"][targets], prepared["groups"], prepared["group_starts"])
+        else:
+            walker = _TreeWalker(tree, self.theta)
+            result = np.array([walker.walk(x, y) for x, y in positions[targets].tolist()]).reshape(-1, 2)
+            self.metrics.count("nodes_visited", walker.nodes_visited)
+            self.metrics.count("interactions", walker.interactions)
+        result *= grav_constant
+        return result
+
+    def locality_order(self, prepared: dict[str, np.ndarray], targets: np.ndarray) -> np.ndarray:
+        """Return an order of the targets along the tree's Morton curve, so groups stay together.
+
+        Args:
+            prepared (dict[str, np.ndarray]): The arrays of the tree returned by prepare().
+            targets (np.ndarray): Indices of the target bodies.
+
+        Returns:
+            np.ndarray: Indices into targets.
+        """
+        return np.argsort(prepared["ranks"][targets], kind="stable")
+
+    def group_walk(
+        self, tree: LinearQuadTree, target_ranks: np.ndarray, groups: np.ndarray, group_starts: np.ndarray
+    ) -> np.ndarray:
+        """Compute accelerations by walking the tree once for each group containing a target.
+
+        Only the targets and their groups are touched, so the cost does not grow with the number of bodies.
+
+        Args:
+            tree (LinearQuadTree): The tree of all bodies.
+            target_ranks (np.ndarray): Positions of the targets in the tree's sorted arrays.
+            groups (np.ndarray): Indices of the group nodes, in order of their body ranges.
+            group_starts (np.ndarray): The start of each group's body range.
+
+        Returns:
+            np.ndarray: Accelerations of the targets without the gravitational constant, shape (len(targets), 2).
+        """
+        group_ids = np.searchsorted(group_starts, target_ranks, side="right") - 1
+        by_group = np.argsort(group_ids, kind="stable")
+        target_groups, firsts = np.unique(group_ids[by_group], return_index=True)
+        bounds = np.append(firsts, len(by_group)).tolist()
+        accelerations = np.empty((len(target_ranks), 2), dtype=tree.positions.dtype)
+        for group, first, last in zip(groups[target_groups].tolist(), bounds[:-1], bounds[1:]):
+            members = by_group[first:last]
+            sources, source_masses = self.interaction_list(tree, group)
+            self.metrics.count("interactions", len(sources) * len(members))
+            accelerations[members] = DirectEngine.tile_accelerations(
+                tree.positions[target_ranks[members]], sources, source_masses
+            )
+        return accelerations
+
+    def potentials(self, positions: np.ndarray, masses: np.ndarray, grav_constant: float) -> np.ndarray:
+        """Compute the gravitational potential at every body, walking the tree once for each group.
+
+        Args:
+            positions (np.ndarray): Positions of all bodies as floats, shape (n, 2).
+            masses (np.ndarray): Masses of all bodies, shape (n,).
+            grav_constant (float): The gravitational constant.
+
+        Returns:
+            np.ndarray: The potential energy per unit mass of each body, shape (n,).
+        """
+        tree = self.build_tree(positions, masses)
+        sorted_potentials = np.zeros(len(masses), dtype=positions.dtype)
+        for group in tree.groups(self.group_size).tolist():
+            start, end = tree.starts[group], tree.ends[group]
+            sources, source_masses = self.interaction_list(tree, group)
+            self.metrics.count("interactions", len(sources) * (end - start))
+            sorted_potentials[start:end] = DirectEngine.tile_potentials(
+                tree.positions[start:end], sources, source_masses
+            )
+        result = np.empty_like(sorted_potentials)
+        result[tree.order] = sorted_potentials
+        result *= grav_constant
+        return result
+
+    def interaction_list(self, tree: LinearQuadTree, group: int) -> tuple[np.ndarray, np.ndarray]:
+        """Walk the tree for a group, returning the positions and masses of everything acting on it.
+
+        Nodes are accepted when far enough from the group's bounding box, otherwise they are opened
+        and the bodies of opened leaves are interacted with directly. The walk proceeds a level at a time.
+
+        Args:
+            tree (LinearQuadTree): The tree of all bodies.
+            group (int): Index of the group node.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Positions and masses of accepted nodes and leaf bodies.
+        """
+        start, end = tree.starts[group], tree.ends[group]
+        lower, upper = tree.lower[group], tree.upper[group]
+        accepted = []
+        leaves = []
+        visited = 0
+        frontier = np.zeros(1, dtype=np.intp)
+        while len(frontier):
+            visited += len(frontier)
+            centers_of_mass = tree.centers_of_mass[frontier]
+            gap = np.maximum(0, np.maximum(lower - centers_of_mass, centers_of_mass - upper))
+            distance = np.maximum(np.hypot(gap[:, 0], gap[:, 1]), 1)
+            # Nodes containing the group always overlap it, but are checked so its own mass is never used
+            contains_group = (tree.starts[frontier] <= start) & (tree.ends[frontier] >= end)
+            far = ~contains_group & (tree.half_widths[frontier] * 2 / distance < self.theta)
+            accepted.append(frontier[far])
+            near = frontier[~far]
+            is_leaf = tree.child_counts[near] == 0
+            leaves.append(near[is_leaf])
+            frontier = tree.expand_children(near[~is_leaf])
+
+        accepted = np.concatenate(accepted)
+        leaves = np.concatenate(leaves)
+        bodies = tree.expand_ranges(tree.starts[leaves], tree.ends[leaves] - tree.starts[leaves])
+        sources = np.concatenate((tree.centers_of_mass[accepted], tree.positions[bodies]))
+        source_masses = np.concatenate((tree.node_masses[accepted], tree.masses[bodies]))
+        self.metrics.count("nodes_visited", visited)
+        return sources, source_masses
+
+
+class _TreeWalker:
+    """Per-body tree traversal using the tree's arrays converted to lists, avoiding NumPy scalar overhead."""
+
+    def __init__(self, tree: LinearQuadTree, theta: float):
+        """Prepare a tree for walking.
+
+        Args:
+            tree (LinearQuadTree): The tree to walk.
+            theta (float): The opening angle.
+        """
+        self.theta = theta
+        self.starts = tree.starts.tolist()
+        self.ends = tree.ends.tolist()
+        self.child_starts = tree.child_starts.tolist()
+        self.child_counts = tree.child_counts.tolist()
+        self.widths = (tree.half_widths * 2).tolist()
+        self.node_masses = tree.node_masses.tolist()
+        self.centers_of_mass = tree.centers_of_mass.tolist()
+        self.positions = tree.positions.tolist()
+        self.masses = tree.masses.tolist()
+        self.nodes_visited = 0
+        self.interactions = 0
+
+    def walk(self, x: float, y: float) -> tuple[float, float]:
+        """Return the acceleration at a point, without the gravitational constant.
+
+        Args:
+            x (float): X position of the point.
+            y (float): Y position of the point.
+
+        Returns:
+            tuple[float, float]: The acceleration at the point.
+        """
+        ax = ay = 0.0
+        visited = interactions = 0
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            visited += 1
+            count = self.child_counts[node]
+            if count == 0:
+                interactions += self.ends[node] - self.starts[node]
+                for index in range(self.starts[node], self.ends[node]):
+                    dx, dy = self.pull(x, y, self.positions[index], self.masses[index])
+                    ax += dx
+                    ay += dy
+                continue
+            center_of_mass = self.centers_of_mass[node]
+            distance = max(math.dist((x, y), center_of_mass), 1)
+            if self.widths[node] / distance < self.theta:
+                interactions += 1
+                dx, dy = self.pull(x, y, center_of_mass, self.node_masses[node])
+                ax += dx
+                ay += dy
+            else:
+                # Not far away enough, explore children
+                stack.extend(range(self.child_starts[node], self.child_starts[node] + count))
+        self.nodes_visited += visited
+        self.interactions += interactions
+        return ax, ay
+
+    @staticmethod
+    def pull(x: float, y: float, position: list[float], mass: float) -> tuple[float, float]:
+        """Return the acceleration at a point due to a single mass, without the gravitational constant.
+
+        Args:
+            x (float): X position of the point.
+            y (float): Y position of the point.
+            position (list[float]): Position of the mass.
+            mass (float): The mass.
+
+        Returns:
+            tuple[float, float]: The acceleration, zero if the mass is at the point.
+        """
+        dx = position[0] - x
+        dy = position[1] - y
+        sqr_distance = dx * dx + dy * dy
+        if sqr_distance == 0:
+            return 0.0, 0.0
+        weight = mass / (sqr_distance * math.sqrt(sqr_distance))
+        return weight * dx, weight * dy
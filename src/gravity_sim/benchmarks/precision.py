@@ -0,0 +1,187 @@
+import time
+from argparse import ArgumentParser
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from gravity_sim.config_loader import ConfigLoader
+from gravity_sim.diagnostics import Diagnostics
+from gravity_sim.precision import Precision
+from gravity_sim.simulation import Simulation
+from gravity_sim.state import BodyState
+
+
+@dataclass
+class PrecisionResult:
+    """Throughput and accuracy of one precision backend over a run."""
+
+    precision: str
+    steps: int
+    wall_seconds: float
+    energy_drift: float
+    position_error: float = 0.0
+
+    @property
+    def steps_per_second(self) -> float:
+        """The number of steps completed per second of wall time."""
+        if self.wall_seconds == 0:
+            return float("inf")
+        return self.steps / self.wall_seconds
+
+    def meets(self, max_energy_drift: float, max_position_error: float) -> bool:
+        """Return True if the drift and error are within the given limits.
+
+        Args:
+            max_energy_drift (float): The maximum relative energy drift.
+            max_position_error (float): The maximum position error relative to the size of the system.
+
+        Returns:
+            bool: True if both limits are met.
+        """
+        return self.energy_drift <= max_energy_drift and self.position_error <= max_position_error
+
+
+def total_energy(state: BodyState, grav_constant: float) -> float:
+    """Return the total kinetic and potential energy of a state, computed in float64.
+
+    Args:
+        state (BodyState): The state of the bodies.
+        grav_constant (float): The gravitational constant.
+
+    Returns:
+        float: The total energy in joules.
+    """
+    # Always summed exactly, so the drift measures the integration rather than a tree approximation
+    return Diagnostics.from_state(state, grav_constant, exact_limit=len(state)).total_energy
+
+
+def run_precision(
+    config_file: str, precision: str, steps: int, engine: Optional[str] = None
+) -> tuple[PrecisionResult, np.ndarray]:
+    """Run a simulation for a number of steps with one precision backend.
+
+    Args:
+        config_file (str): The config file to load the simulation from.
+        precision (str): The precision backend to use.
+        steps (int): The number of steps to run.
+        engine (Optional[str], optional): Force engine to use instead of the config's. Defaults to None.
+
+    Returns:
+        tuple[PrecisionResult, np.ndarray]: The result, without a position error, and the final positions as float64.
+    """
+    simulation: Simulation = ConfigLoader.load_file(config_file)
+    if engine:
+        simulation.engine = engine
+    simulation.set_precision(precision)
+    grav_constant = float(simulation.grav_constant)
+    start_energy = total_energy(simulation.state, grav_constant)
+
+    wall_start = time.perf_counter()
+    for _ in range(steps):
+        simulation.step()
+    wall_seconds = time.perf_counter() - wall_start
+
+    end_energy = total_energy(simulation.state, grav_constant)
+    result = PrecisionResult(
+        precision=precision,
+        steps=steps,
+        wall_seconds=wall_seconds,
+        energy_drift=abs((end_energy - start_energy) / start_energy) if start_energy else 0.0,
+    )
+    return result, np.asarray(simulation.state.positions, dtype=np.float64)
+
+
+def benchmark_precisions(
+    config_file: str, steps: int, precisions: tuple[str, ...] = Precision.NAMES, engine: Optional[str] = "direct"
+) -> list[PrecisionResult]:
+    """Run a simulation with each precision backend and compare them.
+
+    Position errors are measured against the first precision in Precision.NAMES that was run, so against
+    decimal when it is included, relative to the size of the system.
+
+    Args:
+        config_file (str): The config file to load the simulation from.
+        steps (int): The number of steps to run each backend for.
+        precisions (tuple[str, ...], optional): The backends to compare. Defaults to all of them.
+        engine (Optional[str], optional): Force engine to use, None for the config's. Defaults to "direct"
+            so the results measure the arithmetic rather than an approximation.
+
+    Returns:
+        list[PrecisionResult]: The result of each backend, in the order given.
+    """
+    runs = {precision: run_precision(config_file, precision, steps, engine) for precision in precisions}
+    reference = next(name for name in Precision.NAMES if name in runs)
+    reference_positions = runs[reference][1]
+    size = max(float(np.max(np.abs(reference_positions))), np.finfo(np.float64).tiny)
+
+    results = []
+    for result, positions in runs.values():
+        result.position_error = float(np.max(np.abs(positions - reference_positions))) / size
+        results.append(result)
+    return results
+
+
+def fastest_within(
+    results: list[PrecisionResult], max_energy_drift: float, max_position_error: float
+) -> Optional[PrecisionResult]:
+    """Return the fastest result meeting the accuracy limits.
+
+    Args:
+        results (list[PrecisionResult]): The results to choose from.
+        max_energy_drift (float): The maximum relative energy drift.
+        max_position_error (float): The maximum relative position error.
+
+    Returns:
+        Optional[PrecisionResult]: The fastest result within the limits, or None if none are.
+    """
+    passing = [result for result in results if result.meets(max_energy_drift, max_position_error)]
+    return max(passing, key=lambda result: result.steps_per_second, default=None)
+
+
+def format_results(results: list[PrecisionResult]) -> str:
+    """Return the results as a text table.
+
+    Args:
+        results (list[PrecisionResult]): The results to format.
+
+    Returns:
+        str: One row per result.
+    """
+    lines = [f"{'precision':<10} {'steps/s':>10} {'energy drift':>13} {'position error':>15}"]
+    for result in results:
+        lines.append(
+            f"{result.precision:<10} {result.steps_per_second:>10.2f} "
+            f"{result.energy_drift:>13.3e} {result.position_error:>15.3e}"
+        )
+    return "\n".join(lines)
+
+
+def main(args: Optional[list[str]] = None) -> None:
+    """Run the precision benchmark from the command line.
+
+    Args:
+        args (Optional[list[str]], optional): Command line arguments. Defaults to None for sys.argv.
+    """
+    parser = ArgumentParser(description="Compare the speed and accuracy of the precision backends.")
+    parser.add_argument("config_file", nargs="?", default="saves/solar_system.yaml", help="The config to run.")
+    parser.add_argument("--steps", type=int, default=500, help="The number of steps to run each backend for.")
+    parser.add_argument("--precisions", nargs="+", choices=Precision.NAMES, default=list(Precision.NAMES))
+    parser.add_argument("--engine", default="direct", help="The force engine to use.")
+    parser.add_argument("--max-energy-drift", type=float, default=1e-6, help="Accuracy bar for energy drift.")
+    parser.add_argument(
+        "--max-position-error", type=float, default=1e-6, help="Accuracy bar for relative position error."
+    )
+    args = parser.parse_args(args)
+
+    results = benchmark_precisions(args.config_file, args.steps, tuple(args.precisions), args.engine)
+    print(format_results(results))
+    best = fastest_within(results, args.max_energy_drift, args.max_position_error)
+    if best is None:
+        print("No precision meets the accuracy bar.")
+    else:
+        print(f"Fastest precision within the accuracy bar: {best.precision}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,471 @@
+import json
+import math
+import platform
+import sys
+import time
+from argparse import ArgumentParser
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import numpy as np
+
+from gravity_sim.force_engine import ForceEngine
+from gravity_sim.linear_quadtree import LinearQuadTree
+from gravity_sim.simulation import Simulation
+from gravity_sim.state import BodyState
+
+ENGINES = ("barnes_hut", "direct", "fmm", "pm")
+SIZES = (10, 100, 1_000, 10_000, 100_000, 1_000_000)
+PHASES = ("build", "force", "integrate", "step")
+FORMAT_VERSION = 1
+
+
+@dataclass
+class PhaseResult:
+    """Wall times of repeated runs of one phase, for one engine and number of bodies."""
+
+    engine: str
+    bodies: int
+    phase: str
+    samples: list[float] = field(default_factory=list)
+
+    @property
+    def key(self) -> tuple[str, int, str]:
+        """The engine, number of bodies and phase, identifying the result across runs."""
+        return self.engine, self.bodies, self.phase
+
+    @property
+    def median(self) -> float:
+        """The median wall time in seconds."""
+        return float(np.median(self.samples))
+
+    @property
+    def minimum(self) -> float:
+        """The shortest wall time in seconds."""
+        return min(self.samples)
+
+    @property
+    def maximum(self) -> float:
+        """The longest wall time in seconds."""
+        return max(self.samples)
+
+    def to_dict(self) -> dict:
+        """Return the result as a dictionary that can be written as JSON."""
+        return {
+            "engine": self.engine,
+            "bodies": self.bodies,
+            "phase": self.phase,
+            "median": self.median,
+            "min": self.minimum,
+            "max": self.maximum,
+            "samples": self.samples,
+        }
+
+    @classmethod
+    def from_dict(cls, dictionary: dict) -> "PhaseResult":
+        """Return a result read from JSON.
+
+        Args:
+            dictionary (dict): A dictionary written by to_dict().
+
+        Returns:
+            PhaseResult: The result.
+        """
+        return cls(dictionary["engine"], dictionary["bodies"], dictionary["phase"], list(dictionary["samples"]))
+
+
+@dataclass
+class Comparison:
+    """The change in one phase's wall time between a baseline and the current run."""
+
+    baseline: PhaseResult
+    current: PhaseResult
+    threshold: float
+
+    @property
+    def ratio(self) -> float:
+        """The current median time divided by the baseline median time."""
+        if self.baseline.median == 0:
+            return float("inf") if self.current.median else 1.0
+        return self.current.median / self.baseline.median
+
+    @property
+    def regression(self) -> bool:
+        """True if the phase got slower by more than the threshold and every run was slower than the baseline's."""
+        return self.ratio > 1 + self.threshold and self.current.minimum > self.baseline.maximum
+
+    @property
+    def improvement(self) -> bool:
+        """True if the phase got faster by more than the threshold and every run was faster than the baseline's."""
+        return self.ratio < 1 / (1 + self.threshold) and self.current.maximum < self.baseline.minimum
+
+
+class _FixedEngine(ForceEngine):
+    """Returns precomputed accelerations, so integration can be timed without force evaluation."""
+
+    def __init__(self, accelerations: np.ndarray):
+        self.fixed = accelerations
+
+    def accelerations(
+        self,
+        positions: np.ndarray,
+        masses: np.ndarray,
+        grav_constant: float,
+        targets: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        return self.fixed.copy() if targets is None else self.fixed[targets]
+
+
+def generate_scenario(
+    num_bodies: int,
+    engine: str = "barnes_hut",
+    integrator: str = "euler",
+    seed: int = 0,
+) -> Simulation:
+    """Return a galaxy of bodies in circular orbits around a central star, like saves/galaxy.yaml.
+
+    Orbital radii are spread exponentially, so the bodies are densest near the star and trees built over
+    them are unbalanced like those of real simulations.
+
+    Args:
+        num_bodies (int): The number of bodies, including the star.
+        engine (str, optional): The force engine. Defaults to "barnes_hut".
+        integrator (str, optional): The integrator. Defaults to "euler".
+        seed (int, optional): Seed for the random positions. Defaults to 0.
+
+    Returns:
+        Simulation: The simulation, with one substep per step.
+    """
+    rng = np.random.default_rng(seed)
+    star_mass = 1.989e30
+    radii = 1e11 + rng.exponential(1e11, num_bodies - 1)
+    angles = rng.uniform(0, 2 * math.pi, num_bodies - 1)
+    speeds = np.sqrt(6.6743e-11 * star_mass / radii)
+    directions = np.column_stack((np.cos(angles), np.sin(angles)))
+    positions = np.vstack(([0.0, 0.0], radii[:, np.newaxis] * directions))
+    velocities = np.vstack(([0.0, 0.0], speeds[:, np.newaxis] * directions[:, ::-1] * [-1, 1]))
+    masses = np.concatenate(([star_mass], np.full(num_bodies - 1, 5.972e24)))
+    state = BodyState(positions, velocities, masses)
+    names = ["Sun"] + [f"Body_{index}" for index in range(1, num_bodies)]
+    colors = np.full((num_bodies, 3), 255, dtype=np.uint8)
+    return Simulation.from_state(
+        f"Scaling {num_bodies}", 200_000, 1, state, names, colors, engine=engine, integrator=integrator
+    )
+
+
+def build_phase(simulation: Simulation) -> Optional[Callable[[], None]]:
+    """Return a function building the tree the simulation's engine uses, or None if it does not use one.
+
+    Args:
+        simulation (Simulation): The simulation.
+
+    Returns:
+        Optional[Callable[[], None]]: Builds a new tree each call.
+    """
+    positions, masses = simulation.state.positions, simulation.state.masses
+    match simulation.engine:
+        case "barnes_hut" | "linear_barnes_hut" | "fmm":
+            leaf_size = simulation.force_engine.leaf_size
+            return lambda: LinearQuadTree(positions, masses, leaf_size=leaf_size)
+    return None
+
+
+def integrate_phase(simulation: Simulation) -> Callable[[], None]:
+    """Return a function stepping the simulation with fixed accelerations, timing only the integrator.
+
+    Args:
+        simulation (Simulation): The simulation.
+
+    Returns:
+        Callable[[], None]: Steps the simulation once.
+    """
+    fixed = _FixedEngine(simulation.calc_accelerations())
+
+    def integrate() -> None:
+        force_engine = simulation.force_engine
+        simulation.force_engine = fixed
+        try:
+            simulation.step()
+        finally:
+            simulation.force_engine = force_engine
+
+    return integrate
+
+
+def time_phase(function: Callable[[], object], repeats: int) -> list[float]:
+    """Return the wall time of each of a number of calls to a function.
+
+    Args:
+        function (Callable[[], object]): The function to time.
+        repeats (int): The number of calls.
+
+    Returns:
+        list[float]: The wall time of each call in seconds.
+    """
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def benchmark_engine(engine: str, num_bodies: int, repeats: int = 3, integrator: str = "euler") -> list[PhaseResult]:
+    """Time each phase of a step for one engine and number of bodies.
+
+    Args:
+        engine (str): The force engine.
+        num_bodies (int): The number of bodies.
+        repeats (int, optional): The number of times to run each phase. Defaults to 3.
+        integrator (str, optional): The integrator. Defaults to "euler".
+
+    Returns:
+        list[PhaseResult]: The result of each phase, the build phase is left out for engines without a tree.
+    """
+    simulation = generate_scenario(num_bodies, engine, integrator)
+    phases = {
+        "build": build_phase(simulation),
+        "force": simulation.calc_accelerations,
+        "integrate": integrate_phase(simulation),
+        "step": simulation.step,
+    }
+    return [
+        PhaseResult(engine, num_bodies, phase, time_phase(function, repeats))
+        for phase, function in phases.items()
+        if function is not None
+    ]
+
+
+def scaling_exponent(results: list[PhaseResult], engine: str, phase: str = "step") -> Optional[float]:
+    """Return the exponent k of the best fit of time ~ n^k for one engine and phase.
+
+    Sizes below 1000 bodies are left out when there are enough larger ones, as fixed overheads dominate them.
+
+    Args:
+        results (list[PhaseResult]): The results to fit.
+        engine (str): The engine.
+        phase (str, optional): The phase. Defaults to "step".
+
+    Returns:
+        Optional[float]: The exponent, or None if fewer than two sizes were run.
+    """
+    points = sorted(
+        (result.bodies, result.median) for result in results if (result.engine, result.phase) == (engine, phase)
+    )
+    large = [point for point in points if point[0] >= 1000]
+    points = large if len(large) >= 2 else points
+    if len(points) < 2:
+        return None
+    sizes, seconds = np.log(np.array(points)).T
+    return float(np.polyfit(sizes, seconds, 1)[0])
+
+
+def predict_seconds(results: list[PhaseResult], engine: str, num_bodies: int) -> Optional[float]:
+    """Return an estimate of the step time of an engine for a number of bodies, from its smaller runs.
+
+    The step time is extrapolated from the largest size run, with the exponent measured between the two
+    largest sizes but never below linear.
+
+    Args:
+        results (list[PhaseResult]): The results so far.
+        engine (str): The engine.
+        num_bodies (int): The number of bodies.
+
+    Returns:
+        Optional[float]: The estimated seconds per step, or None if the engine has not been run.
+    """
+    points = sorted(
+        (result.bodies, result.median) for result in results if (result.engine, result.phase) == (engine, "step")
+    )
+    if not points:
+        return None
+    bodies, seconds = points[-1]
+    exponent = 1.0
+    if len(points) >= 2 and points[-2][1] > 0:
+        exponent = max(exponent, math.log(seconds / points[-2][1]) / math.log(bodies / points[-2][0]))
+    return seconds * (num_bodies / bodies) ** exponent
+
+
+def benchmark_scaling(
+    engines: tuple[str, ...] = ENGINES,
+    sizes: tuple[int, ...] = SIZES,
+    repeats: int = 3,
+    max_seconds: float = 30.0,
+    integrator: str = "euler",
+    log: Optional[Callable[[str], None]] = None,
+) -> list[PhaseResult]:
+    """Time every phase of a step for each engine over a range of sizes.
+
+    Each engine runs the sizes in increasing order and stops once its step time for the next size is
+    expected to exceed max_seconds, so the quadratic engines do not run for hours at the largest sizes.
+
+    Args:
+        engines (tuple[str, ...], optional): The engines to run. Defaults to all of them.
+        sizes (tuple[int, ...], optional): The numbers of bodies. Defaults to 10 to 1,000,000.
+        repeats (int, optional): The number of times to run each phase. Defaults to 3.
+        max_seconds (float, optional): The longest expected step time to run. Defaults to 30.
+        integrator (str, optional): The integrator. Defaults to "euler".
+        log (Optional[Callable[[str], None]], optional): Called with a line of progress. Defaults to None.
+
+    Returns:
+        list[PhaseResult]: The result of every phase run.
+    """
+    results = []
+    for engine in engines:
+        # Warm up imports and caches, so they are not counted in the first size's times
+        benchmark_engine(engine, 10, 1, integrator)
+        for num_bodies in sorted(sizes):
+            predicted = predict_seconds(results, engine, num_bodies)
+            if predicted is not None and predicted > max_seconds:
+                if log:
+                    log(f"{engine} skipped from {num_bodies} bodies, expected {predicted:.1f}s per step")
+                break
+            results.extend(benchmark_engine(engine, num_bodies, repeats, integrator))
+            if log:
+                log(f"{engine} {num_bodies} bodies done")
+    return results
+
+
+def save_results(results: list[PhaseResult], path: str, repeats: int) -> None:
+    """Write results to a JSON file, along with a description of the machine they were measured on.
+
+    Args:
+        results (list[PhaseResult]): The results.
+        path (str): The file to write.
+        repeats (int): The number of times each phase was run.
+    """
+    document = {
+        "version": FORMAT_VERSION,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "repeats": repeats,
+        "results": [result.to_dict() for result in results],
+    }
+    with open(path, "w") as file:
+        json.dump(document, file, indent=2)
+
+
+def load_results(path: str) -> list[PhaseResult]:
+    """Read results written by save_results().
+
+    Args:
+        path (str): The file to read.
+
+    Raises:
+        ValueError: If the file was written by an unsupported version.
+
+    Returns:
+        list[PhaseResult]: The results.
+    """
+    with open(path) as file:
+        document = json.load(file)
+    if document.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported benchmark results version {document.get('version')} in '{path}'.")
+    return [PhaseResult.from_dict(result) for result in document["results"]]
+
+
+def compare(results: list[PhaseResult], baseline: list[PhaseResult], threshold: float = 0.1) -> list[Comparison]:
+    """Compare results to a baseline, for every phase run in both.
+
+    A change is only significant if the median moved by more than the threshold and the runs do not
+    overlap, so noise between repeats is not reported as a regression.
+
+    Args:
+        results (list[PhaseResult]): The current results.
+        baseline (list[PhaseResult]): The baseline results.
+        threshold (float, optional): The relative change in the median that is significant. Defaults to 0.1.
+
+    Returns:
+        list[Comparison]: One comparison per phase, in the order of the current results.
+    """
+    baselines = {result.key: result for result in baseline}
+    return [Comparison(baselines[result.key], result, threshold) for result in results if result.key in baselines]
+
+
+def format_results(results: list[PhaseResult], comparisons: Optional[list[Comparison]] = None) -> str:
+    """Return the results as a text table, with one row per engine and size and the scaling of each engine.
+
+    Args:
+        results (list[PhaseResult]): The results.
+        comparisons (Optional[list[Comparison]], optional): Comparisons to a baseline, significant changes
+            are marked next to the phase. Defaults to None.
+
+    Returns:
+        str: The table.
+    """
+    marks = {}
+    for comparison in comparisons or []:
+        if comparison.regression or comparison.improvement:
+            sign = "+" if comparison.regression else "-"
+            marks[comparison.current.key] = f"{sign}{abs(comparison.ratio - 1):.0%}"
+
+    rows = {}
+    for result in results:
+        rows.setdefault((result.engine, result.bodies), {})[result.phase] = result
+    lines = [f"{'engine':<18} {'bodies':>9}" + "".join(f" {phase + ' (s)':>20}" for phase in PHASES)]
+    for (engine, bodies), phases in rows.items():
+        cells = []
+        for phase in PHASES:
+            result = phases.get(phase)
+            cell = "-" if result is None else f"{result.median:.4g} {marks.get(result.key, '')}".rstrip()
+            cells.append(f" {cell:>20}")
+        lines.append(f"{engine:<18} {bodies:>9}" + "".join(cells))
+
+    for engine in dict.fromkeys(result.engine for result in results):
+        exponent = scaling_exponent(results, engine)
+        if exponent is not None:
+            lines.append(f"{engine} step time grows as n^{exponent:.2f}")
+    return "\n".join(lines)
+
+
+def main(args: Optional[list[str]] = None) -> None:
+    """Run the scaling benchmark from the command line, exiting with status 1 if any phase regressed.
+
+    Args:
+        args (Optional[list[str]], optional): Command line arguments. Defaults to None for sys.argv.
+    """
+    parser = ArgumentParser(description="Time each force engine over a range of simulation sizes.")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(SIZES), help="The numbers of bodies to run.")
+    parser.add_argument("--repeats", type=int, default=3, help="The number of times to run each phase.")
+    parser.add_argument(
+        "--max-seconds", type=float, default=30.0, help="Skip sizes expected to take longer than this per step."
+    )
+    parser.add_argument("--integrator", default="euler", help="The integrator to step with.")
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="Compare the results to a JSON file written by --output.")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="The relative slowdown of the median reported as a regression."
+    )
+    args = parser.parse_args(args)
+    if args.repeats < 1 or any(size < 1 for size in args.sizes):
+        parser.error("--repeats and --sizes must be positive.")
+
+    results = benchmark_scaling(
+        tuple(args.engines),
+        tuple(args.sizes),
+        args.repeats,
+        args.max_seconds,
+        args.integrator,
+        log=lambda line: print(line, file=sys.stderr),
+    )
+    if args.output:
+        save_results(results, args.output, args.repeats)
+
+    comparisons = compare(results, load_results(args.baseline), args.threshold) if args.baseline else None
+    print(format_results(results, comparisons))
+    regressions = [comparison for comparison in comparisons or [] if comparison.regression]
+    for comparison in regressions:
+        engine, bodies, phase = comparison.current.key
+        print(
+            f"Regression: {engine} {phase} with {bodies} bodies took {comparison.current.median:.4g}s, "
+            f"baseline {comparison.baseline.median:.4g}s"
+        )
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
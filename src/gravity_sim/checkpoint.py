@@ -0,0 +1,187 @@
+import json
+import os
+from decimal import Decimal
+
+import numpy as np
+
+from gravity_sim.random_factory import RandomFactory
+from gravity_sim.simulation import Simulation
+from gravity_sim.state import BodyState
+
+# Fixed size header at the start of every checkpoint file, followed by JSON metadata and the body arrays.
+HEADER_DTYPE = np.dtype([("magic", "S8"), ("version", "<u4"), ("reserved", "<u4"), ("metadata_length", "<u8")])
+MAGIC = b"GRAVCKPT"
+VERSION = 1
+ALIGNMENT = 64
+
+
+class Checkpoint:
+    """Saves and loads the full state of a simulation in a compact binary format.
+
+    The file holds a fixed header, JSON metadata for the scalar settings and the random number generator,
+    then the positions, velocities, masses, colors and names as raw arrays at 64 byte aligned offsets,
+    so loading is a handful of reads however many bodies there are. Decimal precision states are stored
+    as text so they are restored exactly.
+    """
+
+    @staticmethod
+    def _arrays(simulation: Simulation) -> dict[str, np.ndarray]:
+        """Return the arrays to store for a simulation, in file order.
+
+        Args:
+            simulation (Simulation): The simulation to save.
+
+        Returns:
+            dict[str, np.ndarray]: Little endian arrays keyed by name.
+        """
+        state = simulation.state
+        return {
+            "positions": Checkpoint._encode(state.positions),
+            "velocities": Checkpoint._encode(state.velocities),
+            "masses": Checkpoint._encode(state.masses),
+            "colors": np.ascontiguousarray(simulation.colors, dtype=np.uint8),
+            "names": np.frombuffer("\0".join(simulation.names).encode("utf-8"), dtype=np.uint8),
+        }
+
+    @staticmethod
+    def _encode(array: np.ndarray) -> np.ndarray:
+        """Return a state array ready to be written, as little endian floats or Decimal text.
+
+        Args:
+            array (np.ndarray): An array of the state.
+
+        Returns:
+            np.ndarray: The array to write, uint8 text for Decimal arrays.
+        """
+        if array.dtype == object:
+            return np.frombuffer("\0".join(str(value) for value in array.flat).encode("utf-8"), dtype=np.uint8)
+        return array.astype(array.dtype.newbyteorder("<"), copy=False)
+
+    @staticmethod
+    def _decode(array: np.ndarray, is_decimal: bool) -> np.ndarray:
+        """Return a state array read from a file, reversing _encode().
+
+        Args:
+            array (np.ndarray): The array read from the file.
+            is_decimal (bool): True if the array holds Decimal text.
+
+        Returns:
+            np.ndarray: The state array.
+        """
+        if not is_decimal:
+            return array
+        text = array.tobytes().decode("utf-8")
+        return np.array([Decimal(value) for value in text.split("\0")] if text else [], dtype=object)
+
+    @staticmethod
+    def save(simulation: Simulation, filename: str) -> None:
+        """Save a simulation to a checkpoint file.
+
+        The file is written next to the destination and moved into place, so a crash while saving
+        never leaves a partial checkpoint behind.
+
+        Args:
+            simulation (Simulation): The simulation to save.
+            filename (str): The file to write.
+        """
+        arrays = Checkpoint._arrays(simulation)
+        metadata = {
+            "name": simulation.name,
+            "description": simulation.description,
+            "timestep": str(simulation.timestep),
+            "steps": simulation.steps,
+            "theta": simulation.theta,
+            "precision": simulation.precision.name,
+            "integrator": simulation.integrator_name,
+            "integrator_options": simulation.integrator_options,
+            "grav_constant": str(simulation.grav_constant),
+            "engine": simulation.engine,
+            "engine_options": simulation.engine_options,
+            "processes": simulation.processes,
+            "threads": simulation.threads,
+            "time": simulation.time,
+            "step_count": simulation.step_count,
+            "num_bodies": simulation.get_num_objects(),
+            "random_state": RandomFactory.get_state(),
+            "arrays": {},
+        }
+        # Array offsets are relative to the first 64 byte boundary after the metadata
+        offset = 0
+        for key, array in arrays.items():
+            metadata["arrays"][key] = {"offset": offset, "dtype": array.dtype.str, "count": array.size}
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        encoded = json.dumps(metadata).encode("utf-8")
+        data_offset = -(-(HEADER_DTYPE.itemsize + len(encoded)) // ALIGNMENT) * ALIGNMENT
+
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header[0] = (MAGIC, VERSION, 0, len(encoded))
+        temp_filename = f"{filename}.tmp"
+        with open(temp_filename, "wb") as file:
+            file.write(header.tobytes())
+            file.write(encoded)
+            for key, array in arrays.items():
+                file.seek(data_offset + metadata["arrays"][key]["offset"])
+                file.write(array.tobytes())
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_filename, filename)
+
+    @staticmethod
+    def load(filename: str) -> Simulation:
+        """Load a simulation from a checkpoint file, restoring the random number generator.
+
+        Args:
+            filename (str): The file to read.
+
+        Raises:
+            ValueError: If the file is not a checkpoint of a supported version.
+
+        Returns:
+            Simulation: The simulation, exactly as it was saved.
+        """
+        with open(filename, "rb") as file:
+            header = np.frombuffer(file.read(HEADER_DTYPE.itemsize), dtype=HEADER_DTYPE)
+            if len(header) == 0 or header[0]["magic"] != MAGIC:
+                raise ValueError(f"{filename} is not a checkpoint file.")
+            if header[0]["version"] != VERSION:
+                raise ValueError(f"Unsupported checkpoint version {header[0]['version']} in {filename}.")
+            metadata = json.loads(file.read(int(header[0]["metadata_length"])).decode("utf-8"))
+            data_offset = -(-(HEADER_DTYPE.itemsize + int(header[0]["metadata_length"])) // ALIGNMENT) * ALIGNMENT
+
+            arrays = {}
+            for key, info in metadata["arrays"].items():
+                file.seek(data_offset + info["offset"])
+                arrays[key] = np.fromfile(file, dtype=info["dtype"], count=info["count"])
+
+        if metadata["random_state"] is not None:
+            version, internal_state, gauss_next = metadata["random_state"]
+            RandomFactory.set_state((version, tuple(internal_state), gauss_next))
+
+        names = arrays["names"].tobytes().decode("utf-8").split("\0") if metadata["num_bodies"] else []
+        precision = metadata["precision"]
+        is_decimal = precision == "decimal"
+        state = BodyState(
+            *(Checkpoint._decode(arrays[key], is_decimal) for key in ("positions", "velocities", "masses")),
+            precision=precision,
+        )
+        simulation = Simulation.from_state(
+            name=metadata["name"],
+            timestep=Decimal(metadata["timestep"]),
+            steps=metadata["steps"],
+            state=state,
+            names=names,
+            colors=arrays["colors"].reshape(-1, 3),
+            grav_constant=Decimal(metadata["grav_constant"]),
+            description=metadata["description"],
+            engine=metadata["engine"],
+            engine_options=metadata["engine_options"],
+            theta=metadata["theta"],
+            precision=precision,
+            integrator=metadata["integrator"],
+            integrator_options=metadata["integrator_options"],
+            processes=metadata.get("processes", 0),
+            threads=metadata.get("threads", 0),
+        )
+        simulation.time = metadata["time"]
+        simulation.step_count = metadata["step_count"]
+        return simulation
@@ -1,12 +1,172 @@
+import sys
 from argparse import Namespace, ArgumentParser
+from pathlib import Path
+from typing import Optional
 
+from gravity_sim.diagnostics import EXACT_LIMIT
+from gravity_sim.precision import Precision
 
-def handle_cli() -> Namespace:
+
+def handle_cli(argv: Optional[list[str]] = None) -> Namespace:
     """Return the command line arguments passed to the script.
 
+    Arguments starting with "profile" are parsed by handle_profile_cli().
+
+    Args:
+        argv (Optional[list[str]], optional): The arguments. Defaults to None for sys.argv.
+
     Returns:
-        Namespace: Namespace containing the command line arguments.
+        Namespace: Namespace containing the command line arguments, with the command run as "command".
     """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["profile"]:
+        return handle_profile_cli(argv[1:])
     parser = ArgumentParser()
+    parser.set_defaults(command="run")
+    parser.add_argument(
+        "config_file", type=str, help="The yaml file to load config from, or trajectory file to play with --replay."
+    )
+    parser.add_argument("--replay", action="store_true", help="Play back a recorded trajectory file.")
+    parser.add_argument("--headless", action="store_true", help="Run without a window as fast as possible.")
+    duration = parser.add_mutually_exclusive_group()
+    duration.add_argument("--steps", type=int, help="The number of steps to run in headless mode.")
+    duration.add_argument("--seconds", type=float, help="The number of simulated seconds to run in headless mode.")
+    parser.add_argument("--record", type=str, help="Record the trajectory to this file in headless mode.")
+    parser.add_argument("--record-every", type=int, default=1, help="Record a frame every this many steps.")
+    parser.add_argument("--checkpoint", type=str, help="Save checkpoints to this .ckpt file in headless mode.")
+    parser.add_argument("--checkpoint-every", type=int, default=1000, help="Save a checkpoint every this many steps.")
+    parser.add_argument("--resume", action="store_true", help="Resume from the --checkpoint file if it exists.")
+    parser.add_argument(
+        "--metrics", type=str, help="Export timings and counters to this JSON-lines file in headless mode."
+    )
+    parser.add_argument("--metrics-every", type=int, default=100, help="Export metrics every this many steps.")
+    parser.add_argument(
+        "--diagnostics", type=str, help="Log energy, momentum and angular momentum drift to this JSON-lines file."
+    )
+    parser.add_argument(
+        "--diagnostics-every",
+        type=int,
+        default=100,
+        help="Sample diagnostics every this many steps. Each sample sums the potential energy of every pair of "
+        "objects, O(n^2), for up to --diagnostics-exact-limit objects, costing about as much as a step at the "
+        "limit, and approximates it with a tree for more.",
+    )
+    parser.add_argument(
+        "--diagnostics-exact-limit",
+        type=int,
+        default=EXACT_LIMIT,
+        help="The most objects to sum the potential energy of exactly when sampling diagnostics. Defaults to "
+        f"{EXACT_LIMIT}, raise it for more accurate energy drift at a higher cost.",
+    )
+    parser.add_argument(
+        "--steps-per-second",
+        type=float,
+        help="The most steps to run each second in a window, stepping separately from drawing. Defaults to 60, "
+        "0 for no limit.",
+    )
+    parser.add_argument(
+        "--precision",
+        choices=Precision.NAMES,
+        help="The arithmetic backend to simulate with, overriding the config file.",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        help="The number of threads to calculate forces on, replacing worker processes from the config file. "
+        "0 keeps the config's worker processes, if any, and otherwise uses the main thread.",
+    )
+    args = parser.parse_args(argv)
+    check_run_args(parser, args)
+    return args
+
+
+def check_run_args(parser: ArgumentParser, args: Namespace) -> None:
+    """Exit with an error if the arguments to run a simulation are inconsistent.
+
+    Args:
+        parser (ArgumentParser): The parser, used to report errors.
+        args (Namespace): The parsed arguments.
+    """
+    if args.headless and args.steps is None and args.seconds is None:
+        parser.error("--headless requires --steps or --seconds.")
+    headless_only = ("steps", "seconds", "record", "checkpoint", "metrics", "diagnostics")
+    if not args.headless and any(getattr(args, option) is not None for option in headless_only):
+        parser.error(
+            "--steps, --seconds, --record, --checkpoint, --metrics and --diagnostics can only be used with "
+            "--headless. Open a checkpoint file as the config file to continue it in a window."
+        )
+    check_mode_args(parser, args)
+    for option in ("threads", "steps_per_second"):
+        if (getattr(args, option) or 0) < 0:
+            parser.error(f"--{option.replace('_', '-')} cannot be negative.")
+    if args.diagnostics_exact_limit < 0:
+        parser.error("--diagnostics-exact-limit cannot be negative.")
+    for option in ("record_every", "metrics_every", "diagnostics_every", "checkpoint_every"):
+        if getattr(args, option) < 1:
+            parser.error(f"--{option.replace('_', '-')} must be at least 1.")
+    if args.resume and not args.checkpoint:
+        parser.error("--resume requires --checkpoint.")
+    if args.checkpoint is not None and not args.checkpoint.endswith(".ckpt"):
+        parser.error("--checkpoint should end in .ckpt so the checkpoint can be opened as a config file.")
+
+
+def check_mode_args(parser: ArgumentParser, args: Namespace) -> None:
+    """Exit with an error if options are used in a mode that ignores them.
+
+    Args:
+        parser (ArgumentParser): The parser, used to report errors.
+        args (Namespace): The parsed arguments.
+    """
+    if args.replay and args.headless:
+        parser.error("--replay cannot be used with --headless.")
+    if args.replay and args.precision:
+        parser.error("--precision cannot be used with --replay.")
+    if args.replay and args.threads is not None:
+        parser.error("--threads cannot be used with --replay.")
+    if args.steps_per_second is not None and (args.headless or args.replay):
+        parser.error("--steps-per-second cannot be used with --headless or --replay.")
+
+
+def handle_profile_cli(argv: list[str]) -> Namespace:
+    """Return the arguments of the profile command.
+
+    Args:
+        argv (list[str]): The arguments after "profile".
+
+    Returns:
+        Namespace: Namespace containing the command line arguments, with "profile" as "command".
+    """
+    parser = ArgumentParser(
+        prog="gravity-sim profile", description="Run a fixed number of headless steps under cProfile."
+    )
+    parser.set_defaults(command="profile")
     parser.add_argument("config_file", type=str, help="The yaml file to load config from.")
-    return parser.parse_args()
+    parser.add_argument("--steps", type=int, default=100, help="The number of steps to profile.")
+    parser.add_argument("--force-only", action="store_true", help="Only profile force evaluation.")
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Path of the .pstats and .collapsed files without the extension. Defaults to the config's name.",
+    )
+    parser.add_argument("--top", type=int, default=20, help="The number of functions to print, 0 for none.")
+    parser.add_argument(
+        "--precision",
+        choices=Precision.NAMES,
+        help="The arithmetic backend to simulate with, overriding the config file.",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        help="The number of threads to calculate forces on, replacing worker processes from the config file. "
+        "0 keeps the config's worker processes, if any, and otherwise uses the main thread.",
+    )
+    args = parser.parse_args(argv)
+    if args.steps < 1:
+        parser.error("--steps must be at least 1.")
+    if args.top < 0:
+        parser.error("--top cannot be negative.")
+    if args.threads is not None and args.threads < 0:
+        parser.error("--threads cannot be negative.")
+    if args.output is None:
+        args.output = Path(args.config_file).stem
+    return args
@@ -6,6 +6,7 @@ from typing import Union
 
 from yaml import CSafeLoader, load
 
+from gravity_sim.checkpoint import Checkpoint
 from gravity_sim.random_factory import RandomFactory
 from gravity_sim.simulation import Simulation
 
@@ -125,15 +126,17 @@ class ConfigLoader:
         """Return a simulation object loaded from the data in the given file.
 
         Args:
-            filename (str): The filename, should end in .yaml or .yml.
+            filename (str): The filename, should end in .yaml, .yml or .ckpt.
 
         Returns:
             Simulation: A Simulation object with the loaded data.
         """
         if re.search(r".*\.ya?ml", filename):
             return ConfigLoader.from_yaml(filename)
+        if filename.endswith(".ckpt"):
+            return Checkpoint.load(filename)
 
-        raise ValueError(f"Unable to load data from {filename}: File should be .y(a)ml.")
+        raise ValueError(f"Unable to load data from {filename}: File should be .y(a)ml or .ckpt.")
 
     @staticmethod
     def from_yaml(filename: str) -> Simulation:
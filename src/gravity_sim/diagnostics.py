@@ -0,0 +1,235 @@
+import json
+import os
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+
+from gravity_sim.barnes_hut import BarnesHutEngine
+from gravity_sim.direct import DirectEngine
+from gravity_sim.state import BodyState
+
+if TYPE_CHECKING:
+    from gravity_sim.simulation import Simulation
+
+# Potentials of up to this many bodies are summed exactly, larger systems use a Barnes-Hut tree, which is
+# faster from about this many bodies on
+EXACT_LIMIT = 1024
+
+
+@dataclass
+class Diagnostics:
+    """Conserved quantities of a simulation at one moment, in SI units."""
+
+    step: int
+    time: float
+    kinetic_energy: float
+    potential_energy: float
+    momentum: tuple[float, float]
+    angular_momentum: float
+    # Sums of the magnitudes of each body's momentum and angular momentum, the scales drifts are measured against
+    momentum_scale: float
+    angular_momentum_scale: float
+
+    @property
+    def total_energy(self) -> float:
+        """The kinetic plus potential energy."""
+        return self.kinetic_energy + self.potential_energy
+
+    def drift(self, reference: "Diagnostics") -> dict[str, float]:
+        """Return the relative change in each conserved quantity since a reference sample.
+
+        Energy and angular momentum are relative to their reference values, or to the reference scale if
+        those are zero. Momentum is relative to the reference momentum scale, as the total is often zero.
+
+        Args:
+            reference (Diagnostics): The sample to measure from, usually the first.
+
+        Returns:
+            dict[str, float]: The energy, momentum and angular momentum drift.
+        """
+        energy_scale = abs(reference.total_energy) or abs(reference.kinetic_energy) + abs(reference.potential_energy)
+        momentum_change = np.hypot(*np.subtract(self.momentum, reference.momentum))
+        angular_scale = abs(reference.angular_momentum) or reference.angular_momentum_scale
+        return {
+            "energy_drift": relative(self.total_energy - reference.total_energy, energy_scale),
+            "momentum_drift": relative(float(momentum_change), reference.momentum_scale),
+            "angular_momentum_drift": relative(self.angular_momentum - reference.angular_momentum, angular_scale),
+        }
+
+    @classmethod
+    def from_state(
+        cls,
+        state: BodyState,
+        grav_constant: float,
+        step: int = 0,
+        time: float = 0.0,
+        theta: float = 0.5,
+        exact_limit: int = EXACT_LIMIT,
+    ) -> "Diagnostics":
+        """Return the conserved quantities of a state, computed in float64 with array math.
+
+        Angular momentum is measured around the origin.
+
+        Args:
+            state (BodyState): The state of the bodies.
+            grav_constant (float): The gravitational constant.
+            step (int, optional): The step the state is from. Defaults to 0.
+            time (float, optional): The simulated time the state is from. Defaults to 0.0.
+            theta (float, optional): Opening angle of the tree for large systems. Defaults to 0.5.
+            exact_limit (int, optional): The most bodies to sum the potential of exactly. Defaults to EXACT_LIMIT.
+
+        Returns:
+            Diagnostics: The sample.
+        """
+        positions = np.asarray(state.positions, dtype=np.float64)
+        velocities = np.asarray(state.velocities, dtype=np.float64)
+        masses = np.asarray(state.masses, dtype=np.float64)
+        momenta = velocities * masses[:, np.newaxis]
+        angular_momenta = positions[:, 0] * momenta[:, 1] - positions[:, 1] * momenta[:, 0]
+        momentum = momenta.sum(axis=0)
+        return cls(
+            step=step,
+            time=time,
+            kinetic_energy=float(0.5 * np.sum(momenta * velocities)),
+            potential_energy=potential_energy(positions, masses, grav_constant, theta, exact_limit),
+            momentum=(float(momentum[0]), float(momentum[1])),
+            angular_momentum=float(angular_momenta.sum()),
+            momentum_scale=float(np.hypot(momenta[:, 0], momenta[:, 1]).sum()),
+            angular_momentum_scale=float(np.abs(angular_momenta).sum()),
+        )
+
+    def to_dict(self) -> dict:
+        """Return the sample as a dictionary that can be written as JSON."""
+        dictionary = asdict(self)
+        dictionary["momentum"] = list(self.momentum)
+        dictionary["total_energy"] = self.total_energy
+        return dictionary
+
+    @classmethod
+    def from_dict(cls, dictionary: dict) -> "Diagnostics":
+        """Return a sample read from JSON.
+
+        Args:
+            dictionary (dict): A dictionary written by to_dict().
+
+        Returns:
+            Diagnostics: The sample.
+        """
+        return cls(
+            step=dictionary["step"],
+            time=dictionary["time"],
+            kinetic_energy=dictionary["kinetic_energy"],
+            potential_energy=dictionary["potential_energy"],
+            momentum=tuple(dictionary["momentum"]),
+            angular_momentum=dictionary["angular_momentum"],
+            momentum_scale=dictionary["momentum_scale"],
+            angular_momentum_scale=dictionary["angular_momentum_scale"],
+        )
+
+
+def relative(change: float, scale: float) -> float:
+    """Return a change relative to a scale, or the change itself if the scale is zero."""
+    return change / scale if scale else change
+
+
+def potential_energy(
+    positions: np.ndarray, masses: np.ndarray, grav_constant: float, theta: float = 0.5, exact_limit: int = EXACT_LIMIT
+) -> float:
+    """Return the total gravitational potential energy of a set of bodies.
+
+    Systems of up to exact_limit bodies are summed exactly in O(n^2), larger ones are approximated with a
+    Barnes-Hut tree in O(nlogn).
+
+    Args:
+        positions (np.ndarray): Positions of the bodies as float64, shape (n, 2).
+        masses (np.ndarray): Masses of the bodies as float64, shape (n,).
+        grav_constant (float): The gravitational constant.
+        theta (float, optional): Opening angle of the tree. Defaults to 0.5.
+        exact_limit (int, optional): The most bodies to sum exactly. Defaults to EXACT_LIMIT.
+
+    Returns:
+        float: The potential energy in joules.
+    """
+    if len(masses) < 2:
+        return 0.0
+    if len(masses) <= exact_limit:
+        potentials = DirectEngine().potentials(positions, masses, grav_constant)
+    else:
+        potentials = BarnesHutEngine(theta=theta).potentials(positions, masses, grav_constant)
+    # Every pair is counted once from each side
+    return float(0.5 * np.dot(masses, potentials))
+
+
+def measure(simulation: "Simulation", exact_limit: int = EXACT_LIMIT) -> Diagnostics:
+    """Return the conserved quantities of a simulation's current state.
+
+    Args:
+        simulation (Simulation): The simulation.
+        exact_limit (int, optional): The most bodies to sum the potential of exactly, larger systems use a
+            tree with the simulation's theta. Defaults to EXACT_LIMIT.
+
+    Returns:
+        Diagnostics: The sample.
+    """
+    return Diagnostics.from_state(
+        simulation.state,
+        float(simulation.grav_constant),
+        step=simulation.step_count,
+        time=simulation.time,
+        theta=simulation.theta,
+        exact_limit=exact_limit,
+    )
+
+
+class DiagnosticsLog:
+    """Appends samples of a simulation's conserved quantities and their drift to a JSON-lines file.
+
+    Drift is measured from the first sample in the file, so a resumed run appending to its original
+    log keeps measuring from the start of the original run.
+    """
+
+    def __init__(self, filename: str, append: bool = False, exact_limit: int = EXACT_LIMIT):
+        """Open a diagnostics log.
+
+        Args:
+            filename (str): The file to write.
+            append (bool, optional): Add to an existing file instead of replacing it, for resumed runs.
+                Defaults to False.
+            exact_limit (int, optional): The most bodies to sum the potential of exactly. Defaults to EXACT_LIMIT.
+        """
+        self.filename = filename
+        self.exact_limit = exact_limit
+        self.reference: Optional[Diagnostics] = None
+        if append and os.path.exists(filename):
+            with open(filename) as file:
+                first = file.readline()
+            if first.strip():
+                self.reference = Diagnostics.from_dict(json.loads(first))
+        self.file = open(filename, "a" if append else "w")
+        self.sample_count = 0
+        self.last: Optional[Diagnostics] = None
+
+    def sample(self, simulation: "Simulation") -> Diagnostics:
+        """Measure the simulation and write the sample with its drift from the first sample.
+
+        Args:
+            simulation (Simulation): The simulation to measure.
+
+        Returns:
+            Diagnostics: The sample.
+        """
+        diagnostics = measure(simulation, self.exact_limit)
+        if self.reference is None:
+            self.reference = diagnostics
+        record = diagnostics.to_dict()
+        record.update(diagnostics.drift(self.reference))
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        self.sample_count += 1
+        self.last = diagnostics
+        return diagnostics
+
+    def close(self) -> None:
+        """Close the file."""
+        self.file.close()
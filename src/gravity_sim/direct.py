@@ -0,0 +1,118 @@
+from decimal import Decimal
+from typing import Optional
+
+import numpy as np
+
+from gravity_sim.force_engine import ForceEngine
+
+
+class DirectEngine(ForceEngine):
+    """Exact all-pairs force engine using broadcast array math. O(n^2).
+
+    Targets are processed in tiles so only a (tile_size, n) block of pairwise values exists at once.
+    """
+
+    def __init__(self, tile_size: int = 256):
+        """Create a new direct summation engine.
+
+        Args:
+            tile_size (int, optional): Number of target bodies evaluated per tile. Defaults to 256.
+
+        Raises:
+            ValueError: If tile_size is not positive.
+        """
+        if tile_size < 1:
+            raise ValueError(f"Tile size must be positive, got {tile_size}.")
+        self.tile_size = tile_size
+
+    def accelerations(
+        self,
+        positions: np.ndarray,
+        masses: np.ndarray,
+        grav_constant: float,
+        targets: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Compute the acceleration of the target bodies due to every body.
+
+        Coincident bodies, including each body with itself, exert no force on each other.
+
+        Args:
+            positions (np.ndarray): Positions of all bodies, shape (n, 2).
+            masses (np.ndarray): Masses of all bodies, shape (n,).
+            grav_constant (float): The gravitational constant.
+            targets (Optional[np.ndarray], optional): Indices of the bodies to compute accelerations for.
+                Defaults to None for every body.
+
+        Returns:
+            np.ndarray: Accelerations of the targets in order, shape (len(targets), 2).
+        """
+        targets = self.resolve_targets(len(masses), targets)
+        self.metrics.count("interactions", len(targets) * len(masses))
+        result = np.empty((len(targets), 2), dtype=positions.dtype)
+        for start in range(0, len(targets), self.tile_size):
+            tile = targets[start : start + self.tile_size]
+            result[start : start + len(tile)] = self.tile_accelerations(positions[tile], positions, masses)
+        result *= grav_constant
+        return result
+
+    def potentials(self, positions: np.ndarray, masses: np.ndarray, grav_constant: float) -> np.ndarray:
+        """Compute the gravitational potential at every body due to every other body.
+
+        Args:
+            positions (np.ndarray): Positions of all bodies as floats, shape (n, 2).
+            masses (np.ndarray): Masses of all bodies, shape (n,).
+            grav_constant (float): The gravitational constant.
+
+        Returns:
+            np.ndarray: The potential energy per unit mass of each body, shape (n,).
+        """
+        result = np.empty(len(masses), dtype=positions.dtype)
+        for start in range(0, len(masses), self.tile_size):
+            result[start : start + self.tile_size] = self.tile_potentials(
+                positions[start : start + self.tile_size], positions, masses
+            )
+        result *= grav_constant
+        return result
+
+    @staticmethod
+    def tile_potentials(tile_positions: np.ndarray, positions: np.ndarray, masses: np.ndarray) -> np.ndarray:
+        """Compute the potential at a tile of target positions, without the gravitational constant.
+
+        Args:
+            tile_positions (np.ndarray): Positions of the targets in the tile as floats, shape (t, 2).
+            positions (np.ndarray): Positions of the source bodies, shape (n, 2).
+            masses (np.ndarray): Masses of the source bodies, shape (n,).
+
+        Returns:
+            np.ndarray: Potentials divided by the gravitational constant, shape (t,).
+        """
+        distance = np.hypot(
+            positions[np.newaxis, :, 0] - tile_positions[:, 0, np.newaxis],
+            positions[np.newaxis, :, 1] - tile_positions[:, 1, np.newaxis],
+        )
+        # Coincident pairs, including each body with itself, add nothing
+        distance[distance == 0] = np.inf
+        return -(masses / distance).sum(axis=1)
+
+    @staticmethod
+    def tile_accelerations(tile_positions: np.ndarray, positions: np.ndarray, masses: np.ndarray) -> np.ndarray:
+        """Compute the accelerations of a tile of target positions, without the gravitational constant.
+
+        Works with any precision, the result has the dtype of the positions.
+
+        Args:
+            tile_positions (np.ndarray): Positions of the targets in the tile, shape (t, 2).
+            positions (np.ndarray): Positions of the source bodies, shape (n, 2).
+            masses (np.ndarray): Masses of the source bodies, shape (n,).
+
+        Returns:
+            np.ndarray: Accelerations divided by the gravitational constant, shape (t, 2).
+        """
+        dx = positions[np.newaxis, :, 0] - tile_positions[:, 0, np.newaxis]
+        dy = positions[np.newaxis, :, 1] - tile_positions[:, 1, np.newaxis]
+        sqr_distance = dx * dx + dy * dy
+        # Coincident pairs get an infinite distance and so zero weight, Decimal raises on division by zero
+        sqr_distance[sqr_distance == 0] = Decimal("Infinity") if sqr_distance.dtype == object else np.inf
+        # Dividing twice keeps the intermediate values within the range of float32
+        weights = masses / sqr_distance / np.sqrt(sqr_distance)
+        return np.stack(((weights * dx).sum(axis=1), (weights * dy).sum(axis=1)), axis=1)
@@ -0,0 +1,306 @@
+from math import comb
+import numpy as np
+
+from gravity_sim.force_engine import SolverEngine
+from gravity_sim.linear_quadtree import LinearQuadTree
+
+
+class FMMEngine(SolverEngine):
+    """Fast multipole method force engine on a LinearQuadTree. O(n).
+
+    Positions are complex numbers z = x + iy. The potential of a mass, -m / |z - w|, is not harmonic in
+    the plane so it has no expansion in z alone, but it factors as (z - w)^(-1/2) (z̄ - w̄)^(-1/2) and each
+    factor has a binomial series. Expansions are therefore matrices of coefficients of z^k z̄^l:
+
+    - Multipole: M[k, l] = sum m (w - c)^k conj(w - c)^l for the bodies w of a node centered at c.
+    - Local: phi(t + v) = sum L[n, m] v^n conj(v)^m around the center t of a node.
+
+    Because of the factorisation, translating or converting an expansion is a matrix on each side,
+    for example L = A M conj(A)^T, which is evaluated for many nodes at once with batched matmuls.
+    A dual tree traversal pairs nodes, well separated pairs interact through their expansions and
+    pairs of nearby leaves through direct summation. The error falls as roughly theta^(order + 1).
+    """
+
+    # The number of body pairs, or expansions, processed at once to bound the memory used
+    BATCH_SIZE = 1 << 16
+
+    def __init__(self, theta: float = 0.5, order: int = 6, leaf_size: int = 16):
+        """Create a new fast multipole method engine.
+
+        Args:
+            theta (float, optional): Nodes interact through their expansions when the sum of their radii
+                divided by the distance between their centers is below theta. Defaults to 0.5.
+            order (int, optional): The highest power of z and z̄ in the expansions. Defaults to 6.
+            leaf_size (int, optional): The maximum number of bodies in a leaf of the tree. Defaults to 16.
+
+        Raises:
+            ValueError: If theta is not between 0 and 1 or order is negative.
+        """
+        if not 0 < theta < 1:
+            raise ValueError(f"Theta must be between 0 and 1, got {theta}.")
+        if order < 0:
+            raise ValueError(f"Order must not be negative, got {order}.")
+        self.theta = theta
+        self.order = order
+        self.leaf_size = leaf_size
+
+        powers = np.arange(order + 1)
+        # Coefficients of the series (1 - x)^(-1/2) = sum a_k x^k
+        self._series = np.array([comb(2 * k, k) / 4**k for k in powers])
+        # binom(-k - 1/2, n), the coefficients of (1 + x)^(-k - 1/2)
+        half_binomials = np.ones((order + 1, order + 1))
+        for n in powers[1:]:
+            half_binomials[:, n] = half_binomials[:, n - 1] * -(powers + n - 0.5) / n
+        # Multipole to local conversion, T[n, k] = a_k binom(-k - 1/2, n) D^(-k - n)
+        self._conversion = self._series[np.newaxis, :] * half_binomials.T
+        self._binomials = np.array([[comb(k, i) for i in powers] for k in powers], dtype=np.float64)
+        self._shift_powers = np.subtract.outer(powers, powers).clip(0)
+
+    def solve(self, positions: np.ndarray, masses: np.ndarray) -> np.ndarray:
+        """Compute the acceleration of every body, without the gravitational constant.
+
+        Args:
+            positions (np.ndarray): Positions of all bodies, shape (n, 2).
+            masses (np.ndarray): Masses of all bodies, shape (n,).
+
+        Returns:
+            np.ndarray: The accelerations, shape (n, 2), with the dtype of the positions.
+        """
+        with self.metrics.timer("tree_build"):
+            tree = LinearQuadTree(positions, masses, leaf_size=self.leaf_size)
+        self.last_tree = tree
+        self.metrics.gauge("tree_depth", int(tree.levels[-1]))
+        # Work in units of the tree's size so powers of distances stay within the range of float64
+        scale = max(tree.size, 1.0)
+        points = ((tree.positions[:, 0] - tree.origin[0]) + 1j * (tree.positions[:, 1] - tree.origin[1])) / scale
+        centers = ((tree.centers[:, 0] - tree.origin[0]) + 1j * (tree.centers[:, 1] - tree.origin[1])) / scale
+        body_masses = tree.masses.astype(np.float64)
+        extent = np.maximum(tree.upper - tree.centers, tree.centers - tree.lower).astype(np.float64)
+        radii = np.hypot(extent[:, 0], extent[:, 1]) / scale
+
+        leaves = np.flatnonzero(tree.child_counts == 0)
+        leaves = leaves[np.argsort(tree.starts[leaves])]
+        body_leaves = np.repeat(leaves, tree.ends[leaves] - tree.starts[leaves])
+
+        multipoles = self.upward(tree, points, body_masses, centers, leaves, body_leaves)
+        conversions, near = self.interactions(tree, centers, radii)
+        self.metrics.count("interactions", len(conversions))
+        locals_ = np.zeros_like(multipoles)
+        for start in range(0, len(conversions), self.BATCH_SIZE):
+            batch = conversions[start : start + self.BATCH_SIZE]
+            self._scatter_add(
+                locals_, batch[:, 0], self.convert(multipoles[batch[:, 1]], centers[batch[:, 0]] - centers[batch[:, 1]])
+            )
+        self.downward(tree, locals_, centers)
+
+        accelerations = self.evaluate_locals(locals_[body_leaves], points - centers[body_leaves])
+        accelerations += self.direct(tree, points, body_masses, near)
+        accelerations /= scale**2
+
+        result = np.empty((len(points), 2), dtype=positions.dtype)
+        result[tree.order, 0] = accelerations.real
+        result[tree.order, 1] = accelerations.imag
+        return result
+
+    def upward(
+        self,
+        tree: LinearQuadTree,
+        points: np.ndarray,
+        masses: np.ndarray,
+        centers: np.ndarray,
+        leaves: np.ndarray,
+        body_leaves: np.ndarray,
+    ) -> np.ndarray:
+        """Compute the multipole expansion of every node, from the bodies of each leaf up to the root.
+
+        Args:
+            tree (LinearQuadTree): The tree of all bodies.
+            points (np.ndarray): Scaled complex positions of the sorted bodies.
+            masses (np.ndarray): Masses of the sorted bodies.
+            centers (np.ndarray): Scaled complex centers of the nodes.
+            leaves (np.ndarray): The leaves, in order of their body ranges.
+            body_leaves (np.ndarray): The leaf of each sorted body.
+
+        Returns:
+            np.ndarray: The multipole expansion of each node, shape (nodes, order + 1, order + 1).
+        """
+        size = self.order + 1
+        multipoles = np.zeros((len(tree), size, size), dtype=np.complex128)
+        offsets = points - centers[body_leaves]
+        powers = offsets[:, np.newaxis] ** np.arange(size)
+        weighted = powers * masses[:, np.newaxis]
+        leaf_multipoles = np.empty((len(leaves), size, size), dtype=np.complex128)
+        for start in range(0, len(leaves), self.BATCH_SIZE // size):
+            batch = leaves[start : start + self.BATCH_SIZE // size]
+            begin, end = tree.starts[batch[0]], tree.ends[batch[-1]]
+            # Each body's contribution is the outer product of its powers of (w - c) and conj(w - c)
+            contributions = weighted[begin:end, :, np.newaxis] * powers[begin:end, np.newaxis, :].conj()
+            leaf_multipoles[start : start + len(batch)] = np.add.reduceat(contributions, tree.starts[batch] - begin)
+        multipoles[leaves] = leaf_multipoles
+
+        for level in range(tree.depth, 0, -1):
+            nodes = np.flatnonzero(tree.levels == level)
+            parents = tree.parents[nodes]
+            shifts = self.shift_matrices(centers[nodes] - centers[parents])
+            self._scatter_add(multipoles, parents, shifts @ multipoles[nodes] @ shifts.conj().transpose(0, 2, 1))
+        return multipoles
+
+    def interactions(
+        self, tree: LinearQuadTree, centers: np.ndarray, radii: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Pair up nodes with a dual tree traversal starting from the root paired with itself.
+
+        Pairs of distinct nodes are well separated when the sum of their radii is below theta times the
+        distance between their centers. Otherwise the larger node is opened, or both if they are the same
+        size, until both are leaves.
+
+        Args:
+            tree (LinearQuadTree): The tree of all bodies.
+            centers (np.ndarray): Scaled complex centers of the nodes.
+            radii (np.ndarray): Scaled radius of the bodies of each node around its center.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Target and source node of each well separated pair and of each
+                pair of leaves that must be summed directly, each shape (pairs, 2).
+        """
+        conversions = []
+        near = []
+        visited = 0
+        targets = sources = np.zeros(1, dtype=np.intp)
+        while len(targets):
+            visited += len(targets)
+            distances = np.abs(centers[targets] - centers[sources])
+            separated = (targets != sources) & (radii[targets] + radii[sources] < self.theta * distances)
+            conversions.append(np.stack((targets[separated], sources[separated]), axis=1))
+            targets, sources = targets[~separated], sources[~separated]
+
+            target_leaf = tree.child_counts[targets] == 0
+            source_leaf = tree.child_counts[sources] == 0
+            leaves = target_leaf & source_leaf
+            near.append(np.stack((targets[leaves], sources[leaves]), axis=1))
+            targets, sources = targets[~leaves], sources[~leaves]
+            target_leaf, source_leaf = target_leaf[~leaves], source_leaf[~leaves]
+
+            target_widths = tree.half_widths[targets]
+            source_widths = tree.half_widths[sources]
+            open_target = ~target_leaf & (source_leaf | (target_widths >= source_widths))
+            open_source = ~source_leaf & (target_leaf | (source_widths >= target_widths))
+            target_starts = np.where(open_target, tree.child_starts[targets], targets)
+            target_counts = np.where(open_target, tree.child_counts[targets], 1)
+            source_starts = np.where(open_source, tree.child_starts[sources], sources)
+            source_counts = np.where(open_source, tree.child_counts[sources], 1)
+            targets, sources = self.range_pairs(target_starts, target_counts, source_starts, source_counts)
+        self.metrics.count("nodes_visited", visited)
+        return np.concatenate(conversions), np.concatenate(near)
+
+    def convert(self, multipoles: np.ndarray, separations: np.ndarray) -> np.ndarray:
+        """Convert multipole expansions into local expansions around distant centers.
+
+        Args:
+            multipoles (np.ndarray): Multipole expansions, shape (p, order + 1, order + 1).
+            separations (np.ndarray): The center of each local expansion minus the center of its multipole.
+
+        Returns:
+            np.ndarray: The local expansions, shape (p, order + 1, order + 1).
+        """
+        size = self.order + 1
+        inverse_powers = (1 / separations)[:, np.newaxis] ** np.arange(2 * size - 1)
+        exponents = np.add.outer(np.arange(size), np.arange(size))
+        conversions = self._conversion * inverse_powers[:, exponents]
+        scale = -1 / np.abs(separations)
+        return scale[:, np.newaxis, np.newaxis] * (conversions @ multipoles @ conversions.conj().transpose(0, 2, 1))
+
+    def downward(self, tree: LinearQuadTree, locals_: np.ndarray, centers: np.ndarray) -> None:
+        """Add the local expansion of every node to its children's, from the root down to the leaves.
+
+        Args:
+            tree (LinearQuadTree): The tree of all bodies.
+            locals_ (np.ndarray): The local expansion of each node, updated in place.
+            centers (np.ndarray): Scaled complex centers of the nodes.
+        """
+        for level in range(1, tree.depth + 1):
+            nodes = np.flatnonzero(tree.levels == level)
+            parents = tree.parents[nodes]
+            shifts = self.shift_matrices(centers[nodes] - centers[parents])
+            locals_[nodes] += shifts.transpose(0, 2, 1) @ locals_[parents] @ shifts.conj()
+
+    def shift_matrices(self, shifts: np.ndarray) -> np.ndarray:
+        """Return the matrices A with A[k, i] = binom(k, i) s^(k - i), which translate expansions by s.
+
+        Args:
+            shifts (np.ndarray): The complex shifts.
+
+        Returns:
+            np.ndarray: The matrices, shape (len(shifts), order + 1, order + 1).
+        """
+        powers = shifts[:, np.newaxis] ** np.arange(self.order + 1)
+        return self._binomials * powers[:, self._shift_powers]
+
+    def evaluate_locals(self, locals_: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        """Return the acceleration given by local expansions at offsets from their centers.
+
+        The acceleration is minus the gradient of the potential, -2 d(phi) / d(conj(v)) as a complex number.
+
+        Args:
+            locals_ (np.ndarray): The local expansion at each point, shape (n, order + 1, order + 1).
+            offsets (np.ndarray): The offset of each point from the center of its expansion.
+
+        Returns:
+            np.ndarray: The complex acceleration at each point.
+        """
+        if self.order == 0:
+            return np.zeros(len(offsets), dtype=np.complex128)
+        powers = offsets[:, np.newaxis] ** np.arange(self.order + 1)
+        derivatives = locals_[:, :, 1:] * np.arange(1, self.order + 1)
+        return -2 * np.einsum("bnm,bn,bm->b", derivatives, powers, powers[:, :-1].conj())
+
+    def direct(self, tree: LinearQuadTree, points: np.ndarray, masses: np.ndarray, near: np.ndarray) -> np.ndarray:
+        """Sum the accelerations between the bodies of each pair of nearby leaves directly.
+
+        Args:
+            tree (LinearQuadTree): The tree of all bodies.
+            points (np.ndarray): Scaled complex positions of the sorted bodies.
+            masses (np.ndarray): Masses of the sorted bodies.
+            near (np.ndarray): Target and source leaf of each pair, shape (pairs, 2).
+
+        Returns:
+            np.ndarray: The complex acceleration of each sorted body.
+        """
+        real = np.zeros(len(points))
+        imag = np.zeros(len(points))
+        target_counts = tree.ends[near[:, 0]] - tree.starts[near[:, 0]]
+        source_counts = tree.ends[near[:, 1]] - tree.starts[near[:, 1]]
+        self.metrics.count("interactions", np.dot(target_counts, source_counts))
+        batches = np.cumsum(target_counts * source_counts) // self.BATCH_SIZE
+        boundaries = np.flatnonzero(np.diff(batches, prepend=-1, append=batches[-1] + 1 if len(batches) else 0))
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            targets, sources = self.range_pairs(
+                tree.starts[near[start:end, 0]],
+                target_counts[start:end],
+                tree.starts[near[start:end, 1]],
+                source_counts[start:end],
+            )
+            separations = points[sources] - points[targets]
+            distances = np.abs(separations)
+            # Coincident bodies, including each body with itself, exert no force on each other
+            distances[distances == 0] = np.inf
+            pulls = separations * (masses[sources] / distances**3)
+            real += np.bincount(targets, pulls.real, minlength=len(points))
+            imag += np.bincount(targets, pulls.imag, minlength=len(points))
+        return real + 1j * imag
+
+    @staticmethod
+    def _scatter_add(array: np.ndarray, indices: np.ndarray, values: np.ndarray) -> None:
+        """Add values to rows of an array, summing the values of repeated indices.
+
+        Args:
+            array (np.ndarray): The array to add to.
+            indices (np.ndarray): The row of each value.
+            values (np.ndarray): The values, one per index.
+        """
+        if len(indices) == 0:
+            return
+        order = np.argsort(indices, kind="stable")
+        indices = indices[order]
+        starts = np.flatnonzero(np.diff(indices, prepend=-1))
+        array[indices[starts]] += np.add.reduceat(values[order], starts)
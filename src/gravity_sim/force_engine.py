@@ -0,0 +1,217 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import numpy as np
+
+from gravity_sim.metrics import Metrics
+
+
+class ForceEngine(ABC):
+    """Base class for algorithms that compute the gravitational acceleration of bodies."""
+
+    # Tree built during the most recent evaluation, for engines that use one
+    last_tree = None
+    # Registry the engine records timings and counts to, disabled until set_metrics() is called
+    metrics = Metrics(enabled=False)
+    # Whether evaluating a few targets costs less than evaluating every body, which block timesteps rely on
+    targeted = True
+
+    def set_metrics(self, metrics: Metrics) -> None:
+        """Record timings and counts such as tree nodes visited to a registry.
+
+        Args:
+            metrics (Metrics): The registry.
+        """
+        self.metrics = metrics
+
+    @abstractmethod
+    def accelerations(
+        self,
+        positions: np.ndarray,
+        masses: np.ndarray,
+        grav_constant: float,
+        targets: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Compute the acceleration of the target bodies due to every body.
+
+        Args:
+            positions (np.ndarray): Positions of all bodies, shape (n, 2).
+            masses (np.ndarray): Masses of all bodies, shape (n,).
+            grav_constant (float): The gravitational constant.
+            targets (Optional[np.ndarray], optional): Indices of the bodies to compute accelerations for.
+                Defaults to None for every body.
+
+        Returns:
+            np.ndarray: Accelerations of the targets in order, shape (len(targets), 2).
+        """
+
+    def prepare(self, positions: np.ndarray, masses: np.ndarray) -> dict[str, np.ndarray]:
+        """Compute the data shared by every target of an evaluation, such as a tree of the bodies.
+
+        Engines that share work between targets override this and evaluate(), so the targets can be split
+        across workers that each receive the prepared arrays.
+
+        Args:
+            positions (np.ndarray): Positions of all bodies, shape (n, 2).
+            masses (np.ndarray): Masses of all bodies, shape (n,).
+
+        Returns:
+            dict[str, np.ndarray]: Named arrays passed to evaluate(), empty by default.
+        """
+        return {}
+
+    def evaluate(
+        self,
+        prepared: dict[str, np.ndarray],
+        positions: np.ndarray,
+        masses: np.ndarray,
+        grav_constant: float,
+        targets: np.ndarray,
+    ) -> np.ndarray:
+        """Compute the acceleration of the target bodies from the arrays returned by prepare().
+
+        The acceleration of each target must not depend on which other bodies are targets.
+
+        Args:
+            prepared (dict[str, np.ndarray]): The arrays returned by prepare().
+            positions (np.ndarray): Positions of all bodies, shape (n, 2).
+            masses (np.ndarray): Masses of all bodies, shape (n,).
+            grav_constant (float): The gravitational constant.
+            targets (np.ndarray): Indices of the bodies to compute accelerations for.
+
+        Returns:
+            np.ndarray: Accelerations of the targets in order, shape (len(targets), 2).
+        """
+        return self.accelerations(positions, masses, grav_constant, targets)
+
+    def locality_order(self, prepared: dict[str, np.ndarray], targets: np.ndarray) -> np.ndarray:
+        """Return an order of the targets that keeps targets sharing work next to each other.
+
+        Used to split the targets into chunks evaluated separately, which should share as little as possible.
+
+        Args:
+            prepared (dict[str, np.ndarray]): The arrays returned by prepare().
+            targets (np.ndarray): Indices of the target bodies.
+
+        Returns:
+            np.ndarray: Indices into targets, the original order by default.
+        """
+        return np.arange(len(targets))
+
+    @staticmethod
+    def resolve_targets(num_bodies: int, targets: Optional[np.ndarray]) -> np.ndarray:
+        """Return the target indices, defaulting to every body.
+
+        Args:
+            num_bodies (int): The number of bodies.
+            targets (Optional[np.ndarray]): Indices of the targets or None.
+
+        Returns:
+            np.ndarray: Integer indices of the targets.
+        """
+        if targets is None:
+            return np.arange(num_bodies)
+        return np.asarray(targets, dtype=np.intp)
+
+    @staticmethod
+    def range_pairs(
+        first_starts: np.ndarray, first_counts: np.ndarray, second_starts: np.ndarray, second_counts: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Return every pair of indices from pairs of ranges, the Cartesian product of each pair of ranges.
+
+        Args:
+            first_starts (np.ndarray): The start of the first range of each pair.
+            first_counts (np.ndarray): The length of the first range of each pair.
+            second_starts (np.ndarray): The start of the second range of each pair.
+            second_counts (np.ndarray): The length of the second range of each pair.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The first and second index of every pair.
+        """
+        totals = first_counts * second_counts
+        pairs = np.repeat(np.arange(len(totals)), totals)
+        within = np.arange(totals.sum()) - np.repeat(np.cumsum(totals) - totals, totals)
+        return (
+            first_starts[pairs] + within // second_counts[pairs],
+            second_starts[pairs] + within % second_counts[pairs],
+        )
+
+
+class SolverEngine(ForceEngine):
+    """Base class for engines that compute the acceleration of every body at once, such as field solvers.
+
+    The whole solution is computed by prepare(), so parallel engines share it between their workers
+    instead of solving again for each chunk of targets.
+    """
+
+    targeted = False
+
+    @abstractmethod
+    def solve(self, positions: np.ndarray, masses: np.ndarray) -> np.ndarray:
+        """Compute the acceleration of every body, without the gravitational constant.
+
+        Args:
+            positions (np.ndarray): Positions of all bodies, shape (n, 2).
+            masses (np.ndarray): Masses of all bodies, shape (n,).
+
+        Returns:
+            np.ndarray: The accelerations, shape (n, 2), with the dtype of the positions.
+        """
+
+    def accelerations(
+        self,
+        positions: np.ndarray,
+        masses: np.ndarray,
+        grav_constant: float,
+        targets: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Compute the acceleration of the target bodies, the method always computes every body.
+
+        Args:
+            positions (np.ndarray): Positions of all bodies, shape (n, 2).
+            masses (np.ndarray): Masses of all bodies, shape (n,).
+            grav_constant (float): The gravitational constant.
+            targets (Optional[np.ndarray], optional): Indices of the bodies to compute accelerations for.
+                Defaults to None for every body.
+
+        Returns:
+            np.ndarray: Accelerations of the targets in order, shape (len(targets), 2).
+        """
+        targets = self.resolve_targets(len(masses), targets)
+        return self.evaluate(self.prepare(positions, masses), positions, masses, grav_constant, targets)
+
+    def prepare(self, positions: np.ndarray, masses: np.ndarray) -> dict[str, np.ndarray]:
+        """Compute the accelerations of every body.
+
+        Args:
+            positions (np.ndarray): Positions of all bodies, shape (n, 2).
+            masses (np.ndarray): Masses of all bodies, shape (n,).
+
+        Returns:
+            dict[str, np.ndarray]: The accelerations without the gravitational constant, as "accelerations".
+        """
+        return {"accelerations": self.solve(positions, masses)}
+
+    def evaluate(
+        self,
+        prepared: dict[str, np.ndarray],
+        positions: np.ndarray,
+        masses: np.ndarray,
+        grav_constant: float,
+        targets: np.ndarray,
+    ) -> np.ndarray:
+        """Return the prepared accelerations of the target bodies.
+
+        Args:
+            prepared (dict[str, np.ndarray]): The arrays returned by prepare().
+            positions (np.ndarray): Positions of all bodies, shape (n, 2).
+            masses (np.ndarray): Masses of all bodies, shape (n,).
+            grav_constant (float): The gravitational constant.
+            targets (np.ndarray): Indices of the bodies to compute accelerations for.
+
+        Returns:
+            np.ndarray: Accelerations of the targets in order, shape (len(targets), 2).
+        """
+        result = prepared["accelerations"][targets]
+        result *= grav_constant
+        return result
@@ -0,0 +1,151 @@
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from gravity_sim.checkpoint import Checkpoint
+from gravity_sim.diagnostics import DiagnosticsLog
+from gravity_sim.metrics import MetricsExporter
+from gravity_sim.simulation import Simulation
+from gravity_sim.trajectory import TrajectoryWriter
+
+
+@dataclass
+class HeadlessReport:
+    """Summary of a headless run."""
+
+    steps: int
+    simulated_seconds: float
+    wall_seconds: float
+
+    @property
+    def steps_per_second(self) -> float:
+        """The number of steps completed per second of wall time."""
+        if self.wall_seconds == 0:
+            return float("inf")
+        return self.steps / self.wall_seconds
+
+    def __str__(self) -> str:
+        """Return a human readable summary of the run."""
+        return (
+            f"Ran {self.steps} steps ({self.simulated_seconds:.6g} simulated seconds) "
+            f"in {self.wall_seconds:.3f}s: {self.steps_per_second:.2f} steps/second"
+        )
+
+
+class HeadlessRunner:
+    """Advances a simulation as fast as possible without a display."""
+
+    def __init__(
+        self,
+        simulation: Simulation,
+        recorder: Optional[TrajectoryWriter] = None,
+        record_every: int = 1,
+        checkpoint_file: Optional[str] = None,
+        checkpoint_every: int = 1000,
+        metrics_exporter: Optional[MetricsExporter] = None,
+        metrics_every: int = 100,
+        diagnostics_log: Optional[DiagnosticsLog] = None,
+        diagnostics_every: int = 100,
+    ):
+        """Create a new headless runner.
+
+        Args:
+            simulation (Simulation): The simulation to run.
+            recorder (Optional[TrajectoryWriter], optional): Writer to record frames to. Defaults to None.
+            record_every (int, optional): Record a frame every this many steps. Defaults to 1.
+            checkpoint_file (Optional[str], optional): File to save checkpoints to. Defaults to None.
+            checkpoint_every (int, optional): Save a checkpoint every this many steps, and at the end of a run.
+                Defaults to 1000.
+            metrics_exporter (Optional[MetricsExporter], optional): Exporter to write the simulation's metrics
+                to. Defaults to None.
+            metrics_every (int, optional): Export metrics every this many steps, and at the end of a run.
+                Defaults to 100.
+            diagnostics_log (Optional[DiagnosticsLog], optional): Log to sample energy, momentum and angular
+                momentum to. Defaults to None.
+            diagnostics_every (int, optional): Sample diagnostics every this many steps, and at the start and
+                end of a run. Defaults to 100.
+        """
+        self.simulation = simulation
+        self.recorder = recorder
+        self.record_every = max(1, record_every)
+        self._last_recorded_step = None
+        self.checkpoint_file = checkpoint_file
+        self.checkpoint_every = max(1, checkpoint_every)
+        self.metrics_exporter = metrics_exporter
+        self.metrics_every = max(1, metrics_every)
+        self._last_exported_step = None
+        self.diagnostics_log = diagnostics_log
+        self.diagnostics_every = max(1, diagnostics_every)
+        self._last_sampled_step = None
+
+    def run(self, steps: Optional[int] = None, seconds: Optional[float] = None) -> HeadlessReport:
+        """Step the simulation until a number of steps or simulated seconds have passed.
+
+        Args:
+            steps (Optional[int], optional): The number of steps to run. Defaults to None.
+            seconds (Optional[float], optional): The number of simulated seconds to run. Defaults to None.
+
+        Raises:
+            ValueError: If neither or both of steps and seconds are provided.
+
+        Returns:
+            HeadlessReport: A summary of the run.
+        """
+        if (steps is None) == (seconds is None):
+            raise ValueError("Provide exactly one of steps or seconds to run for.")
+
+        start_steps = self.simulation.step_count
+        start_time = self.simulation.time
+        wall_start = time.perf_counter()
+        self.record()
+        self.sample_diagnostics()
+        if steps is not None:
+            for _ in range(steps):
+                self.advance()
+        else:
+            end_time = start_time + seconds
+            while self.simulation.time < end_time:
+                self.advance()
+        if self.checkpoint_file:
+            Checkpoint.save(self.simulation, self.checkpoint_file)
+        if self.metrics_exporter and self.simulation.step_count != self._last_exported_step:
+            self.export_metrics()
+        self.sample_diagnostics()
+
+        return HeadlessReport(
+            steps=self.simulation.step_count - start_steps,
+            simulated_seconds=self.simulation.time - start_time,
+            wall_seconds=time.perf_counter() - wall_start,
+        )
+
+    def advance(self) -> None:
+        """Step the simulation once, recording and checkpointing the new state if due."""
+        self.simulation.step()
+        self.record()
+        if self.checkpoint_file and self.simulation.step_count % self.checkpoint_every == 0:
+            Checkpoint.save(self.simulation, self.checkpoint_file)
+        if self.metrics_exporter and self.simulation.step_count % self.metrics_every == 0:
+            self.export_metrics()
+        if self.simulation.step_count % self.diagnostics_every == 0:
+            self.sample_diagnostics()
+
+    def export_metrics(self) -> None:
+        """Export the metrics collected since the last export."""
+        self.metrics_exporter.export(self.simulation)
+        self._last_exported_step = self.simulation.step_count
+
+    def sample_diagnostics(self) -> None:
+        """Sample the diagnostics if logging them and the current step has not been sampled already."""
+        step = self.simulation.step_count
+        if self.diagnostics_log is None or step == self._last_sampled_step:
+            return
+        self.diagnostics_log.sample(self.simulation)
+        self._last_sampled_step = step
+
+    def record(self) -> None:
+        """Record the current state if recording, it is due and it has not been recorded already."""
+        step = self.simulation.step_count
+        if self.recorder is None or step % self.record_every or step == self._last_recorded_step:
+            return
+        self.recorder.record(self.simulation)
+        self._last_recorded_step = step
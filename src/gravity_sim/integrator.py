@@ -0,0 +1,329 @@
+from abc import ABC, abstractmethod
+from decimal import Decimal
+from typing import Callable, Optional
+
+import numpy as np
+
+from gravity_sim.state import BodyState
+
+# Returns the acceleration of every body at the current positions of the state, or of an array of target bodies
+Accelerate = Callable[..., np.ndarray]
+
+
+class Integrator(ABC):
+    """Base class for schemes that advance a body state through time using the accelerations of the bodies.
+
+    Accelerations are requested through integrator.accelerations(), which reuses the most recent evaluation
+    if the positions and masses have not changed since, so schemes that end and start with a kick, like
+    leapfrog, only evaluate the forces once per step. Anything else the accelerations depend on, such as the
+    force engine, must call invalidate() when it changes.
+    """
+
+    # Order of accuracy, and force evaluations needed per step once the first step has been taken
+    order = 1
+    evaluations = 1
+
+    def __init__(self):
+        """Create a new integrator."""
+        self._cache = None
+
+    @abstractmethod
+    def step(self, state: BodyState, timestep: float, accelerate: Accelerate) -> None:
+        """Advance the state by one timestep.
+
+        Args:
+            state (BodyState): The state to advance in place.
+            timestep (float): Time to advance in seconds, any number convertible to the state's precision.
+            accelerate (Accelerate): Returns the acceleration of every body at the current positions.
+        """
+
+    def invalidate(self) -> None:
+        """Forget the last evaluation, so the next accelerations are evaluated again."""
+        self._cache = None
+
+    def accelerations(self, state: BodyState, accelerate: Accelerate) -> np.ndarray:
+        """Return the acceleration of every body, reusing the last evaluation if the state is unchanged.
+
+        Args:
+            state (BodyState): The state being advanced.
+            accelerate (Accelerate): Returns the acceleration of every body at the current positions.
+
+        Returns:
+            np.ndarray: The accelerations, shape (n, 2).
+        """
+        if self._cache is not None:
+            cached_state, positions, masses, accelerations = self._cache
+            if (
+                cached_state is state
+                and np.array_equal(positions, state.positions)
+                and np.array_equal(masses, state.masses)
+            ):
+                return accelerations
+        accelerations = accelerate()
+        self.remember(state, accelerations)
+        return accelerations
+
+    def remember(self, state: BodyState, accelerations: np.ndarray) -> None:
+        """Keep the accelerations of every body at the current state, to be reused by accelerations().
+
+        Args:
+            state (BodyState): The state the accelerations were evaluated at.
+            accelerations (np.ndarray): The accelerations, shape (n, 2).
+        """
+        self._cache = (state, state.positions.copy(), state.masses.copy(), accelerations)
+
+
+class EulerIntegrator(Integrator):
+    """Semi-implicit (symplectic) Euler: kick the velocities then drift the positions. First order."""
+
+    def step(self, state: BodyState, timestep: float, accelerate: Accelerate) -> None:
+        """Advance the state by one timestep.
+
+        Args:
+            state (BodyState): The state to advance in place.
+            timestep (float): Time to advance in seconds, any number convertible to the state's precision.
+            accelerate (Accelerate): Returns the acceleration of every body at the current positions.
+        """
+        timestep = state.precision.scalar(timestep)
+        state.velocities += self.accelerations(state, accelerate) * timestep
+        state.positions += state.velocities * timestep
+
+
+class LeapfrogIntegrator(Integrator):
+    """Kick-drift-kick leapfrog: half kick, full drift, half kick. Second order and time reversible."""
+
+    order = 2
+
+    def step(self, state: BodyState, timestep: float, accelerate: Accelerate) -> None:
+        """Advance the state by one timestep.
+
+        Args:
+            state (BodyState): The state to advance in place.
+            timestep (float): Time to advance in seconds, any number convertible to the state's precision.
+            accelerate (Accelerate): Returns the acceleration of every body at the current positions.
+        """
+        timestep = state.precision.scalar(timestep)
+        half_step = timestep / 2
+        state.velocities += self.accelerations(state, accelerate) * half_step
+        state.positions += state.velocities * timestep
+        state.velocities += self.accelerations(state, accelerate) * half_step
+
+
+class VelocityVerletIntegrator(Integrator):
+    """Velocity Verlet: drift using the current velocity and acceleration, then average the accelerations.
+
+    Equivalent to kick-drift-kick leapfrog in exact arithmetic. Second order.
+    """
+
+    order = 2
+
+    def step(self, state: BodyState, timestep: float, accelerate: Accelerate) -> None:
+        """Advance the state by one timestep.
+
+        Args:
+            state (BodyState): The state to advance in place.
+            timestep (float): Time to advance in seconds, any number convertible to the state's precision.
+            accelerate (Accelerate): Returns the acceleration of every body at the current positions.
+        """
+        timestep = state.precision.scalar(timestep)
+        half_step = timestep / 2
+        accelerations = self.accelerations(state, accelerate)
+        state.positions += (state.velocities + accelerations * half_step) * timestep
+        state.velocities += (accelerations + self.accelerations(state, accelerate)) * half_step
+
+
+class YoshidaIntegrator(Integrator):
+    """Yoshida's fourth order symplectic integrator, three leapfrog steps with weights w1, w0, w1.
+
+    Uses the drift-kick form, which evaluates the forces three times per step.
+    """
+
+    order = 4
+    evaluations = 3
+
+    _CUBE_ROOT_2 = Decimal(2) ** (Decimal(1) / Decimal(3))
+    _W1 = 1 / (2 - _CUBE_ROOT_2)
+    _W0 = -_CUBE_ROOT_2 / (2 - _CUBE_ROOT_2)
+    # Drift and kick weights, as fractions of the timestep
+    DRIFTS = (_W1 / 2, (_W0 + _W1) / 2, (_W0 + _W1) / 2, _W1 / 2)
+    KICKS = (_W1, _W0, _W1)
+
+    def step(self, state: BodyState, timestep: float, accelerate: Accelerate) -> None:
+        """Advance the state by one timestep.
+
+        Args:
+            state (BodyState): The state to advance in place.
+            timestep (float): Time to advance in seconds, any number convertible to the state's precision.
+            accelerate (Accelerate): Returns the acceleration of every body at the current positions.
+        """
+        precision = state.precision
+        timestep = precision.scalar(timestep)
+        for drift, kick in zip(self.DRIFTS, self.KICKS):
+            state.positions += state.velocities * (precision.scalar(drift) * timestep)
+            state.velocities += self.accelerations(state, accelerate) * (precision.scalar(kick) * timestep)
+        state.positions += state.velocities * (precision.scalar(self.DRIFTS[-1]) * timestep)
+
+
+class BlockIntegrator(Integrator):
+    """Kick-drift-kick leapfrog with hierarchical power of two block timesteps.
+
+    Each body is placed on a level k, where it steps with timestep / 2^k, chosen at every step it completes
+    from its timestep criterion. Every body is drifted whenever any body completes a step, but forces are only
+    computed for the bodies completing a step, so slow bodies do not pay for fast ones.
+
+    Criteria:
+        "encounter": eta * min over other bodies j of t_ij * sqrt(|a_i| / |a_ij|), where
+            t_ij = sqrt(r^3 / (G (m_i + m_j))) is the orbital time of the pair and a_ij the acceleration of i due
+            to j. Each neighbour's timescale is weighted by its share of the body's acceleration, so a planet is
+            not held to the steps of its small moons, but a star is to those of a massive planet.
+            Costs O(active bodies * n) per evaluation.
+        "acceleration": eta * sqrt(softening / |a|), which needs no extra pass over the bodies.
+
+    The accelerate function must accept an optional array of target indices, returning the accelerations of
+    just those bodies.
+    """
+
+    order = 2
+    CRITERIA = ("encounter", "acceleration")
+
+    def __init__(
+        self,
+        grav_constant: float = 6.6743e-11,
+        eta: float = 0.01,
+        max_level: int = 8,
+        criterion: str = "encounter",
+        softening: float = 1e6,
+        tile_size: int = 256,
+    ):
+        """Create a new block timestep integrator.
+
+        Args:
+            grav_constant (float, optional): The gravitational constant, for the encounter criterion.
+                Defaults to 6.6743e-11.
+            eta (float, optional): Accuracy parameter scaling every body's timestep. Defaults to 0.01.
+            max_level (int, optional): The finest level, so the smallest step is timestep / 2^max_level.
+                Defaults to 8.
+            criterion (str, optional): The timestep criterion, "encounter" or "acceleration".
+                Defaults to "encounter".
+            softening (float, optional): Length scale in metres for the acceleration criterion. Defaults to 1e6.
+            tile_size (int, optional): Number of bodies evaluated at once by the encounter criterion.
+                Defaults to 256.
+
+        Raises:
+            ValueError: If the criterion is not recognised or max_level is negative.
+        """
+        super().__init__()
+        if criterion not in self.CRITERIA:
+            raise ValueError(f"Unknown timestep criterion '{criterion}', expected one of {self.CRITERIA}.")
+        if max_level < 0:
+            raise ValueError(f"Max level must not be negative, got {max_level}.")
+        self.grav_constant = float(grav_constant)
+        self.eta = eta
+        self.max_level = max_level
+        self.criterion = criterion
+        self.softening = softening
+        self.tile_size = tile_size
+        self.levels = None
+        self.last_evaluations = 0
+
+    def timesteps(self, state: BodyState, accelerations: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        """Return the timestep each target body should take by the criterion, in float64.
+
+        Args:
+            state (BodyState): The state being advanced.
+            accelerations (np.ndarray): The current accelerations of the targets, shape (len(targets), 2).
+            targets (np.ndarray): Indices of the bodies.
+
+        Returns:
+            np.ndarray: The timesteps in seconds, infinite for bodies with no constraint.
+        """
+        if self.criterion == "acceleration":
+            magnitudes = np.hypot(*np.asarray(accelerations, dtype=np.float64).T)
+            with np.errstate(divide="ignore"):
+                return self.eta * np.sqrt(self.softening / magnitudes)
+
+        positions = np.asarray(state.positions, dtype=np.float64)
+        gm = self.grav_constant * np.asarray(state.masses, dtype=np.float64)
+        magnitudes = np.hypot(*np.asarray(accelerations, dtype=np.float64).T)
+        timesteps = np.empty(len(targets))
+        for start in range(0, len(targets), self.tile_size):
+            tile = targets[start : start + self.tile_size]
+            offsets = positions[np.newaxis, :] - positions[tile, np.newaxis]
+            sqr_distances = offsets[..., 0] ** 2 + offsets[..., 1] ** 2
+            # t_ij^2 * |a_i| / |a_ij| = r^5 |a_i| / (G m_j * G (m_i + m_j)), bodies without mass constrain nobody
+            with np.errstate(divide="ignore", invalid="ignore"):
+                squares = sqr_distances**2.5 / (gm * (gm + gm[tile, np.newaxis]))
+            squares[(sqr_distances == 0) | ~np.isfinite(squares)] = np.inf
+            timesteps[start : start + len(tile)] = np.sqrt(squares.min(axis=1) * magnitudes[start : start + len(tile)])
+        return self.eta * timesteps
+
+    def choose_levels(self, timestep: float, timesteps: np.ndarray) -> np.ndarray:
+        """Return the coarsest level whose step is no longer than each desired timestep.
+
+        Args:
+            timestep (float): The step of level 0.
+            timesteps (np.ndarray): The desired timestep of each body.
+
+        Returns:
+            np.ndarray: The levels, between 0 and max_level.
+        """
+        with np.errstate(divide="ignore"):
+            levels = np.ceil(np.log2(float(timestep) / timesteps))
+        return np.clip(levels, 0, self.max_level).astype(np.int64)
+
+    def step(self, state: BodyState, timestep: float, accelerate: Accelerate) -> None:
+        """Advance the state by one timestep, which every body finishes at the same time.
+
+        Time is counted in ticks of the finest level, the bodies are drifted to each tick where a body
+        completes its step, which then gets its closing half kick, a new level and its next opening half kick.
+
+        Args:
+            state (BodyState): The state to advance in place.
+            timestep (float): Time to advance in seconds, any number convertible to the state's precision.
+            accelerate (Accelerate): Returns the accelerations of the target bodies, or every body if None.
+        """
+        precision = state.precision
+        tick = precision.scalar(timestep) / 2**self.max_level
+        total_ticks = 2**self.max_level
+        evaluations = 0
+
+        def counted(targets: Optional[np.ndarray] = None) -> np.ndarray:
+            nonlocal evaluations
+            evaluations += len(state) if targets is None else len(targets)
+            return accelerate() if targets is None else accelerate(targets)
+
+        accelerations = self.accelerations(state, counted).copy()
+
+        everyone = np.arange(len(state))
+        levels = self.choose_levels(timestep, self.timesteps(state, accelerations, everyone))
+        sizes = 2 ** (self.max_level - levels)
+        ends = sizes.copy()
+        state.velocities += accelerations * (precision.array(sizes * tick / 2)[:, np.newaxis])
+
+        now = 0
+        while now < total_ticks:
+            next_tick = int(ends.min())
+            state.positions += state.velocities * ((next_tick - now) * tick)
+            now = next_tick
+
+            active = np.flatnonzero(ends == now)
+            accelerations[active] = counted(active)
+            state.velocities[active] += (
+                accelerations[active] * (precision.array(sizes[active] * tick / 2)[:, np.newaxis])
+            )
+            if now == total_ticks:
+                break
+
+            new_levels = self.choose_levels(timestep, self.timesteps(state, accelerations[active], active))
+            new_sizes = 2 ** (self.max_level - new_levels)
+            # A body can only move to a coarser level when the current time is on that level's grid
+            while np.any(misaligned := now % new_sizes != 0):
+                new_sizes[misaligned] //= 2
+            levels[active] = self.max_level - np.log2(new_sizes).astype(np.int64)
+            sizes[active] = new_sizes
+            ends[active] = now + new_sizes
+            state.velocities[active] += accelerations[active] * (precision.array(new_sizes * tick / 2)[:, np.newaxis])
+
+        self.remember(state, accelerations)
+        self.levels = levels
+        self.last_evaluations = evaluations
@@ -0,0 +1,470 @@
+import heapq
+from typing import Callable, Optional
+
+import numpy as np
+
+
+class LinearQuadTree:
+    """A quadtree stored in flat arrays, built by sorting bodies along a Morton (Z-order) curve.
+
+    Sorting on Morton keys places the bodies of every cell in one contiguous range of the sorted arrays,
+    so each node only stores the start and end of its range. Nodes are stored level by level and the
+    non-empty children of a node are contiguous, given by child_starts and child_counts.
+    A node with no children is a leaf holding at most leaf_size bodies, unless max_depth is reached.
+    """
+
+    MAX_DEPTH = 30
+    # The arrays that fully describe a built tree, see arrays() and from_arrays()
+    ARRAYS = (
+        "origin",
+        "order",
+        "keys",
+        "positions",
+        "masses",
+        "starts",
+        "ends",
+        "centers",
+        "child_starts",
+        "child_counts",
+        "levels",
+        "half_widths",
+        "parents",
+        "node_masses",
+        "centers_of_mass",
+        "lower",
+        "upper",
+    )
+
+    def __init__(self, positions: np.ndarray, masses: np.ndarray, leaf_size: int = 8, max_depth: int = MAX_DEPTH):
+        """Build a new quadtree over the given bodies.
+
+        Args:
+            positions (np.ndarray): Positions of the bodies, shape (n, 2).
+            masses (np.ndarray): Masses of the bodies, shape (n,).
+            leaf_size (int, optional): The maximum number of bodies in a leaf. Defaults to 8.
+            max_depth (int, optional): The maximum depth of the tree, at most 30. Defaults to 30.
+
+        Raises:
+            ValueError: If there are no bodies, or leaf_size or max_depth are out of range.
+        """
+        if len(masses) == 0:
+            raise ValueError("Cannot build a quadtree without any bodies.")
+        if leaf_size < 1:
+            raise ValueError(f"Leaf size must be positive, got {leaf_size}.")
+        if not 0 <= max_depth <= self.MAX_DEPTH:
+            raise ValueError(f"Max depth must be between 0 and {self.MAX_DEPTH}, got {max_depth}.")
+        self.leaf_size = leaf_size
+        self.max_depth = max_depth
+
+        lower = positions.min(axis=0)
+        size = max(float(np.max(positions.max(axis=0) - lower)), np.finfo(np.float64).tiny)
+        self.origin = lower
+        self.size = size
+
+        keys = self.morton_keys(positions, lower, size, max_depth)
+        self.order = np.argsort(keys, kind="stable")
+        self.keys = keys[self.order]
+        self.positions = positions[self.order]
+        self.masses = masses[self.order]
+
+        self._build_nodes()
+
+    @staticmethod
+    def part_bits(values: np.ndarray) -> np.ndarray:
+        """Spread the lower 32 bits of each value so there is a zero bit between each bit.
+
+        Args:
+            values (np.ndarray): Unsigned integers.
+
+        Returns:
+            np.ndarray: The spread values as uint64.
+        """
+        values = values.astype(np.uint64) & np.uint64(0x00000000FFFFFFFF)
+        for shift, mask in (
+            (16, 0x0000FFFF0000FFFF),
+            (8, 0x00FF00FF00FF00FF),
+            (4, 0x0F0F0F0F0F0F0F0F),
+            (2, 0x3333333333333333),
+            (1, 0x5555555555555555),
+        ):
+            values = (values | (values << np.uint64(shift))) & np.uint64(mask)
+        return values
+
+    @staticmethod
+    def morton_keys(positions: np.ndarray, origin: np.ndarray, size: float, depth: int) -> np.ndarray:
+        """Return the Morton key of each position within a square region.
+
+        The region is divided into a 2^depth by 2^depth grid, bit 0 of each pair of key bits comes from x.
+
+        Args:
+            positions (np.ndarray): The positions, shape (n, 2).
+            origin (np.ndarray): The lower left corner of the region.
+            size (float): The side length of the region.
+            depth (int): The number of bits per axis.
+
+        Returns:
+            np.ndarray: The keys as uint64, shape (n,).
+        """
+        cells = 1 << depth
+        # Computed in float64 as cells - 1 rounds up to cells in float32, giving keys outside the tree
+        offsets = np.asarray(positions, dtype=np.float64) - np.asarray(origin, dtype=np.float64)
+        grid = np.clip(offsets / size * cells, 0, cells - 1).astype(np.uint64)
+        return LinearQuadTree.part_bits(grid[:, 0]) | (LinearQuadTree.part_bits(grid[:, 1]) << np.uint64(1))
+
+    @staticmethod
+    def range_reduce(ufunc: np.ufunc, values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        """Reduce values over each range [start, end), the ranges must be non-empty, sorted and disjoint.
+
+        Args:
+            ufunc (np.ufunc): The ufunc to reduce with, e.g. np.add.
+            values (np.ndarray): The values to reduce along the first axis.
+            starts (np.ndarray): The start of each range.
+            ends (np.ndarray): The end of each range.
+
+        Returns:
+            np.ndarray: The reduction of each range.
+        """
+        # The gaps between ranges are reduced too and discarded, padding keeps the final end index valid
+        padded = np.concatenate((values, np.zeros_like(values[:1])))
+        indices = np.empty(2 * len(starts), dtype=np.intp)
+        indices[0::2] = starts
+        indices[1::2] = ends
+        return ufunc.reduceat(padded, indices, axis=0)[0::2]
+
+    def _build_nodes(self) -> None:
+        """Create the node arrays one level at a time from the sorted keys."""
+        num_bodies = len(self.masses)
+        prefixes = np.zeros(1, dtype=np.uint64)
+        starts = np.zeros(1, dtype=np.intp)
+        ends = np.full(1, num_bodies, dtype=np.intp)
+        centers = (self.origin + self.size / 2)[np.newaxis, :]
+        levels = []
+        level = 0
+        offset = 0
+        while len(starts):
+            levels.append({"starts": starts, "ends": ends, "centers": centers, "level": level})
+            split = (ends - starts > self.leaf_size) & (level < self.max_depth)
+            offset += len(starts)
+
+            child_prefixes = ((prefixes[split, np.newaxis] << np.uint64(2)) + np.arange(4, dtype=np.uint64)).ravel()
+            shifted = self.keys >> np.uint64(2 * (self.max_depth - level - 1)) if split.any() else self.keys
+            child_starts = np.searchsorted(shifted, child_prefixes, side="left")
+            child_ends = np.searchsorted(shifted, child_prefixes, side="right")
+            occupied = child_ends > child_starts
+
+            counts = np.zeros(len(starts), dtype=np.intp)
+            counts[split] = occupied.reshape(-1, 4).sum(axis=1)
+            levels[-1]["child_counts"] = counts
+            levels[-1]["child_starts"] = offset + np.cumsum(counts) - counts
+
+            quadrants = np.tile(np.arange(4), int(split.sum()))
+            signs = np.stack(((quadrants & 1) * 2 - 1, (quadrants >> 1) * 2 - 1), axis=1)
+            half_width = self.size / 2 ** (level + 2)
+            centers = (np.repeat(centers[split], 4, axis=0) + signs * half_width)[occupied]
+            prefixes = child_prefixes[occupied]
+            starts = child_starts[occupied]
+            ends = child_ends[occupied]
+            level += 1
+
+        self._store_levels(levels)
+
+    def _store_levels(self, levels: list[dict]) -> None:
+        """Concatenate the per level node data and compute each node's mass moments and bounds.
+
+        Args:
+            levels (list[dict]): The node data for each level of the tree, from the root down.
+        """
+
+        def join(key):
+            return np.concatenate([level[key] for level in levels])
+
+        self.starts = join("starts")
+        self.ends = join("ends")
+        self.centers = join("centers")
+        self.child_starts = join("child_starts")
+        self.child_counts = join("child_counts")
+        self.levels = np.concatenate([np.full(len(level["starts"]), level["level"]) for level in levels])
+        self.half_widths = self.size / 2.0 ** (self.levels + 1)
+        self.parents = np.concatenate(([-1], np.repeat(np.arange(len(self.starts)), self.child_counts)))
+
+        def reduce(ufunc, values):
+            return np.concatenate(
+                [self.range_reduce(ufunc, values, level["starts"], level["ends"]) for level in levels]
+            )
+
+        self.node_masses = reduce(np.add, self.masses)
+        # Mass moments are accumulated in float64 as they overflow float32 for astronomical masses
+        positions = self.positions.astype(np.float64, copy=False)
+        mass_moments = reduce(np.add, positions * self.masses[:, np.newaxis])
+        counts = (self.ends - self.starts)[:, np.newaxis]
+        masses = self.node_masses.astype(np.float64)[:, np.newaxis]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Nodes without mass use the mean position of their bodies instead
+            centers_of_mass = np.where(masses > 0, mass_moments / masses, reduce(np.add, positions) / counts)
+        self.centers_of_mass = centers_of_mass.astype(self.positions.dtype, copy=False)
+        self.lower = reduce(np.minimum, self.positions)
+        self.upper = reduce(np.maximum, self.positions)
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        """Return the arrays of the tree, from which from_arrays() can recreate it without rebuilding.
+
+        Returns:
+            dict[str, np.ndarray]: The tree's arrays by attribute name, including its settings.
+        """
+        arrays = {key: getattr(self, key) for key in self.ARRAYS}
+        arrays["settings"] = np.array([self.leaf_size, self.max_depth])
+        arrays["size"] = np.array(self.size)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: dict[str, np.ndarray]) -> "LinearQuadTree":
+        """Recreate a tree from the arrays returned by arrays(), using them without copying.
+
+        Args:
+            arrays (dict[str, np.ndarray]): The arrays of a built tree.
+
+        Returns:
+            LinearQuadTree: The tree.
+        """
+        tree = cls.__new__(cls)
+        for key in cls.ARRAYS:
+            setattr(tree, key, arrays[key])
+        tree.leaf_size, tree.max_depth = (int(value) for value in arrays["settings"])
+        tree.size = float(arrays["size"])
+        return tree
+
+    def __len__(self) -> int:
+        """Return the number of nodes in the tree."""
+        return len(self.starts)
+
+    @property
+    def depth(self) -> int:
+        """The deepest level of any node, where the root is level 0."""
+        return int(self.levels.max())
+
+    def is_leaf(self, node: int) -> bool:
+        """Return True if the node has no children.
+
+        Args:
+            node (int): Index of the node.
+
+        Returns:
+            bool: True if the node is a leaf.
+        """
+        return self.child_counts[node] == 0
+
+    def children(self, node: int) -> range:
+        """Return the indices of a node's children.
+
+        Args:
+            node (int): Index of the node.
+
+        Returns:
+            range: The indices of the node's children.
+        """
+        return range(self.child_starts[node], self.child_starts[node] + self.child_counts[node])
+
+    def groups(self, group_size: int) -> np.ndarray:
+        """Return the largest nodes holding at most group_size bodies, or leaves holding more.
+
+        The groups partition the bodies and are spatially compact, so they can share a tree walk.
+
+        Args:
+            group_size (int): The maximum number of bodies in a group, unless it is a leaf.
+
+        Returns:
+            np.ndarray: Indices of the group nodes, in order of their body ranges.
+        """
+        small = (self.ends - self.starts <= group_size) | (self.child_counts == 0)
+        groups = small.copy()
+        groups[1:] &= ~small[self.parents[1:]]
+        nodes = np.flatnonzero(groups)
+        return nodes[np.argsort(self.starts[nodes])]
+
+    def expand_children(self, nodes: np.ndarray) -> np.ndarray:
+        """Return the children of every node in an array of nodes.
+
+        Args:
+            nodes (np.ndarray): Indices of the nodes.
+
+        Returns:
+            np.ndarray: Indices of all of their children.
+        """
+        return self.expand_ranges(self.child_starts[nodes], self.child_counts[nodes])
+
+    @staticmethod
+    def expand_ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        """Return the concatenation of range(start, start + count) for every start and count.
+
+        Args:
+            starts (np.ndarray): The start of each range.
+            counts (np.ndarray): The length of each range.
+
+        Returns:
+            np.ndarray: The concatenated ranges.
+        """
+        offsets = np.cumsum(counts) - counts
+        return np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+
+    def bodies(self, node: int) -> np.ndarray:
+        """Return the original indices of the bodies inside a node.
+
+        Args:
+            node (int): Index of the node.
+
+        Returns:
+            np.ndarray: Indices into the arrays the tree was built from.
+        """
+        return self.order[self.starts[node] : self.ends[node]]
+
+    def box_distances(self, nodes: np.ndarray, point: np.ndarray) -> np.ndarray:
+        """Return the distance from a point to the bounding box of the bodies in each node.
+
+        Args:
+            nodes (np.ndarray): Indices of the nodes.
+            point (np.ndarray): The point, shape (2,).
+
+        Returns:
+            np.ndarray: The distances, 0 for nodes whose box contains the point.
+        """
+        gaps = np.maximum(np.maximum(self.lower[nodes] - point, point - self.upper[nodes]), 0)
+        return np.hypot(gaps[:, 0], gaps[:, 1])
+
+    def query_leaves(self, overlaps: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+        """Return the sorted slots of the bodies in every leaf reached by descending through overlapping nodes.
+
+        Args:
+            overlaps (Callable[[np.ndarray], np.ndarray]): Function of an array of nodes returning which of
+                them may hold a body of interest.
+
+        Returns:
+            np.ndarray: Indices into the sorted arrays of the candidate bodies.
+        """
+        nodes = np.zeros(1, dtype=np.intp)
+        leaves = []
+        while len(nodes):
+            nodes = nodes[overlaps(nodes)]
+            is_leaf = self.child_counts[nodes] == 0
+            leaves.append(nodes[is_leaf])
+            nodes = self.expand_children(nodes[~is_leaf])
+        leaves = np.concatenate(leaves)
+        return self.expand_ranges(self.starts[leaves], self.ends[leaves] - self.starts[leaves])
+
+    def node_maxima(self, values: np.ndarray) -> np.ndarray:
+        """Return the largest value of the bodies in every node.
+
+        Args:
+            values (np.ndarray): A value for each body, in the order the tree was built from, shape (n,).
+
+        Returns:
+            np.ndarray: The largest value in each node, shape (m,).
+        """
+        values = np.asarray(values)[self.order]
+        # The nodes of each level are contiguous, sorted and disjoint
+        bounds = np.searchsorted(self.levels, np.arange(self.levels[-1] + 2))
+        return np.concatenate(
+            [
+                self.range_reduce(np.maximum, values, self.starts[first:last], self.ends[first:last])
+                for first, last in zip(bounds[:-1], bounds[1:])
+            ]
+        )
+
+    def paddings(self, slack: Optional[np.ndarray] = None) -> tuple[np.ndarray, np.ndarray]:
+        """Return how far queries widen the bounding box of every node and the position of every body.
+
+        Bodies that have moved since the tree was built are found by queries given these paddings, which can
+        be reused by every query until the bodies move again.
+
+        Args:
+            slack (Optional[np.ndarray], optional): How far each body may be from its position in the tree,
+                in the order the tree was built from, shape (n,). Defaults to None for bodies that have not moved.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The padding of each node, and of each body in the sorted order.
+        """
+        if slack is None:
+            return np.zeros(len(self.starts)), np.zeros(len(self.order))
+        slack = np.asarray(slack, dtype=np.float64)
+        return self.node_maxima(slack), slack[self.order]
+
+    def query_range(
+        self, lower: np.ndarray, upper: np.ndarray, paddings: Optional[tuple[np.ndarray, np.ndarray]] = None
+    ) -> np.ndarray:
+        """Return the bodies inside a rectangle, including its edges.
+
+        Args:
+            lower (np.ndarray): The lower left corner of the rectangle.
+            upper (np.ndarray): The upper right corner of the rectangle.
+            paddings (Optional[tuple[np.ndarray, np.ndarray]], optional): From paddings(), to return every body
+                that may be inside after moving from the tree. Defaults to None for bodies that have not moved.
+
+        Returns:
+            np.ndarray: The original indices of the bodies inside, in ascending order.
+        """
+        lower = np.asarray(lower, dtype=np.float64)
+        upper = np.asarray(upper, dtype=np.float64)
+        node_padding, body_padding = paddings or self.paddings()
+        slots = self.query_leaves(
+            lambda nodes: (
+                np.all(self.lower[nodes] - node_padding[nodes, np.newaxis] <= upper, axis=1)
+                & np.all(self.upper[nodes] + node_padding[nodes, np.newaxis] >= lower, axis=1)
+            )
+        )
+        positions = self.positions[slots]
+        padding = body_padding[slots, np.newaxis]
+        inside = np.all(positions + padding >= lower, axis=1) & np.all(positions - padding <= upper, axis=1)
+        return np.sort(self.order[slots[inside]])
+
+    def query_radius(
+        self, center: np.ndarray, radius: float, paddings: Optional[tuple[np.ndarray, np.ndarray]] = None
+    ) -> np.ndarray:
+        """Return the bodies within a distance of a point, including those exactly at it.
+
+        Args:
+            center (np.ndarray): The point.
+            radius (float): The distance.
+            paddings (Optional[tuple[np.ndarray, np.ndarray]], optional): From paddings(), to return every body
+                that may be within the distance after moving from the tree. Defaults to None for bodies that
+                have not moved.
+
+        Returns:
+            np.ndarray: The original indices of the bodies within the distance, in ascending order.
+        """
+        center = np.asarray(center, dtype=np.float64)
+        node_padding, body_padding = paddings or self.paddings()
+        slots = self.query_leaves(lambda nodes: self.box_distances(nodes, center) <= radius + node_padding[nodes])
+        offsets = self.positions[slots] - center
+        inside = np.hypot(offsets[:, 0], offsets[:, 1]) <= radius + body_padding[slots]
+        return np.sort(self.order[slots[inside]])
+
+    def nearest(self, point: np.ndarray, k: int = 1) -> np.ndarray:
+        """Return the k bodies nearest to a point.
+
+        Nodes are visited best first, in order of the distance to their bounding box, so only the nodes
+        closer than the k-th nearest body are opened.
+
+        Args:
+            point (np.ndarray): The point.
+            k (int, optional): The number of bodies. Defaults to 1.
+
+        Returns:
+            np.ndarray: The original indices of the nearest bodies, from the nearest, fewer if there are fewer bodies.
+        """
+        point = np.asarray(point, dtype=np.float64)
+        # Entries are (distance, is_body, node or slot), bodies are found once they reach the front
+        queue = [(0.0, False, 0)]
+        found = []
+        while queue and len(found) < k:
+            _, is_body, item = heapq.heappop(queue)
+            if is_body:
+                found.append(item)
+            elif self.child_counts[item] == 0:
+                offsets = self.positions[self.starts[item] : self.ends[item]] - point
+                distances = np.hypot(offsets[:, 0], offsets[:, 1]).tolist()
+                for slot, distance in enumerate(distances, start=int(self.starts[item])):
+                    heapq.heappush(queue, (distance, True, slot))
+            else:
+                children = np.arange(self.child_starts[item], self.child_starts[item] + self.child_counts[item])
+                for child, distance in zip(children.tolist(), self.box_distances(children, point).tolist()):
+                    heapq.heappush(queue, (distance, False, child))
+        return self.order[np.array(found, dtype=np.intp)]
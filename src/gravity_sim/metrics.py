@@ -0,0 +1,195 @@
+import json
+import threading
+import time
+from contextlib import nullcontext
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from gravity_sim.simulation import Simulation
+
+
+class _Timer:
+    """Context manager adding the time spent inside it to a timer of a Metrics registry."""
+
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self.metrics.add_time(self.name, time.perf_counter() - self.start)
+
+
+class Metrics:
+    """Registry of named timers, counters and gauges describing where a simulation spends its time.
+
+    Timers accumulate seconds and calls, counters accumulate totals such as tree nodes visited, and
+    gauges hold the latest value of a measurement such as the depth of the tree. Values accumulate
+    until collect() returns and clears them, so each reader sees the totals since its last read.
+
+    Recording is safe from several threads. A disabled registry ignores everything recorded to it.
+    """
+
+    def __init__(self, enabled: bool = True):
+        """Create a new empty registry.
+
+        Args:
+            enabled (bool, optional): Record values, a disabled registry costs almost nothing. Defaults to True.
+        """
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __getstate__(self) -> dict:
+        """Pickle only the setting, copies in worker processes start empty and are never read back."""
+        return {"enabled": self.enabled}
+
+    def __setstate__(self, state: dict) -> None:
+        """Restore an empty registry."""
+        self.__init__(**state)
+
+    def reset(self) -> None:
+        """Clear every timer, counter and gauge."""
+        with self._lock:
+            self._clear()
+
+    def _clear(self) -> None:
+        """Clear every value, the lock must be held."""
+        self.timers: dict[str, list] = {}
+        self.counters: dict[str, int] = {}
+        self.gauges: dict[str, float] = {}
+
+    def timer(self, name: str):
+        """Return a context manager timing the code inside it.
+
+        Args:
+            name (str): Name of the timer.
+
+        Returns:
+            A context manager adding its wall time to the timer.
+        """
+        return _Timer(self, name) if self.enabled else nullcontext()
+
+    def add_time(self, name: str, seconds: float) -> None:
+        """Add one call taking a number of seconds to a timer.
+
+        Args:
+            name (str): Name of the timer.
+            seconds (float): The wall time of the call.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            timer = self.timers.setdefault(name, [0.0, 0])
+            timer[0] += seconds
+            timer[1] += 1
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Add to a counter.
+
+        Args:
+            name (str): Name of the counter.
+            amount (int, optional): The amount to add. Defaults to 1.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + int(amount)
+
+    def gauge(self, name: str, value: float) -> None:
+        """Set a gauge to its latest value.
+
+        Args:
+            name (str): Name of the gauge.
+            value (float): The value.
+        """
+        if self.enabled:
+            self.gauges[name] = value
+
+    def snapshot(self) -> dict:
+        """Return the current values, which can be written as JSON.
+
+        Returns:
+            dict: The seconds and calls of each timer, and the value of each counter and gauge.
+        """
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self) -> dict:
+        """Return the current values, the lock must be held."""
+        return {
+            "timers": {name: {"seconds": seconds, "calls": calls} for name, (seconds, calls) in self.timers.items()},
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+        }
+
+    def collect(self) -> dict:
+        """Return the current values and clear them.
+
+        Returns:
+            dict: The values, as returned by snapshot().
+        """
+        with self._lock:
+            snapshot = self._snapshot()
+            self._clear()
+        return snapshot
+
+
+def format_snapshot(snapshot: dict) -> list[str]:
+    """Return the values of a snapshot as lines of text.
+
+    Timers show the mean time per call, and counters are divided by the "steps" counter when there is one,
+    so they read as per step values.
+
+    Args:
+        snapshot (dict): A snapshot from Metrics.snapshot() or Metrics.collect().
+
+    Returns:
+        list[str]: One line per timer, counter and gauge.
+    """
+    lines = []
+    for name, timer in sorted(snapshot["timers"].items()):
+        lines.append(f"{name}: {timer['seconds'] / timer['calls'] * 1000:.2f} ms x{timer['calls']}")
+    steps = snapshot["counters"].get("steps", 0)
+    for name, value in sorted(snapshot["counters"].items()):
+        if name != "steps":
+            lines.append(f"{name}: {value / steps:,.0f}/step" if steps else f"{name}: {value:,}")
+    for name, value in sorted(snapshot["gauges"].items()):
+        lines.append(f"{name}: {value:g}")
+    return lines
+
+
+class MetricsExporter:
+    """Appends the metrics of a simulation to a JSON-lines file, one line per export."""
+
+    def __init__(self, filename: str, append: bool = False):
+        """Open a metrics file.
+
+        Args:
+            filename (str): The file to write.
+            append (bool, optional): Add to an existing file instead of replacing it, for resumed runs.
+                Defaults to False.
+        """
+        self.filename = filename
+        self.file = open(filename, "a" if append else "w")
+        self.export_count = 0
+
+    def export(self, simulation: "Simulation") -> None:
+        """Write and clear the metrics collected since the last export.
+
+        Args:
+            simulation (Simulation): The simulation whose metrics to write.
+        """
+        record = {"step": simulation.step_count, "time": simulation.time, "wall_time": time.time()}
+        record.update(simulation.metrics.collect())
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        self.export_count += 1
+
+    def close(self) -> None:
+        """Close the file."""
+        self.file.close()
@@ -1,7 +1,9 @@
 import random
 from dataclasses import dataclass, field
 from decimal import Decimal
+from typing import Optional
 
+from gravity_sim.state import BodyState
 from gravity_sim.vector import Vector
 
 
@@ -72,21 +74,99 @@ class Color:
         return str(tuple(self))
 
 
+class _StateVector:
+    """Descriptor storing a Vector attribute on an Object, or on its row of a BodyState once bound."""
+
+    def __init__(self, array: str):
+        """Create a descriptor backed by the given BodyState array.
+
+        Args:
+            array (str): Name of the BodyState array holding this attribute.
+        """
+        self.array = array
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        """Store the name of the instance attribute used while unbound."""
+        self.private_name = f"_{name}"
+
+    def __get__(self, obj: Optional["Object"], owner: type = None):
+        """Return the vector, read from the bound state if there is one."""
+        if obj is None:
+            # Dataclass default, replaced with a zero vector in __set__
+            return self
+        state = obj.__dict__.get("_state")
+        if state is None:
+            return obj.__dict__[self.private_name]
+        return Vector(getattr(state, self.array)[obj.index].tolist())
+
+    def __set__(self, obj: "Object", value: Vector) -> None:
+        """Set the vector, writing through to the bound state if there is one."""
+        if value is self:
+            value = Vector()
+        state = obj.__dict__.get("_state")
+        if state is None:
+            obj.__dict__[self.private_name] = value
+        else:
+            getattr(state, self.array)[obj.index] = state.precision.array(tuple(value))
+
+
+class _StateScalar:
+    """Descriptor storing a Decimal attribute on an Object, or on its entry of a BodyState once bound."""
+
+    def __init__(self, array: str):
+        """Create a descriptor backed by the given BodyState array.
+
+        Args:
+            array (str): Name of the BodyState array holding this attribute.
+        """
+        self.array = array
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        """Store the name of the instance attribute used while unbound."""
+        self.private_name = f"_{name}"
+
+    def __get__(self, obj: Optional["Object"], owner: type = None):
+        """Return the value, read from the bound state if there is one."""
+        if obj is None:
+            # Dataclass default, replaced with zero in __set__
+            return self
+        state = obj.__dict__.get("_state")
+        if state is None:
+            return obj.__dict__[self.private_name]
+        return Decimal(str(getattr(state, self.array)[obj.index]))
+
+    def __set__(self, obj: "Object", value: Decimal) -> None:
+        """Set the value, writing through to the bound state if there is one."""
+        if value is self:
+            value = Decimal(0)
+        state = obj.__dict__.get("_state")
+        if state is None:
+            obj.__dict__[self.private_name] = value
+        else:
+            getattr(state, self.array)[obj.index] = state.precision.scalar(value)
+
+
 @dataclass
 class Object:
-    """Represents an object in a simulation."""
+    """Represents an object in a simulation.
+
+    Once bound to a BodyState the object is only a view: mass, position, velocity and force are read
+    from and written to the object's row of the state's arrays.
+    """
 
     name: str
-    mass: int
-    position: Vector = field(default_factory=Vector)
-    velocity: Vector = field(default_factory=Vector)
+    mass: Decimal = _StateScalar("masses")
+    position: Vector = _StateVector("positions")
+    velocity: Vector = _StateVector("velocities")
     color: Color = field(default_factory=Color.random_colour)
     satellite_data: list[dict] = field(default_factory=list)
 
-    force: Vector = field(default_factory=Vector)
+    force: Vector = _StateVector("forces")
 
     def __post_init__(self):
         """Initialise satellites."""
+        self._state = None
+        self.index = None
         self.satellites = []
         for obj in self.satellite_data:
             self.satellites.append(self.__class__.from_dict(obj, rel_pos=self.position, rel_vel=self.velocity))
@@ -150,11 +230,12 @@ class Object:
             satellites.extend(satellite.get_satellites())
         return satellites
 
-    def step(self, timestep: Decimal) -> None:
-        """Recalculate position based on current force value and timestep.
+    def bind(self, state: BodyState, index: int) -> None:
+        """Make this object a view onto a row of a BodyState.
 
         Args:
-            timestep (float): Time passed in seconds.
+            state (BodyState): The state holding the object's physical values.
+            index (int): The row of the state belonging to this object.
         """
-        self.velocity += self.force / self.mass * timestep
-        self.position += self.velocity * timestep
+        self._state = state
+        self.index = index
@@ -0,0 +1,373 @@
+import multiprocessing
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+
+from gravity_sim.force_engine import ForceEngine
+from gravity_sim.metrics import Metrics
+
+ALIGNMENT = 64
+
+
+class SharedArrays:
+    """A growable shared memory block holding named arrays, published by one process and read by others.
+
+    publish() copies arrays into the block and returns a layout, a small picklable description of where
+    each array is. Other processes pass the layout to attach() to get views of the arrays without copying.
+    """
+
+    def __init__(self):
+        """Create an empty set of shared arrays, the block is allocated on the first publish."""
+        self.block: Optional[shared_memory.SharedMemory] = None
+        self._attached: dict[str, shared_memory.SharedMemory] = {}
+
+    def publish(self, arrays: dict[str, np.ndarray]) -> tuple[str, dict]:
+        """Copy arrays into shared memory, replacing any previously published arrays.
+
+        Args:
+            arrays (dict[str, np.ndarray]): The arrays by name, any dtype except object.
+
+        Returns:
+            tuple[str, dict]: The name of the block and the offset, dtype and shape of each array.
+        """
+        layout = {}
+        offset = 0
+        for key, array in arrays.items():
+            layout[key] = (offset, array.dtype.str, array.shape)
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        if self.block is None or self.block.size < offset:
+            self.release()
+            # Grow with headroom so bodies or tree nodes being added do not reallocate every step
+            self.block = shared_memory.SharedMemory(create=True, size=max(offset * 2, ALIGNMENT))
+        views = self.views(self.block, layout)
+        for key, array in arrays.items():
+            views[key][...] = array
+        return self.block.name, layout
+
+    def attach(self, name: str, layout: dict) -> dict[str, np.ndarray]:
+        """Return views of arrays published by another process.
+
+        Args:
+            name (str): The name of the block returned by publish().
+            layout (dict): The layout returned by publish().
+
+        Returns:
+            dict[str, np.ndarray]: Writable views of the arrays by name.
+        """
+        if name not in self._attached:
+            self.detach()
+            self._attached[name] = shared_memory.SharedMemory(name=name)
+        return self.views(self._attached[name], layout)
+
+    @staticmethod
+    def views(block: shared_memory.SharedMemory, layout: dict) -> dict[str, np.ndarray]:
+        """Return views of the arrays in a block.
+
+        Args:
+            block (shared_memory.SharedMemory): The block holding the arrays.
+            layout (dict): The offset, dtype and shape of each array.
+
+        Returns:
+            dict[str, np.ndarray]: The arrays by name.
+        """
+        return {
+            key: np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)
+            for key, (offset, dtype, shape) in layout.items()
+        }
+
+    def detach(self) -> None:
+        """Close every block attached from another process."""
+        for block in self._attached.values():
+            block.close()
+        self._attached.clear()
+
+    def release(self) -> None:
+        """Close and free the published block."""
+        if self.block is not None:
+            self.block.close()
+            self.block.unlink()
+            self.block = None
+
+
+def _work(connection, engine: ForceEngine) -> None:
+    """Evaluate chunks of targets for the parent process until told to stop.
+
+    Each message is the block name and layout of the published arrays, the gravitational constant and the
+    chunks of the targets array to evaluate. Accelerations are written to the shared result array and the
+    worker replies with None, or the exception if evaluation failed.
+
+    Args:
+        connection: The worker's end of a pipe to the parent process.
+        engine (ForceEngine): The engine to evaluate with.
+    """
+    shared = SharedArrays()
+    try:
+        while (message := connection.recv()) is not None:
+            name, layout, grav_constant, chunks = message
+            try:
+                arrays = shared.attach(name, layout)
+                prepared = {key[len("prepared_") :]: arrays[key] for key in layout if key.startswith("prepared_")}
+                for start, end in chunks:
+                    arrays["result"][start:end] = engine.evaluate(
+                        prepared, arrays["positions"], arrays["masses"], grav_constant, arrays["targets"][start:end]
+                    )
+                connection.send(None)
+            except Exception as error:  # Reported to the parent, which raises it
+                connection.send(error)
+            finally:
+                arrays = prepared = None
+    finally:
+        shared.detach()
+        connection.close()
+
+
+def _shutdown(processes: list, connections: list, shared: SharedArrays) -> None:
+    """Stop the worker processes and free the shared memory of a ProcessEngine.
+
+    Args:
+        processes (list): The worker processes.
+        connections (list): The parent's end of the pipe to each worker.
+        shared (SharedArrays): The published arrays.
+    """
+    for connection in connections:
+        try:
+            connection.send(None)
+            connection.close()
+        except OSError:
+            pass
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+    shared.release()
+
+
+class ParallelEngine(ForceEngine):
+    """Base class for engines that run another force engine on several workers at once.
+
+    The targets are put in the engine's locality order and split into chunks of a fixed size, each
+    evaluated by one call to the engine, so the result is bit for bit identical whatever the number
+    of workers.
+    """
+
+    def __init__(self, engine: ForceEngine, workers: int = 2, chunk_size: int = 256):
+        """Create a new parallel engine, the workers are started by the first evaluation.
+
+        Args:
+            engine (ForceEngine): The engine run by each worker.
+            workers (int, optional): The number of workers. Defaults to 2.
+            chunk_size (int, optional): The number of targets evaluated by each call to the engine.
+                Defaults to 256.
+
+        Raises:
+            ValueError: If workers or chunk_size is not positive.
+        """
+        if workers < 1:
+            raise ValueError(f"Number of workers must be positive, got {workers}.")
+        if chunk_size < 1:
+            raise ValueError(f"Chunk size must be positive, got {chunk_size}.")
+        self.engine = engine
+        self.workers = workers
+        self.chunk_size = chunk_size
+
+    def set_metrics(self, metrics: Metrics) -> None:
+        """Record timings and counts to a registry, from this engine and the engine it runs.
+
+        Counts recorded by worker processes are not collected.
+
+        Args:
+            metrics (Metrics): The registry.
+        """
+        self.metrics = metrics
+        self.engine.set_metrics(metrics)
+
+    @property
+    def last_tree(self):
+        """The tree built by the engine during the most recent evaluation."""
+        return self.engine.last_tree
+
+    @property
+    def targeted(self) -> bool:
+        """Whether the engine evaluates a few targets for less than every body."""
+        return self.engine.targeted
+
+    def chunks(self, num_targets: int) -> list[tuple[int, int]]:
+        """Return the start and end of each chunk of the targets.
+
+        Args:
+            num_targets (int): The number of targets.
+
+        Returns:
+            list[tuple[int, int]]: The range of each chunk.
+        """
+        return [(start, min(start + self.chunk_size, num_targets)) for start in range(0, num_targets, self.chunk_size)]
+
+    def close(self) -> None:
+        """Stop the workers, they are started again by the next evaluation."""
+
+
+class ProcessEngine(ParallelEngine):
+    """Runs another force engine on a pool of worker processes, splitting the target bodies between them.
+
+    Positions, masses and the arrays from the engine's prepare(), such as its tree, are published in
+    shared memory once per evaluation and every worker writes its accelerations into a shared result
+    array, so only the small layout of the arrays is sent to the workers.
+    """
+
+    def __init__(self, engine: ForceEngine, workers: int = 2, chunk_size: int = 256):
+        """Create a new process engine, the workers are started by the first evaluation.
+
+        Args:
+            engine (ForceEngine): The engine run by each worker, it is copied to the workers.
+            workers (int, optional): The number of worker processes. Defaults to 2.
+            chunk_size (int, optional): The number of targets evaluated by each call to the engine.
+                Defaults to 256.
+
+        Raises:
+            ValueError: If workers or chunk_size is not positive.
+        """
+        super().__init__(engine, workers, chunk_size)
+        self._processes = []
+        self._connections = []
+        self._shared = SharedArrays()
+        self._finalizer = None
+
+    def start(self) -> None:
+        """Start the worker processes if they are not running."""
+        if self._processes:
+            return
+        # Spawned workers are safe to start from a process running other threads, unlike forked ones
+        context = multiprocessing.get_context("spawn")
+        for index in range(self.workers):
+            parent, child = context.Pipe()
+            process = context.Process(
+                target=_work, args=(child, self.engine), name=f"force-worker-{index}", daemon=True
+            )
+            process.start()
+            child.close()
+            self._processes.append(process)
+            self._connections.append(parent)
+        self._finalizer = weakref.finalize(self, _shutdown, self._processes, self._connections, self._shared)
+
+    def close(self) -> None:
+        """Stop the worker processes and free the shared memory."""
+        if self._finalizer is not None:
+            self._finalizer()
+        self._processes = []
+        self._connections = []
+
+    def accelerations(
+        self,
+        positions: np.ndarray,
+        masses: np.ndarray,
+        grav_constant: float,
+        targets: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Compute the acceleration of the target bodies on the worker processes.
+
+        Args:
+            positions (np.ndarray): Positions of all bodies, shape (n, 2).
+            masses (np.ndarray): Masses of all bodies, shape (n,).
+            grav_constant (float): The gravitational constant.
+            targets (Optional[np.ndarray], optional): Indices of the bodies to compute accelerations for.
+                Defaults to None for every body.
+
+        Raises:
+            ValueError: If the arrays hold Decimal values, which cannot be shared.
+            RuntimeError: If a worker failed.
+
+        Returns:
+            np.ndarray: Accelerations of the targets in order, shape (len(targets), 2).
+        """
+        if positions.dtype == object:
+            raise ValueError("Decimal precision cannot be used with worker processes.")
+        targets = self.resolve_targets(len(masses), targets)
+        self.start()
+        prepared = self.engine.prepare(positions, masses)
+        order = self.engine.locality_order(prepared, targets)
+        arrays = {"positions": positions, "masses": masses, "targets": targets[order]}
+        arrays.update((f"prepared_{key}", array) for key, array in prepared.items())
+        arrays["result"] = np.empty((len(targets), 2), dtype=positions.dtype)
+        name, layout = self._shared.publish(arrays)
+
+        chunks = self.chunks(len(targets))
+        for index, connection in enumerate(self._connections):
+            connection.send((name, layout, grav_constant, chunks[index :: self.workers]))
+        errors = [error for connection in self._connections if (error := connection.recv()) is not None]
+        if errors:
+            raise RuntimeError("Force evaluation failed in a worker process.") from errors[0]
+        result = np.empty((len(targets), 2), dtype=positions.dtype)
+        result[order] = SharedArrays.views(self._shared.block, {"result": layout["result"]})["result"]
+        return result
+
+
+class ThreadEngine(ParallelEngine):
+    """Runs another force engine on a pool of threads, splitting the target bodies between them.
+
+    NumPy releases the GIL during array math, so the threads evaluate chunks in parallel while sharing
+    the arrays and the engine's prepared tree directly, without the startup and memory cost of processes.
+    The engine's evaluate() must be safe to call from several threads at once.
+    """
+
+    def __init__(self, engine: ForceEngine, workers: int = 2, chunk_size: int = 256):
+        """Create a new thread engine, the threads are started by the first evaluation.
+
+        Args:
+            engine (ForceEngine): The engine evaluated by each thread.
+            workers (int, optional): The number of threads. Defaults to 2.
+            chunk_size (int, optional): The number of targets evaluated by each call to the engine.
+                Defaults to 256.
+
+        Raises:
+            ValueError: If workers or chunk_size is not positive.
+        """
+        super().__init__(engine, workers, chunk_size)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def close(self) -> None:
+        """Stop the threads."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def accelerations(
+        self,
+        positions: np.ndarray,
+        masses: np.ndarray,
+        grav_constant: float,
+        targets: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Compute the acceleration of the target bodies on the threads.
+
+        Args:
+            positions (np.ndarray): Positions of all bodies, shape (n, 2).
+            masses (np.ndarray): Masses of all bodies, shape (n,).
+            grav_constant (float): The gravitational constant.
+            targets (Optional[np.ndarray], optional): Indices of the bodies to compute accelerations for.
+                Defaults to None for every body.
+
+        Returns:
+            np.ndarray: Accelerations of the targets in order, shape (len(targets), 2).
+        """
+        targets = self.resolve_targets(len(masses), targets)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="force-worker")
+        prepared = self.engine.prepare(positions, masses)
+        order = self.engine.locality_order(prepared, targets)
+        ordered_targets = targets[order]
+        ordered = np.empty((len(targets), 2), dtype=positions.dtype)
+
+        def evaluate(chunk: tuple[int, int]) -> None:
+            start, end = chunk
+            ordered[start:end] = self.engine.evaluate(
+                prepared, positions, masses, grav_constant, ordered_targets[start:end]
+            )
+
+        # Consuming the results waits for every chunk and raises the first error
+        list(self._executor.map(evaluate, self.chunks(len(targets))))
+        result = np.empty_like(ordered)
+        result[order] = ordered
+        return result
@@ -0,0 +1,199 @@
+import math
+
+import numpy as np
+
+from gravity_sim.force_engine import SolverEngine
+
+
+class PMEngine(SolverEngine):
+    """Particle-mesh force engine, solving for the potential on a grid with FFTs. O(n + g^2 log g).
+
+    Masses are deposited onto a square grid covering the bodies with cloud-in-cell weights, convolved
+    with the Green's function of the potential using FFTs of a grid padded to twice the size, so the
+    boundaries are isolated rather than periodic, then differentiated and interpolated back to the bodies
+    with the same weights.
+
+    Forces between bodies closer than a few cells are not resolved by the grid. With p3m the Green's
+    function is split into a smooth long range part, -erf(r / 2r_s) / r, solved on the grid and the
+    remaining short range part, which is summed directly between bodies within cutoff * r_s.
+    """
+
+    # The number of body pairs summed at once in the short range correction, to bound the memory used
+    BATCH_SIZE = 1 << 16
+
+    def __init__(self, grid_size: int = 256, p3m: bool = False, split: float = 2.0, cutoff: float = 4.5):
+        """Create a new particle-mesh engine.
+
+        Args:
+            grid_size (int, optional): The number of grid points along each side. Defaults to 256.
+            p3m (bool, optional): Sum short range forces directly, which is far more accurate for bodies
+                that are close together. Defaults to False.
+            split (float, optional): The scale r_s splitting long and short range forces, in grid cells.
+                Defaults to 2.0.
+            cutoff (float, optional): The distance short range forces are summed to, in units of r_s.
+                Defaults to 4.5.
+
+        Raises:
+            ValueError: If the grid has fewer than 4 points along each side, or split or cutoff are not positive.
+        """
+        if grid_size < 4:
+            raise ValueError(f"Grid size must be at least 4, got {grid_size}.")
+        if split <= 0 or cutoff <= 0:
+            raise ValueError(f"Split and cutoff must be positive, got {split} and {cutoff}.")
+        self.grid_size = grid_size
+        self.p3m = p3m
+        self.split = split
+        self.cutoff = cutoff
+        self._green = self.green_function()
+
+    @staticmethod
+    def erfc(values: np.ndarray) -> np.ndarray:
+        """Return the complementary error function of non-negative values, accurate to about 1e-7.
+
+        Uses the rational approximation 7.1.26 of Abramowitz and Stegun, as NumPy has no erfc.
+
+        Args:
+            values (np.ndarray): The values, all at least 0.
+
+        Returns:
+            np.ndarray: erfc of each value.
+        """
+        t = 1 / (1 + 0.3275911 * values)
+        polynomial = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+        return polynomial * np.exp(-values * values)
+
+    def green_function(self) -> np.ndarray:
+        """Return the FFT of the Green's function on the padded grid, for a grid spacing of 1.
+
+        Returns:
+            np.ndarray: The real FFT of the Green's function, shape (2g, g + 1).
+        """
+        padded = 2 * self.grid_size
+        offsets = np.arange(padded)
+        offsets = np.where(offsets < self.grid_size, offsets, offsets - padded)
+        distances = np.hypot(offsets[:, np.newaxis], offsets[np.newaxis, :])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if self.p3m:
+                green = -(1 - self.erfc(distances / (2 * self.split))) / distances
+                green[0, 0] = -1 / (math.sqrt(math.pi) * self.split)
+            else:
+                green = -1 / distances
+                # The mean of 1 / r over a cell
+                green[0, 0] = -4 * math.log(1 + math.sqrt(2))
+        return np.fft.rfft2(green)
+
+    def solve(self, positions: np.ndarray, masses: np.ndarray) -> np.ndarray:
+        """Compute the acceleration of every body, without the gravitational constant.
+
+        Args:
+            positions (np.ndarray): Positions of all bodies, shape (n, 2).
+            masses (np.ndarray): Masses of all bodies, shape (n,).
+
+        Returns:
+            np.ndarray: The accelerations, shape (n, 2), with the dtype of the positions.
+        """
+        points = positions.astype(np.float64)
+        body_masses = masses.astype(np.float64)
+        lower, upper = points.min(axis=0), points.max(axis=0)
+        # One spare cell on each side keeps every cloud and every difference inside the grid
+        spacing = float(np.max(upper - lower)) / (self.grid_size - 3) or 1.0
+        origin = (lower + upper) / 2 - spacing * (self.grid_size - 1) / 2
+
+        with self.metrics.timer("mesh_deposit"):
+            cells, weights = self.cloud_in_cell(points, origin, spacing)
+            grid_masses = np.zeros(self.grid_size * self.grid_size)
+            for corner_cells, corner_weights in zip(cells, weights):
+                grid_masses += np.bincount(corner_cells, corner_weights * body_masses, minlength=len(grid_masses))
+
+        with self.metrics.timer("mesh_solve"):
+            padded = 2 * self.grid_size
+            transform = np.fft.rfft2(grid_masses.reshape(self.grid_size, self.grid_size), s=(padded, padded))
+            potential = np.fft.irfft2(transform * self._green, s=(padded, padded))[: self.grid_size, : self.grid_size]
+            potential /= spacing
+            field = [-gradient.ravel() for gradient in np.gradient(potential, spacing)]
+
+        accelerations = np.zeros_like(points)
+        for corner_cells, corner_weights in zip(cells, weights):
+            accelerations[:, 0] += corner_weights * field[0][corner_cells]
+            accelerations[:, 1] += corner_weights * field[1][corner_cells]
+        if self.p3m:
+            with self.metrics.timer("short_range"):
+                accelerations += self.short_range(points, body_masses, self.split * spacing)
+        return accelerations.astype(positions.dtype, copy=False)
+
+    def cloud_in_cell(self, points: np.ndarray, origin: np.ndarray, spacing: float) -> tuple[list, list]:
+        """Return the four grid points around each body and their cloud-in-cell weights.
+
+        Args:
+            points (np.ndarray): Positions of the bodies, shape (n, 2).
+            origin (np.ndarray): Position of the first grid point.
+            spacing (float): Distance between grid points.
+
+        Returns:
+            tuple[list, list]: The flat index of each corner for every body, and the weight of each corner.
+        """
+        scaled = (points - origin) / spacing
+        base = np.clip(np.floor(scaled).astype(np.intp), 0, self.grid_size - 2)
+        fraction = scaled - base
+        cells = []
+        weights = []
+        for dx, dy in ((0, 0), (1, 0), (0, 1), (1, 1)):
+            cells.append((base[:, 0] + dx) * self.grid_size + base[:, 1] + dy)
+            x_weights = fraction[:, 0] if dx else 1 - fraction[:, 0]
+            y_weights = fraction[:, 1] if dy else 1 - fraction[:, 1]
+            weights.append(x_weights * y_weights)
+        return cells, weights
+
+    def short_range(self, points: np.ndarray, masses: np.ndarray, scale: float) -> np.ndarray:
+        """Sum the short range part of the forces between bodies closer than the cutoff.
+
+        Bodies are binned into square cells the size of the cutoff, so only pairs of neighbouring cells
+        need to be checked.
+
+        Args:
+            points (np.ndarray): Positions of the bodies, shape (n, 2).
+            masses (np.ndarray): Masses of the bodies, shape (n,).
+            scale (float): The splitting scale r_s.
+
+        Returns:
+            np.ndarray: The short range acceleration of each body, shape (n, 2).
+        """
+        cutoff = self.cutoff * scale
+        bins = np.floor((points - points.min(axis=0)) / cutoff).astype(np.int64)
+        rows = int(bins[:, 1].max()) + 3
+        # Offset by one so neighbours of the edge bins have non-negative keys
+        keys = (bins[:, 0] + 1) * rows + bins[:, 1] + 1
+        order = np.argsort(keys, kind="stable")
+        occupied, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+
+        first = []
+        second = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                neighbours = occupied + dx * rows + dy
+                found = np.minimum(np.searchsorted(occupied, neighbours), len(occupied) - 1)
+                valid = occupied[found] == neighbours
+                first.append(np.flatnonzero(valid))
+                second.append(found[valid])
+        first = np.concatenate(first)
+        second = np.concatenate(second)
+
+        accelerations = np.zeros_like(points)
+        batches = np.cumsum(counts[first] * counts[second]) // self.BATCH_SIZE
+        boundaries = np.concatenate(([0], np.flatnonzero(np.diff(batches)) + 1, [len(first)]))
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            targets, sources = self.range_pairs(
+                starts[first[start:end]], counts[first[start:end]], starts[second[start:end]], counts[second[start:end]]
+            )
+            targets, sources = order[targets], order[sources]
+            separations = points[sources] - points[targets]
+            distances = np.hypot(separations[:, 0], separations[:, 1])
+            near = (distances > 0) & (distances < cutoff)
+            targets, separations, distances = targets[near], separations[near], distances[near]
+            self.metrics.count("interactions", len(targets))
+            ratios = distances / (2 * scale)
+            shapes = self.erfc(ratios) + 2 * ratios / math.sqrt(math.pi) * np.exp(-ratios * ratios)
+            pulls = separations * (masses[sources[near]] * shapes / distances**3)[:, np.newaxis]
+            accelerations[:, 0] += np.bincount(targets, pulls[:, 0], minlength=len(points))
+            accelerations[:, 1] += np.bincount(targets, pulls[:, 1], minlength=len(points))
+        return accelerations
@@ -0,0 +1,75 @@
+from decimal import Decimal
+from typing import Union
+
+import numpy as np
+
+Scalar = Union[Decimal, np.floating]
+
+
+class Precision:
+    """The arithmetic backend used for the body state and the force calculations.
+
+    "float64" and "float32" store the state in NumPy arrays of that type. "decimal" stores it in object
+    arrays of Decimal, which is much slower but gives a high precision reference to compare against.
+    """
+
+    NAMES = ("decimal", "float64", "float32")
+
+    def __init__(self, name: str = "float64"):
+        """Create a new precision backend.
+
+        Args:
+            name (str, optional): The backend, "decimal", "float64" or "float32". Defaults to "float64".
+
+        Raises:
+            ValueError: If the name is not recognised.
+        """
+        if name not in self.NAMES:
+            raise ValueError(f"Unknown precision '{name}', expected one of {self.NAMES}.")
+        self.name = name
+        self.dtype = np.dtype(object) if name == "decimal" else np.dtype(name)
+
+    def __repr__(self) -> str:
+        """Return a text representation of the precision."""
+        return f"Precision({self.name!r})"
+
+    def __eq__(self, other: object) -> bool:
+        """Return True if the other object is a precision with the same name."""
+        return isinstance(other, Precision) and other.name == self.name
+
+    @property
+    def is_decimal(self) -> bool:
+        """True if values are stored as Decimal."""
+        return self.name == "decimal"
+
+    def scalar(self, value: Union[int, float, str, Decimal, np.number]) -> Scalar:
+        """Convert a number to this precision.
+
+        Floats are converted to Decimal through their shortest representation, so a value read from a
+        config file as a float converts to the Decimal that was written.
+
+        Args:
+            value (Union[int, float, str, Decimal, np.number]): The number to convert.
+
+        Returns:
+            Scalar: The number as a Decimal or NumPy float.
+        """
+        if self.is_decimal:
+            return value if isinstance(value, Decimal) else Decimal(str(value))
+        return self.dtype.type(value)
+
+    def array(self, values) -> np.ndarray:
+        """Convert an array-like of numbers to a contiguous array of this precision.
+
+        Args:
+            values: Any array-like of numbers.
+
+        Returns:
+            np.ndarray: The converted array, a copy only if needed.
+        """
+        if not self.is_decimal:
+            return np.ascontiguousarray(values, dtype=self.dtype)
+        values = np.asarray(values, dtype=object)
+        converted = np.empty(values.shape, dtype=object)
+        converted.flat = [self.scalar(value) for value in values.flat]
+        return converted
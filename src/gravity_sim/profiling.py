@@ -0,0 +1,139 @@
+import cProfile
+import os
+import pstats
+
+from gravity_sim.simulation import Simulation
+
+# Recursion below this depth is cut off when building collapsed stacks
+MAX_STACK_DEPTH = 100
+# Stacks taking less than this fraction of the profile are left out of collapsed stacks
+MIN_STACK_FRACTION = 1e-5
+
+
+def profile_steps(simulation: Simulation, steps: int, force_only: bool = False) -> pstats.Stats:
+    """Step a simulation under cProfile.
+
+    Only the calling thread is profiled, so forces evaluated on threads or worker processes show up as the
+    time spent waiting for them.
+
+    Args:
+        simulation (Simulation): The simulation to step.
+        steps (int): The number of steps.
+        force_only (bool, optional): Only profile force evaluation, leaving out the integrator and everything
+            else in a step. Defaults to False.
+
+    Returns:
+        pstats.Stats: The profile.
+    """
+    profiler = cProfile.Profile()
+    if force_only:
+        calc_accelerations = simulation.calc_accelerations
+
+        def profiled(*args, **kwargs):
+            profiler.enable()
+            try:
+                return calc_accelerations(*args, **kwargs)
+            finally:
+                profiler.disable()
+
+        simulation.calc_accelerations = profiled
+        try:
+            for _ in range(steps):
+                simulation.step()
+        finally:
+            del simulation.calc_accelerations
+    else:
+        profiler.enable()
+        try:
+            for _ in range(steps):
+                simulation.step()
+        finally:
+            profiler.disable()
+    return pstats.Stats(profiler)
+
+
+def function_label(function: tuple[str, int, str]) -> str:
+    """Return a short label for a function in a profile, its file name, line and name.
+
+    Args:
+        function (tuple[str, int, str]): The file, line and name of the function, as used by pstats.
+
+    Returns:
+        str: The label, without semicolons as they separate the frames of collapsed stacks.
+    """
+    filename, line, name = function
+    if filename == "~":
+        # Built in functions have no file, their name already describes them
+        return name.replace(";", ",")
+    return f"{os.path.basename(filename)}:{line}({name})".replace(";", ",")
+
+
+def collapsed_stacks(stats: pstats.Stats) -> dict[str, int]:
+    """Return the time spent in each call stack of a profile, in microseconds.
+
+    cProfile only records the time of each caller and callee pair, not of whole stacks, so stacks are
+    rebuilt by walking down from the functions with no callers and splitting the time of each function
+    between its callees in proportion to the time each call took, as flame graph converters for cProfile do.
+    Recursive calls are folded into the first call on the stack, and stacks taking less than
+    MIN_STACK_FRACTION of the total time are left out.
+
+    Args:
+        stats (pstats.Stats): The profile.
+
+    Returns:
+        dict[str, int]: The time spent in each stack, with frames separated by semicolons.
+    """
+    callees: dict[tuple, dict[tuple, float]] = {}
+    for function, (_, _, _, _, callers) in stats.stats.items():
+        for caller, (_, _, _, cumulative) in callers.items():
+            callees.setdefault(caller, {})[function] = cumulative
+
+    roots = [function for function, (*_, callers) in stats.stats.items() if not callers]
+    threshold = sum(stats.stats[root][3] for root in roots) * MIN_STACK_FRACTION
+    stacks: dict[str, int] = {}
+
+    def walk(function: tuple, budget: float, path: tuple, labels: str) -> None:
+        _, _, own_time, cumulative, _ = stats.stats[function]
+        fraction = budget / cumulative if cumulative else 0.0
+        microseconds = round(own_time * fraction * 1e6)
+        if microseconds:
+            stacks[labels] = stacks.get(labels, 0) + microseconds
+        for callee, callee_time in callees.get(function, {}).items():
+            share = callee_time * fraction
+            if callee in path or share < threshold or len(path) >= MAX_STACK_DEPTH:
+                continue
+            walk(callee, share, path + (callee,), f"{labels};{function_label(callee)}")
+
+    for root in roots:
+        walk(root, stats.stats[root][3], (root,), function_label(root))
+    return stacks
+
+
+def write_profile(stats: pstats.Stats, output: str) -> tuple[str, str]:
+    """Write a profile as a .pstats file and a collapsed stack file for flame graph tools.
+
+    Args:
+        stats (pstats.Stats): The profile.
+        output (str): The path of the files without an extension.
+
+    Returns:
+        tuple[str, str]: The paths of the .pstats and .collapsed files.
+    """
+    pstats_file = f"{output}.pstats"
+    collapsed_file = f"{output}.collapsed"
+    stats.dump_stats(pstats_file)
+    with open(collapsed_file, "w") as file:
+        for stack, microseconds in sorted(collapsed_stacks(stats).items()):
+            file.write(f"{stack} {microseconds}\n")
+    return pstats_file, collapsed_file
+
+
+def print_top(stats: pstats.Stats, top: int, sort: str = "cumulative") -> None:
+    """Print the functions taking the most time.
+
+    Args:
+        stats (pstats.Stats): The profile.
+        top (int): The number of functions to print.
+        sort (str, optional): The pstats sort key. Defaults to "cumulative".
+    """
+    stats.sort_stats(sort).print_stats(top)
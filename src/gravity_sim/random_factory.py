@@ -34,3 +34,25 @@ class RandomFactory:
         """
         if not cls._random:
             cls._random = Random(seed)
+
+    @classmethod
+    def get_state(cls) -> Optional[tuple]:
+        """Return the internal state of the random number generator.
+
+        Returns:
+            Optional[tuple]: The state from Random.getstate(), or None if set_random() has not been called.
+        """
+        if cls._random is None:
+            return None
+        return cls._random.getstate()
+
+    @classmethod
+    def set_state(cls, state: tuple) -> None:
+        """Restore the random number generator to a previous state, creating it if needed.
+
+        Args:
+            state (tuple): A state returned by get_state().
+        """
+        if cls._random is None:
+            cls._random = Random()
+        cls._random.setstate(state)
@@ -0,0 +1,325 @@
+from typing import Optional
+
+import numpy as np
+import pygame
+from pygame import Surface
+
+# Below this many screen pixels per visible body, bodies are drawn as a density map
+DENSITY_PIXELS_PER_BODY = 50
+# The density map is only left again above this many times the threshold, so it does not flicker
+DENSITY_HYSTERESIS = 1.5
+
+
+def to_screen(
+    positions: np.ndarray, scale: float, camera: tuple[float, float], screen_size: tuple[int, int]
+) -> np.ndarray:
+    """Transform simulation positions to screen coordinates in one array operation.
+
+    Applies the scale, moves the points relative to the camera, flips the y axis and centers them on the
+    screen.
+
+    Args:
+        positions (np.ndarray): Positions in the simulation, shape (n, 2).
+        scale (float): Pixels per unit of distance.
+        camera (tuple[float, float]): Position of the camera, already scaled.
+        screen_size (tuple[int, int]): Width and height of the screen.
+
+    Returns:
+        np.ndarray: Screen coordinates as float64, shape (n, 2).
+    """
+    points = np.asarray(positions, dtype=np.float64) * scale
+    points[:, 0] += screen_size[0] // 2 - camera[0]
+    points[:, 1] = screen_size[1] // 2 + camera[1] - points[:, 1]
+    return points
+
+
+def to_world(points: np.ndarray, scale: float, camera: tuple[float, float], screen_size: tuple[int, int]) -> np.ndarray:
+    """Transform screen coordinates back to positions in the simulation, the inverse of to_screen().
+
+    Args:
+        points (np.ndarray): Screen coordinates, shape (n, 2).
+        scale (float): Pixels per unit of distance.
+        camera (tuple[float, float]): Position of the camera, already scaled.
+        screen_size (tuple[int, int]): Width and height of the screen.
+
+    Returns:
+        np.ndarray: Positions as float64, shape (n, 2).
+    """
+    points = np.array(points, dtype=np.float64)
+    points[:, 0] += camera[0] - screen_size[0] // 2
+    points[:, 1] = screen_size[1] // 2 + camera[1] - points[:, 1]
+    return points / scale
+
+
+def visible(points: np.ndarray, screen_size: tuple[int, int], margin: float = 0) -> np.ndarray:
+    """Return which screen coordinates are on the screen or within a margin of its edges.
+
+    Args:
+        points (np.ndarray): Screen coordinates, shape (n, 2).
+        screen_size (tuple[int, int]): Width and height of the screen.
+        margin (float, optional): Distance off the screen still counted as visible, such as the radius
+            of what is drawn at each point. Defaults to 0.
+
+    Returns:
+        np.ndarray: Boolean mask, shape (n,).
+    """
+    return (
+        (points[:, 0] >= -margin)
+        & (points[:, 0] <= screen_size[0] + margin)
+        & (points[:, 1] >= -margin)
+        & (points[:, 1] <= screen_size[1] + margin)
+    )
+
+
+def label_indices(
+    points: np.ndarray, screen_size: tuple[int, int], order: np.ndarray, cell_size: int, margin: float = 0
+) -> np.ndarray:
+    """Return which bodies to label, at most one per square cell of a grid over the screen.
+
+    Bodies off the screen by more than the margin are skipped, and in each cell only the body that comes
+    first in the order is labelled, so labels of bodies piled on top of each other do not overlap.
+
+    Args:
+        points (np.ndarray): Screen coordinates of every body, shape (n, 2).
+        screen_size (tuple[int, int]): Width and height of the screen.
+        order (np.ndarray): Indices of the bodies from the most to the least important to label.
+        cell_size (int): Side of each cell of the grid in pixels.
+        margin (float, optional): Distance off the screen still counted as visible. Defaults to 0.
+
+    Returns:
+        np.ndarray: Indices of the bodies to label.
+    """
+    order = order[visible(points[order], screen_size, margin)]
+    cells = np.floor((points[order] + margin) / cell_size).astype(np.int64)
+    rows = int(-(-(screen_size[1] + 2 * margin) // cell_size)) + 1
+    # np.unique returns the first occurrence of each cell, which is the most important body in it
+    _, first = np.unique(cells[:, 0] * rows + cells[:, 1], return_index=True)
+    return order[np.sort(first)]
+
+
+class PointRenderer:
+    """Draws a circle for every body in batches.
+
+    Up to SPRITE_LIMIT visible bodies are drawn by blitting a prebuilt circle sprite of each body's color
+    in a single blits() call. Beyond that, where the circles would overlap into a blur anyway and every blit
+    costs about a microsecond, bodies are stamped as small dots straight into the pixels of the surface
+    through pygame.surfarray.
+    """
+
+    # The most visible bodies drawn as circle sprites
+    SPRITE_LIMIT = 10_000
+    # Half the side of the square dot stamped for each body when there are too many for sprites
+    DOT_RADIUS = 1
+
+    def __init__(self, colors: list[tuple[int, int, int]], radius: int = 8):
+        """Create a renderer for bodies of the given colors.
+
+        Args:
+            colors (list[tuple[int, int, int]]): RGB color of every body.
+            radius (int, optional): Radius of the circle drawn for each body, in pixels. Defaults to 8.
+        """
+        self.radius = radius
+        unique, inverse = np.unique(np.asarray(colors, dtype=np.uint8).reshape(-1, 3), axis=0, return_inverse=True)
+        self.colors = [tuple(color) for color in unique.tolist()]
+        # Index into self.colors of every body's color
+        self.color_indices = inverse.reshape(-1)
+        self._sprites: list[Surface] = []
+        self._sprite_format = None
+
+    def draw(self, surface: Surface, points: np.ndarray, bodies: Optional[np.ndarray] = None) -> int:
+        """Draw every body that is on the surface.
+
+        Args:
+            surface (Surface): The surface to draw on.
+            points (np.ndarray): Screen coordinates of the bodies, shape (n, 2).
+            bodies (Optional[np.ndarray], optional): Index of the body at each point. Defaults to None for
+                every body in order.
+
+        Returns:
+            int: The number of bodies drawn.
+        """
+        color_indices = self.color_indices if bodies is None else self.color_indices[bodies]
+        indices = np.flatnonzero(visible(points, surface.get_size(), self.radius))
+        if len(indices) <= self.SPRITE_LIMIT:
+            self.draw_sprites(surface, points[indices], color_indices[indices])
+        else:
+            self.draw_dots(surface, points[indices], color_indices[indices])
+        return len(indices)
+
+    def draw_sprites(self, surface: Surface, points: np.ndarray, color_indices: np.ndarray) -> None:
+        """Blit a circle sprite at each point.
+
+        Args:
+            surface (Surface): The surface to draw on.
+            points (np.ndarray): Screen coordinates of the centers, shape (n, 2).
+            color_indices (np.ndarray): Index of the color of each point, shape (n,).
+        """
+        sprites = self.sprites(surface)
+        corners = (np.floor(points) - self.radius).astype(np.intp).tolist()
+        surface.blits([(sprites[index], corner) for index, corner in zip(color_indices.tolist(), corners)], False)
+
+    def draw_dots(self, surface: Surface, points: np.ndarray, color_indices: np.ndarray) -> None:
+        """Write a small square dot at each point directly into the pixels of the surface.
+
+        Args:
+            surface (Surface): The surface to draw on.
+            points (np.ndarray): Screen coordinates of the centers, shape (n, 2).
+            color_indices (np.ndarray): Index of the color of each point, shape (n,).
+        """
+        width, height = surface.get_size()
+        mapped = np.array([surface.map_rgb(color) for color in self.colors], dtype=np.int64)[color_indices]
+        xs, ys = np.floor(points).astype(np.intp).T
+        pixels = pygame.surfarray.pixels2d(surface)
+        try:
+            offsets = range(-self.DOT_RADIUS, self.DOT_RADIUS + 1)
+            for dx in offsets:
+                for dy in offsets:
+                    x = xs + dx
+                    y = ys + dy
+                    inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+                    pixels[x[inside], y[inside]] = mapped[inside]
+        finally:
+            # The surface stays locked while its pixels are referenced
+            del pixels
+
+    def sprites(self, surface: Surface) -> list[Surface]:
+        """Return a circle sprite of each color in the pixel format of a surface, built on first use.
+
+        Args:
+            surface (Surface): The surface the sprites will be drawn on.
+
+        Returns:
+            list[Surface]: One sprite per color, in the order of self.colors.
+        """
+        surface_format = (surface.get_bitsize(), surface.get_masks())
+        if self._sprite_format != surface_format:
+            self._sprites = [self.build_sprite(surface, color) for color in self.colors]
+            self._sprite_format = surface_format
+        return self._sprites
+
+    def build_sprite(self, surface: Surface, color: tuple[int, int, int]) -> Surface:
+        """Return a sprite of a filled circle, transparent around it.
+
+        Args:
+            surface (Surface): The surface the sprite will be drawn on, whose pixel format it uses.
+            color (tuple[int, int, int]): RGB color of the circle.
+
+        Returns:
+            Surface: The sprite, 2 * radius + 1 pixels square.
+        """
+        size = 2 * self.radius + 1
+        key = (0, 0, 0) if color != (0, 0, 0) else (255, 255, 255)
+        sprite = Surface((size, size), 0, surface)
+        sprite.fill(key)
+        pygame.draw.circle(sprite, color, (self.radius, self.radius), self.radius)
+        sprite.set_colorkey(key)
+        return sprite
+
+
+def use_density_map(visible_count: int, screen_size: tuple[int, int], showing: bool) -> bool:
+    """Return whether bodies should be drawn as a density map rather than one by one.
+
+    Args:
+        visible_count (int): The number of bodies on the screen.
+        screen_size (tuple[int, int]): Width and height of the screen.
+        showing (bool): Whether the density map was drawn last frame.
+
+    Returns:
+        bool: True to draw a density map.
+    """
+    if visible_count == 0:
+        return False
+    pixels_per_body = screen_size[0] * screen_size[1] / visible_count
+    threshold = DENSITY_PIXELS_PER_BODY * (DENSITY_HYSTERESIS if showing else 1)
+    return pixels_per_body < threshold
+
+
+def density_palette() -> np.ndarray:
+    """Return the colors of the density map, from black for empty through blue and orange to white.
+
+    Returns:
+        np.ndarray: 256 RGB colors as uint8, shape (256, 3).
+    """
+    stops = np.array([0.0, 0.25, 0.6, 0.85, 1.0])
+    colors = np.array([[0, 0, 0], [40, 30, 160], [220, 70, 60], [255, 200, 60], [255, 255, 255]])
+    levels = np.linspace(0, 1, 256)
+    return np.stack([np.interp(levels, stops, colors[:, channel]) for channel in range(3)], axis=1).astype(np.uint8)
+
+
+class DensityRenderer:
+    """Draws bodies as a heatmap of the mass in each small square cell of the screen.
+
+    Masses are summed over cells with a histogram, and shaded on a log scale from the lightest occupied cell
+    to the heaviest, so a lone body still shows while the dense core of a galaxy does not saturate.
+    """
+
+    def __init__(self, cell_size: int = 2):
+        """Create a density map renderer.
+
+        Args:
+            cell_size (int, optional): Side of each cell in pixels. Defaults to 2.
+        """
+        self.cell_size = cell_size
+        self.palette = density_palette()
+
+    def density(
+        self, points: np.ndarray, screen_size: tuple[int, int], weights: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Return the total weight of the bodies in each cell of the screen.
+
+        Args:
+            points (np.ndarray): Screen coordinates of every body, shape (n, 2).
+            screen_size (tuple[int, int]): Width and height of the screen.
+            weights (np.ndarray, optional): Mass of every body, shape (n,). Defaults to None to count bodies.
+
+        Returns:
+            np.ndarray: The weight in each cell, indexed by column then row like pygame.surfarray.
+        """
+        columns = -(-screen_size[0] // self.cell_size)
+        rows = -(-screen_size[1] // self.cell_size)
+        cells = np.floor(points / self.cell_size)
+        inside = (cells[:, 0] >= 0) & (cells[:, 0] < columns) & (cells[:, 1] >= 0) & (cells[:, 1] < rows)
+        cells = cells[inside].astype(np.intp)
+        indices = cells[:, 0] * rows + cells[:, 1]
+        weights = None if weights is None else np.asarray(weights, dtype=np.float64)[inside]
+        return np.bincount(indices, weights, minlength=columns * rows).reshape(columns, rows)
+
+    def shade(self, density: np.ndarray) -> np.ndarray:
+        """Return the palette level of each cell, log scaled from the lightest occupied cell to the heaviest.
+
+        Args:
+            density (np.ndarray): The weight in each cell.
+
+        Returns:
+            np.ndarray: Levels from 0 for empty cells to 255, as uint8 with the shape of the density.
+        """
+        levels = np.zeros(density.shape, dtype=np.uint8)
+        occupied = density > 0
+        if not occupied.any():
+            return levels
+        lightest = density[occupied].min()
+        # Every occupied cell is at least one step above empty
+        logs = np.log(density[occupied] / lightest) + 1
+        levels[occupied] = np.round(logs * (255 / logs.max())).astype(np.uint8)
+        return levels
+
+    def draw(self, surface: Surface, points: np.ndarray, weights: Optional[np.ndarray] = None) -> int:
+        """Draw the density map over the whole surface.
+
+        Args:
+            surface (Surface): The surface to draw on.
+            points (np.ndarray): Screen coordinates of every body, shape (n, 2).
+            weights (np.ndarray, optional): Mass of every body, shape (n,). Defaults to None to count bodies.
+
+        Returns:
+            int: The number of bodies on the surface.
+        """
+        size = surface.get_size()
+        density = self.density(points, size, weights)
+        heatmap = pygame.surfarray.make_surface(self.palette[self.shade(density)])
+        if self.cell_size > 1:
+            heatmap = pygame.transform.scale(
+                heatmap, (density.shape[0] * self.cell_size, density.shape[1] * self.cell_size)
+            )
+        surface.blit(heatmap, (0, 0))
+        return int(np.count_nonzero(visible(points, size)))
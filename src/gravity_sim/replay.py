@@ -0,0 +1,119 @@
+import numpy as np
+
+from gravity_sim.trajectory import TrajectoryReader
+
+
+class Replay:
+    """Playback state for a recorded trajectory, independent of any display.
+
+    The playback position is a fractional frame index so slow playback moves smoothly, positions
+    between two frames are linearly interpolated.
+    """
+
+    def __init__(self, reader: TrajectoryReader, speed: float = 1.0):
+        """Create a new replay of a trajectory, starting at the first frame.
+
+        Args:
+            reader (TrajectoryReader): The trajectory to replay.
+            speed (float, optional): Frames advanced per update, negative plays backwards. Defaults to 1.0.
+
+        Raises:
+            ValueError: If the trajectory has no frames.
+        """
+        if len(reader) == 0:
+            raise ValueError(f"Trajectory {reader.filename} contains no frames.")
+        self.reader = reader
+        self.speed = speed
+        self.position = 0.0
+        self.paused = False
+
+    @property
+    def last_frame(self) -> int:
+        """Index of the final frame."""
+        return len(self.reader) - 1
+
+    @property
+    def frame(self) -> int:
+        """Index of the frame at or before the playback position."""
+        return int(self.position)
+
+    @property
+    def time(self) -> float:
+        """Simulated time at the playback position."""
+        times = self.reader.times
+        fraction = self.position - self.frame
+        if fraction == 0:
+            return float(times[self.frame])
+        return float(times[self.frame] * (1 - fraction) + times[self.frame + 1] * fraction)
+
+    @property
+    def progress(self) -> float:
+        """Playback position as a fraction of the whole trajectory."""
+        if self.last_frame == 0:
+            return 1.0
+        return self.position / self.last_frame
+
+    def advance(self) -> None:
+        """Move the playback position by the playback speed, pausing at either end."""
+        if self.paused:
+            return
+        self.seek(self.position + self.speed)
+        if (self.speed > 0 and self.position == self.last_frame) or (self.speed < 0 and self.position == 0):
+            self.paused = True
+
+    def seek(self, position: float) -> None:
+        """Move the playback position to a frame, clamped to the trajectory.
+
+        Args:
+            position (float): The frame index to move to, may be fractional.
+        """
+        self.position = min(max(float(position), 0.0), float(self.last_frame))
+
+    def seek_fraction(self, fraction: float) -> None:
+        """Move the playback position to a fraction of the way through the trajectory.
+
+        Args:
+            fraction (float): Fraction between 0 for the first frame and 1 for the last.
+        """
+        self.seek(fraction * self.last_frame)
+
+    def seek_time(self, time: float) -> None:
+        """Move the playback position to the last frame at or before a simulated time.
+
+        Args:
+            time (float): The simulated time.
+        """
+        frame = self.reader.find_frame(time)
+        self.seek(0 if frame is None else frame)
+
+    def step_frames(self, frames: int) -> None:
+        """Move the playback position by a whole number of frames from the current frame.
+
+        Args:
+            frames (int): The number of frames to move, negative moves backwards.
+        """
+        self.seek(self.frame + frames)
+
+    def change_speed(self, factor: float) -> None:
+        """Multiply the playback speed by a factor.
+
+        Args:
+            factor (float): The factor to multiply the speed by.
+        """
+        self.speed *= factor
+
+    def reverse(self) -> None:
+        """Reverse the playback direction."""
+        self.speed = -self.speed
+        self.paused = False
+
+    def positions(self) -> np.ndarray:
+        """Return the positions of every body at the playback position.
+
+        Returns:
+            np.ndarray: The positions, shape (num_bodies, 2).
+        """
+        fraction = self.position - self.frame
+        if fraction == 0:
+            return np.asarray(self.reader.positions(self.frame))
+        return self.reader.positions(self.frame) * (1 - fraction) + self.reader.positions(self.frame + 1) * fraction
@@ -0,0 +1,162 @@
+from typing import Optional
+
+import numpy as np
+import pygame
+
+from gravity_sim.metrics import Metrics
+from gravity_sim.replay import Replay
+from gravity_sim.window import Window
+
+
+class ReplayWindow(Window):
+    """Pygame window to play back a recorded trajectory, never touching the force code."""
+
+    def __init__(self, replay: Replay):
+        """Initialise a new window to play back a trajectory.
+
+        Args:
+            replay (Replay): The replay to display.
+        """
+        self.replay = replay
+        self.scrubbing = False
+        super().__init__(simulation=None)
+
+    def get_title(self) -> str:
+        """Return the title of the window."""
+        return f"Replay - {self.replay.reader.filename}"
+
+    def get_names(self) -> list[str]:
+        """Return the name of every body."""
+        return self.replay.reader.names
+
+    def get_colors(self) -> list[tuple[int, int, int]]:
+        """Return the RGB color of every body."""
+        return self.replay.reader.colors
+
+    def create_worker(self, steps_per_second: float) -> None:
+        """Replays are played back on the display thread, there is no simulation to step."""
+        return None
+
+    def get_masses(self) -> None:
+        """Trajectories do not record masses, so the density map counts bodies."""
+        return None
+
+    def get_metrics(self) -> Metrics:
+        """Return a registry of the window's own timings, as there is no simulation."""
+        return Metrics()
+
+    def get_positions(self, indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return the positions of bodies at the current playback position.
+
+        Args:
+            indices (Optional[np.ndarray], optional): Indices of the bodies. Defaults to None for every body.
+
+        Returns:
+            np.ndarray: The positions, shape (n, 2).
+        """
+        positions = self.replay.positions()
+        return positions if indices is None else positions[indices]
+
+    def update_simulation(self):
+        """Advance the playback position."""
+        self.replay.advance()
+
+    def render_object_names(self) -> None:
+        """Render object names, then the timeline on top."""
+        super().render_object_names()
+        self.render_timeline()
+
+    def render_quadtree(self) -> None:
+        """Replays have no quadtree to draw."""
+
+    def toggle_pause(self) -> None:
+        """Toggle playback between paused and playing, restarting if playback has finished."""
+        self.replay.paused = not self.replay.paused
+        at_end = self.replay.position == (self.replay.last_frame if self.replay.speed > 0 else 0)
+        if not self.replay.paused and at_end:
+            self.replay.seek(0 if self.replay.speed > 0 else self.replay.last_frame)
+
+    def change_simulation_speed(self, factor: float) -> None:
+        """Change the playback speed by some factor.
+
+        Args:
+            factor (float): The factor to multiply it by.
+        """
+        self.replay.change_speed(float(factor))
+
+    def handle_key_down(self, key: int) -> None:
+        """Handle playback keys, falling back to the normal window keys.
+
+        Args:
+            key (int): The key pressed.
+        """
+        match key:
+            case pygame.K_HOME:
+                self.replay.seek(0)
+            case pygame.K_END:
+                self.replay.seek(self.replay.last_frame)
+            case pygame.K_LEFTBRACKET:
+                self.replay.step_frames(-1)
+            case pygame.K_RIGHTBRACKET:
+                self.replay.step_frames(1)
+            case pygame.K_PAGEUP:
+                self.replay.seek_fraction(self.replay.progress - 0.1)
+            case pygame.K_PAGEDOWN:
+                self.replay.seek_fraction(self.replay.progress + 0.1)
+            case pygame.K_r:
+                self.replay.reverse()
+            case _:
+                super().handle_key_down(key)
+
+    def click(self, position: tuple[int, int]) -> None:
+        """Focus the object under a click, unless the click was on the timeline.
+
+        Args:
+            position (tuple[int, int]): The screen coordinates of the click.
+        """
+        if not self.timeline_rect().collidepoint(position):
+            super().click(position)
+
+    def move_camera(self):
+        """Scrub through the replay while the left mouse button is held on the timeline, else move the camera."""
+        pressed = pygame.mouse.get_pressed()[0]
+        if pressed and (self.scrubbing or self.timeline_rect().collidepoint(pygame.mouse.get_pos())):
+            pygame.mouse.get_rel()
+            self.scrubbing = True
+            rect = self.timeline_rect()
+            self.replay.seek_fraction((pygame.mouse.get_pos()[0] - rect.left) / rect.width)
+            return
+        self.scrubbing = False
+        super().move_camera()
+
+    def timeline_rect(self) -> pygame.Rect:
+        """Return the area of the screen used by the timeline.
+
+        Returns:
+            pygame.Rect: The timeline's rectangle.
+        """
+        width, height = self.screen.get_size()
+        return pygame.Rect(10, height - 20, max(1, width - 20), 10)
+
+    def render_timeline(self) -> None:
+        """Draw the playback progress bar and the current time, frame and speed."""
+        rect = self.timeline_rect()
+        pygame.draw.rect(self.screen, (60, 60, 60), rect)
+        progress = rect.copy()
+        progress.width = round(rect.width * self.replay.progress)
+        pygame.draw.rect(self.screen, (200, 200, 200), progress)
+
+        status = "Paused" if self.replay.paused else f"x{self.replay.speed:.3g}"
+        text = f"t = {self.replay.time:.6g}s  frame {self.replay.frame + 1}/{self.replay.last_frame + 1}  {status}"
+        label = self.font.render(text, True, (200, 200, 200))
+        self.screen.blit(label, (rect.left, rect.top - label.get_height() - 4))
+
+    def print_help(self):
+        """Print the controls to the terminal."""
+        super().print_help()
+        help = """Home/End - Jump to start/end
+Page Up/Page Down - Jump back/forward 10%
+[ and ] - Step back/forward one frame
+R - Reverse playback
+Click or drag the timeline to scrub"""
+        print(help)
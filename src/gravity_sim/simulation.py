@@ -1,12 +1,28 @@
 import math
 from decimal import Decimal
 from random import Random
-from typing import List
-
-from gravity_sim.object import Object
-from gravity_sim.vector import Vector
-from gravity_sim.quadtree import QuadTree
-from collections import deque
+from typing import List, Optional
+
+import numpy as np
+
+from gravity_sim.barnes_hut import BarnesHutEngine
+from gravity_sim.direct import DirectEngine
+from gravity_sim.fmm import FMMEngine
+from gravity_sim.force_engine import ForceEngine
+from gravity_sim.integrator import (
+    BlockIntegrator,
+    EulerIntegrator,
+    Integrator,
+    LeapfrogIntegrator,
+    VelocityVerletIntegrator,
+    YoshidaIntegrator,
+)
+from gravity_sim.metrics import Metrics
+from gravity_sim.object import Color, Object
+from gravity_sim.parallel import ParallelEngine, ProcessEngine, ThreadEngine
+from gravity_sim.pm import PMEngine
+from gravity_sim.precision import Precision
+from gravity_sim.state import BodyState
 
 
 class Simulation:
@@ -20,6 +36,14 @@ class Simulation:
         objects: list[Object],
         grav_constant: float = 6.6743e-11,
         description: str = None,
+        engine: str = "barnes_hut",
+        engine_options: Optional[dict] = None,
+        theta: float = 0.5,
+        precision: str = "float64",
+        integrator: str = "euler",
+        integrator_options: Optional[dict] = None,
+        processes: int = 0,
+        threads: int = 0,
     ):
         """Create a new simulation.
 
@@ -30,20 +54,50 @@ class Simulation:
             objects (list[Object]): The objects in the simulation.
             grav_constant (float, optional): The gravitational constant value to use.. Defaults to 6.6743e-11.
             description (str, optional): A short description. Defaults to None.
+            engine (str, optional): The force engine to use, "barnes_hut", "direct", "fmm" or "pm".
+                "linear_barnes_hut" is another name for "barnes_hut". Defaults to "barnes_hut".
+            engine_options (Optional[dict], optional): Keyword arguments for the force engine. Defaults to None.
+            theta (float, optional): Barnes-Hut opening angle. Defaults to 0.5.
+            precision (str, optional): The arithmetic backend, "decimal", "float64" or "float32".
+                Defaults to "float64".
+            integrator (str, optional): The integration scheme, "euler", "leapfrog", "velocity_verlet",
+                "yoshida4" or "block". Defaults to "euler".
+            integrator_options (Optional[dict], optional): Keyword arguments for the integrator. Defaults to None.
+            processes (int, optional): The number of worker processes to evaluate forces on, or 0 to evaluate
+                them in this process. Defaults to 0.
+            threads (int, optional): The number of threads to evaluate forces on, or 0 to evaluate them on the
+                calling thread. Defaults to 0.
         """
         self.name = name
         self.timestep = Decimal(timestep)
         self.steps = steps
         self.grav_constant = Decimal(grav_constant)
         self.description = description
-        self.objects = objects
-
-        self.theta = 0.5
+        self._objects = objects
+        self.precision = Precision(precision)
+        self.state = BodyState.from_objects(objects, self.precision)
+        for index, obj in enumerate(objects):
+            obj.bind(self.state, index)
+        self.names = [obj.name for obj in objects]
+        self.colors = np.array([tuple(obj.color) for obj in objects], dtype=np.uint8).reshape(-1, 3)
+
+        self.theta = theta
+        self.engine = engine
+        self.engine_options = engine_options or {}
+        self.processes = processes
+        self.threads = threads
+        self.metrics = Metrics()
+        self.force_engine = self.create_force_engine(engine, self.engine_options)
+        self.integrator_name = integrator
+        self.integrator_options = integrator_options or {}
+        self.integrator = self.create_integrator(integrator, self.integrator_options)
 
         if self.description is None:
             self.description = "A simulation."
 
         self.last_quadtree = None
+        self.time = 0.0
+        self.step_count = 0
 
     @classmethod
     def from_dict(cls, dictionary: dict) -> "Simulation":
@@ -80,114 +134,265 @@ class Simulation:
             steps=dictionary.get("steps", 1),
             objects=objects,
             description=dictionary.get("description"),
+            engine=dictionary.get("engine", "barnes_hut"),
+            engine_options=dictionary.get("engine_options"),
+            precision=dictionary.get("precision", "float64"),
+            integrator=dictionary.get("integrator", "euler"),
+            integrator_options=dictionary.get("integrator_options"),
+            processes=dictionary.get("processes", 0),
+            threads=dictionary.get("threads", 0),
         )
 
+    @classmethod
+    def from_state(
+        cls, name: str, timestep: int, steps: int, state: BodyState, names: list[str], colors: np.ndarray, **kwargs
+    ) -> "Simulation":
+        """Return a simulation of an existing body state, without creating an Object for each body.
+
+        Objects are only created if get_objects() or get_object() is called.
+
+        Args:
+            name (str): Name of the simulation.
+            timestep (int): The time to advance forward each frame.
+            steps (int): The number of times to subdivide calculations in each timestep.
+            state (BodyState): The state of the bodies.
+            names (list[str]): The name of each body.
+            colors (np.ndarray): The RGB color of each body, shape (n, 3).
+            **kwargs: Any other arguments accepted by Simulation.
+
+        Raises:
+            ValueError: If the number of names or colors does not match the number of bodies.
+
+        Returns:
+            Simulation: The simulation.
+        """
+        if not len(state) == len(names) == len(colors):
+            raise ValueError(f"Expected {len(state)} names and colors, got {len(names)} and {len(colors)}.")
+        kwargs.setdefault("precision", state.precision.name)
+        simulation = cls(name=name, timestep=timestep, steps=steps, objects=[], **kwargs)
+        simulation.state = state if state.precision == simulation.precision else state.astype(simulation.precision)
+        simulation.names = list(names)
+        simulation.colors = np.asarray(colors, dtype=np.uint8).reshape(-1, 3)
+        simulation._objects = None
+        return simulation
+
+    @property
+    def objects(self) -> list[Object]:
+        """The objects in the simulation, each a view onto its row of the state."""
+        if self._objects is None:
+            self._objects = []
+            for index, (name, color) in enumerate(zip(self.names, self.colors.tolist())):
+                obj = Object(name=name, color=Color(*color))
+                obj.bind(self.state, index)
+                self._objects.append(obj)
+        return self._objects
+
+    def create_force_engine(self, engine: str, options: dict) -> ForceEngine:
+        """Return the force engine with the given name.
+
+        The engine is run on a ProcessEngine or ThreadEngine if the simulation uses worker processes or threads.
+
+        Args:
+            engine (str): Name of the engine.
+            options (dict): Keyword arguments for the engine.
+
+        Raises:
+            ValueError: If the engine name is not recognised, or does not support the precision, processes
+                or threads.
+
+        Returns:
+            ForceEngine: The engine.
+        """
+        match engine:
+            case "barnes_hut" | "linear_barnes_hut":
+                force_engine = BarnesHutEngine(**{"theta": self.theta, **options})
+            case "direct":
+                force_engine = DirectEngine(**options)
+            case "fmm":
+                force_engine = FMMEngine(**{"theta": self.theta, **options})
+            case "pm":
+                force_engine = PMEngine(**options)
+            case _:
+                raise ValueError(f"Unknown force engine '{engine}'.")
+        if self.precision.is_decimal and not isinstance(force_engine, DirectEngine):
+            raise ValueError(f"The {engine} engine does not support decimal precision, use the direct engine.")
+        force_engine = self.parallelize(force_engine)
+        force_engine.set_metrics(self.metrics)
+        return force_engine
+
+    def parallelize(self, force_engine: ForceEngine) -> ForceEngine:
+        """Return a force engine run on the simulation's worker processes or threads, if it uses any.
+
+        Args:
+            force_engine (ForceEngine): The engine.
+
+        Raises:
+            ValueError: If both processes and threads are set, or processes are used with decimal precision.
+
+        Returns:
+            ForceEngine: The engine to use.
+        """
+        if self.processes and self.threads:
+            raise ValueError("Forces can be evaluated on worker processes or threads, not both.")
+        if self.threads:
+            return ThreadEngine(force_engine, workers=self.threads)
+        if self.processes:
+            if self.precision.is_decimal:
+                raise ValueError("Worker processes cannot be used with decimal precision.")
+            return ProcessEngine(force_engine, workers=self.processes)
+        return force_engine
+
+    def create_integrator(self, integrator: str, options: dict) -> Integrator:
+        """Return the integrator with the given name.
+
+        Args:
+            integrator (str): Name of the integrator.
+            options (dict): Keyword arguments for the integrator.
+
+        Raises:
+            ValueError: If the integrator name is not recognised, or is block with an engine that computes
+                every body on each evaluation.
+
+        Returns:
+            Integrator: The integrator.
+        """
+        match integrator:
+            case "euler":
+                return EulerIntegrator(**options)
+            case "leapfrog":
+                return LeapfrogIntegrator(**options)
+            case "velocity_verlet":
+                return VelocityVerletIntegrator(**options)
+            case "yoshida4":
+                return YoshidaIntegrator(**options)
+            case "block":
+                if not self.force_engine.targeted:
+                    # Every sub-step would evaluate every body, costing far more than a plain leapfrog
+                    raise ValueError(
+                        "The block integrator needs an engine that evaluates only the bodies completing a step, "
+                        f"such as barnes_hut or direct, not {self.engine}."
+                    )
+                return BlockIntegrator(**{"grav_constant": float(self.grav_constant), **options})
+        raise ValueError(f"Unknown integrator '{integrator}'.")
+
+    def set_precision(self, precision: str) -> None:
+        """Convert the simulation to another arithmetic backend.
+
+        Args:
+            precision (str): The backend, "decimal", "float64" or "float32".
+
+        Raises:
+            ValueError: If the precision is not recognised or not supported by the force engine.
+        """
+        self.precision = Precision(precision)
+        self.recreate_force_engine()
+        self.state = self.state.astype(self.precision)
+        for obj in self._objects or []:
+            obj.bind(self.state, obj.index)
+
+    def set_threads(self, threads: int) -> None:
+        """Evaluate forces on a number of threads, instead of any configured worker processes.
+
+        Args:
+            threads (int): The number of threads, or 0 to evaluate forces on the calling thread, keeping any
+                configured worker processes.
+        """
+        self.threads = threads
+        if threads > 0:
+            self.processes = 0
+        self.recreate_force_engine()
+
+    def recreate_force_engine(self) -> None:
+        """Replace the force engine after a setting changed, stopping the workers of the old one."""
+        if isinstance(self.force_engine, ParallelEngine):
+            self.force_engine.close()
+        self.force_engine = self.create_force_engine(self.engine, self.engine_options)
+        self.integrator.invalidate()
+
     def get_random(self) -> Random:
         """Get the simulation's random number generator."""
         return self._random
 
-    def calculate_forces(self) -> None:
-        """Compute the forces between all the objects in the simulation. O(n^2)."""
-        for obj1 in self.objects:
-            for obj2 in self.objects:
-                if obj1 is not obj2:
-                    self.calculate_force_on_object(obj1, obj2.position, obj2.mass)
-
-    def calc_forces_barnes_hut(self) -> None:
-        """Calculate the forces between all objects using the Barnes-Hut algorithm. O(nlogn)."""
-        if len(self.objects) < 2:
+    def calc_forces(self) -> None:
+        """Calculate the forces on all objects using the selected force engine."""
+        if len(self.state) == 0:
             return
-        tree = self.build_quad_tree()
-
-        for obj in self.objects:
-            stack = deque([tree])
-            while stack:
-                node: QuadTree = stack.pop()
-                if node.value is obj:
-                    continue
-                elif isinstance(node.value, Object):
-                    self.calculate_force_on_object(obj, node.value.position, node.value.mass)
-                else:
-                    # Check if node is sufficiently far away such that we can approximate its mass
-                    distance = obj.position.distance(node.center_of_mass)
-                    distance = max(distance, 1)
-                    if (node.width * 2 / distance) < self.theta:
-                        self.calculate_force_on_object(obj, node.center_of_mass, node.mass)
-                    else:
-                        # Not far away enough, explore subtrees
-                        for subtree in node.subtrees.values():
-                            if subtree:
-                                stack.append(subtree)
-
-        self.last_quadtree = tree
-
-    def build_quad_tree(self) -> QuadTree:
-        """Construct a QuadTree from the objects in the Simulation.
+        accelerations = self.force_engine.accelerations(
+            self.state.positions, self.state.masses, self.precision.scalar(self.grav_constant)
+        )
+        self.state.forces += accelerations * self.state.masses[:, np.newaxis]
+        self.last_quadtree = self.force_engine.last_tree
 
-        Returns:
-            QuadTree: The created QuadTree
-        """
-        tree = QuadTree(center=Vector(0, 0), width=self.find_quad_tree_width())
-        for obj in self.objects:
-            tree.insert_object(obj)
-        return tree
+    def calc_accelerations(self, targets: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return the acceleration of bodies at the current positions, using the selected force engine.
 
-    def find_quad_tree_width(self) -> Decimal:
-        """Find the maximum distance in one dimension between two objects in the simulation.
+        Bodies with zero mass are given zero acceleration.
+
+        Args:
+            targets (Optional[np.ndarray], optional): Indices of the bodies to compute accelerations for.
+                Defaults to None for every body.
 
         Returns:
-            Decimal: The width that QuadTree should be.
+            np.ndarray: The accelerations of the targets in order, shape (len(targets), 2).
         """
-        max_x = float("-inf")
-        min_x = float("inf")
-        for obj in self.objects:
-            max_x = max(max_x, obj.position.x)
-            min_x = min(min_x, obj.position.x)
+        with self.metrics.timer("forces"):
+            if targets is not None:
+                accelerations = self.force_engine.accelerations(
+                    self.state.positions, self.state.masses, self.precision.scalar(self.grav_constant), targets
+                )
+                self.last_quadtree = self.force_engine.last_tree
+                accelerations[self.state.masses[targets] == 0] = 0
+                return accelerations
+            self.state.reset_forces()
+            self.calc_forces()
+            accelerations = self.state.accelerations()
+            return accelerations if targets is None else accelerations[targets]
 
-        max_y = float("-inf")
-        min_y = float("inf")
-        for obj in self.objects:
-            max_y = max(max_y, obj.position.y)
-            min_y = min(min_y, obj.position.y)
-
-        return max(max_x - min_x, max_y - min_y)
+    def calculate_forces(self) -> None:
+        """Compute the forces between all the objects in the simulation. O(n^2)."""
+        positions = self.state.positions
+        masses = self.state.masses
+        for index in range(len(self.state)):
+            for other in range(len(self.state)):
+                if index != other:
+                    self.calculate_force_on_object(index, positions[other], masses[other])
 
-    def calculate_force_on_object(self, obj1: Object, obj2_pos: Vector, obj2_mass: Decimal) -> None:
-        """Calculate the gravitational force applied to an object.
+    def calculate_force_on_object(self, index: int, obj2_pos: np.ndarray, obj2_mass: float) -> None:
+        """Calculate the gravitational force applied to a body.
 
         Args:
-            obj1 (Object): The object the force is applied to.
-            obj2_pos (Vector): The position of the other object.
-            obj2_mass (Decimal): The mass of the other object.
+            index (int): Index of the body the force is applied to.
+            obj2_pos (np.ndarray): The position of the other object, any array-like of x and y.
+            obj2_mass (float): The mass of the other object.
         """
-        distance = obj2_pos - obj1.position
-        sqrDistance = distance[0] ** 2 + distance[1] ** 2
+        dx, dy = obj2_pos - self.state.positions[index]
+        sqrDistance = dx * dx + dy * dy
         if math.isclose(sqrDistance, 0, rel_tol=1e-7):
             return
 
-        force = self.grav_constant * obj1.mass * obj2_mass / sqrDistance
-        theta = math.atan2(distance[1], distance[0])  # Calculate angle the force acts at
-        force_vector = Vector.from_magnitude_theta(magnitude=force, theta=theta)
-
-        obj1.add_force(force_vector)
+        # Grouped so the intermediate values stay within the range of float32
+        force = self.precision.scalar(self.grav_constant) * self.state.masses[index] * (obj2_mass / sqrDistance)
+        distance = np.sqrt(sqrDistance)
+        self.state.forces[index] += (force * dx / distance, force * dy / distance)
 
-    def move_objects(self, timestep: Decimal) -> None:
+    def move_objects(self, timestep: float) -> None:
         """Move the objects in the simulation based on the forces acting on them.
 
         Args:
-            timestep (Decimal): The timestep to move the simulation forward.
+            timestep (float): The timestep to move the simulation forward, in any type the state accepts.
         """
-        for obj in self.objects:
-            obj.step(timestep)
-            obj.reset_force()
+        self.state.step(timestep)
+        self.state.reset_forces()
 
     def step(self):
         """Step forward the simulation by one timestep."""
-        timestep = Decimal(self.timestep / self.steps)
-        for _ in range(self.steps):
-            # self.calculate_forces() # Old method
-            self.calc_forces_barnes_hut()
-            self.move_objects(timestep)
+        with self.metrics.timer("step"):
+            timestep = self.precision.scalar(self.timestep) / self.steps
+            for _ in range(self.steps):
+                self.integrator.step(self.state, timestep, self.calc_accelerations)
+        self.metrics.count("steps")
+        self.time += float(self.timestep)
+        self.step_count += 1
 
     def run(self):
         """Run the simulation."""
@@ -208,7 +413,7 @@ class Simulation:
         Returns:
             int: The number of objects in the simulation.
         """
-        return len(self.objects)
+        return len(self.state)
 
     def get_object(self, index: int) -> Object:
         """Get an object at a certain index.
@@ -232,6 +437,15 @@ class Simulation:
         """
         return self.timestep
 
+    def set_grav_constant(self, grav_constant: float) -> None:
+        """Set the gravitational constant, recreating the integrator so no accelerations using the old one are kept.
+
+        Args:
+            grav_constant (float): The new gravitational constant.
+        """
+        self.grav_constant = Decimal(grav_constant)
+        self.integrator = self.create_integrator(self.integrator_name, self.integrator_options)
+
     def set_timestep(self, new_timestep: Decimal) -> None:
         """Set the current timestep.
 
@@ -1,17 +1,211 @@
+import os
+from typing import Optional
+
+from gravity_sim.checkpoint import Checkpoint
 from gravity_sim.config_loader import ConfigLoader
-from gravity_sim.window import Window
+from gravity_sim.diagnostics import EXACT_LIMIT, DiagnosticsLog
+from gravity_sim.headless import HeadlessRunner
+from gravity_sim.metrics import MetricsExporter
+from gravity_sim.profiling import print_top, profile_steps, write_profile
+from gravity_sim.replay import Replay
+from gravity_sim.simulation import Simulation
+from gravity_sim.trajectory import TrajectoryReader, TrajectoryWriter
 
 
 class SimulationRunner:
     """Loads and starts simulations."""
 
     @staticmethod
-    def run(config_file: str):
+    def load(
+        config_file: str,
+        checkpoint_file: Optional[str] = None,
+        resume: bool = False,
+        precision: Optional[str] = None,
+        threads: Optional[int] = None,
+    ) -> Simulation:
+        """Load a simulation from a config file, or resume it from a checkpoint if one exists.
+
+        Args:
+            config_file (str): The config file to load the simulation's starting state from.
+            checkpoint_file (Optional[str], optional): The checkpoint to resume from. Defaults to None.
+            resume (bool, optional): Resume from the checkpoint if it exists. Defaults to False.
+            precision (Optional[str], optional): Precision to use instead of the loaded one. Defaults to None.
+            threads (Optional[int], optional): Number of threads to evaluate forces on instead of the loaded
+                setting. Defaults to None.
+
+        Returns:
+            Simulation: The loaded simulation.
+        """
+        if resume and checkpoint_file and os.path.exists(checkpoint_file):
+            sim = Checkpoint.load(checkpoint_file)
+            print(f"Resuming from {checkpoint_file} at step {sim.step_count}")
+        else:
+            sim = ConfigLoader.load_file(config_file)
+        if precision:
+            sim.set_precision(precision)
+        if threads is not None:
+            sim.set_threads(threads)
+        return sim
+
+    @staticmethod
+    def run(
+        config_file: str,
+        precision: Optional[str] = None,
+        threads: Optional[int] = None,
+        steps_per_second: Optional[float] = None,
+    ):
         """Load a simulation from the given config file and display it in a window.
 
+        The simulation steps on a worker thread, so drawing never waits for a step.
+
+        Args:
+            config_file (str): The config file, or checkpoint file, to load the simulation's starting state from.
+            precision (Optional[str], optional): Precision to use instead of the loaded one. Defaults to None.
+            threads (Optional[int], optional): Number of threads to evaluate forces on instead of the loaded
+                setting. Defaults to None.
+            steps_per_second (Optional[float], optional): The most steps to run each second, 0 for no limit.
+                Defaults to None for 60.
+        """
+        # Imported here so headless runs never import pygame
+        from gravity_sim.window import Window
+
+        sim = SimulationRunner.load(config_file, precision=precision, threads=threads)
+        window = Window(sim, 60 if steps_per_second is None else steps_per_second)
+        window.run()
+
+    @staticmethod
+    def profile(
+        config_file: str,
+        steps: int,
+        output: str,
+        force_only: bool = False,
+        top: int = 20,
+        precision: Optional[str] = None,
+        threads: Optional[int] = None,
+    ):
+        """Load a simulation from the given config file and profile a number of steps without a display.
+
         Args:
             config_file (str): The config file to load the simulation's starting state from.
+            steps (int): The number of steps to profile.
+            output (str): Path of the .pstats and .collapsed files to write, without the extension.
+            force_only (bool, optional): Only profile force evaluation. Defaults to False.
+            top (int, optional): The number of functions taking the most time to print. Defaults to 20.
+            precision (Optional[str], optional): Precision to use instead of the loaded one. Defaults to None.
+            threads (Optional[int], optional): Number of threads to evaluate forces on instead of the loaded
+                setting. Defaults to None.
+        """
+        sim = SimulationRunner.load(config_file, precision=precision, threads=threads)
+        path = "force evaluation" if force_only else "steps"
+        print(f"Profiling {path} of {sim.name} for {steps} steps with {sim.get_num_objects()} objects")
+        stats = profile_steps(sim, steps, force_only)
+        if top:
+            print_top(stats, top)
+        pstats_file, collapsed_file = write_profile(stats, output)
+        print(f"Wrote {pstats_file} and {collapsed_file}")
+
+    @staticmethod
+    def replay(trajectory_file: str):
+        """Play back a recorded trajectory file in a window.
+
+        Args:
+            trajectory_file (str): The trajectory file to play back.
         """
-        sim = ConfigLoader.load_file(config_file)
-        window = Window(sim)
+        from gravity_sim.replay_window import ReplayWindow
+
+        window = ReplayWindow(Replay(TrajectoryReader(trajectory_file)))
         window.run()
+
+    @staticmethod
+    def run_headless(
+        config_file: str,
+        steps: Optional[int] = None,
+        seconds: Optional[float] = None,
+        record_file: Optional[str] = None,
+        record_every: int = 1,
+        checkpoint_file: Optional[str] = None,
+        checkpoint_every: int = 1000,
+        resume: bool = False,
+        precision: Optional[str] = None,
+        threads: Optional[int] = None,
+        metrics_file: Optional[str] = None,
+        metrics_every: int = 100,
+        diagnostics_file: Optional[str] = None,
+        diagnostics_every: int = 100,
+        diagnostics_exact_limit: int = EXACT_LIMIT,
+    ):
+        """Load a simulation from the given config file and run it without a display.
+
+        When resuming, steps and seconds count from the start of the original run, so rerunning the
+        same command after a crash finishes the original run.
+
+        Args:
+            config_file (str): The config file to load the simulation's starting state from.
+            steps (Optional[int], optional): The number of steps to run. Defaults to None.
+            seconds (Optional[float], optional): The number of simulated seconds to run. Defaults to None.
+            record_file (Optional[str], optional): File to record the trajectory to. Defaults to None.
+            record_every (int, optional): Record a frame every this many steps. Defaults to 1.
+            checkpoint_file (Optional[str], optional): File to save checkpoints to. Defaults to None.
+            checkpoint_every (int, optional): Save a checkpoint every this many steps. Defaults to 1000.
+            resume (bool, optional): Resume from the checkpoint file if it exists. Defaults to False.
+            precision (Optional[str], optional): Precision to use instead of the loaded one. Defaults to None.
+            threads (Optional[int], optional): Number of threads to evaluate forces on instead of the loaded
+                setting. Defaults to None.
+            metrics_file (Optional[str], optional): JSON-lines file to export metrics to. Defaults to None.
+            metrics_every (int, optional): Export metrics every this many steps. Defaults to 100.
+            diagnostics_file (Optional[str], optional): JSON-lines file to log energy, momentum and angular
+                momentum to. Defaults to None.
+            diagnostics_every (int, optional): Sample diagnostics every this many steps. Defaults to 100.
+            diagnostics_exact_limit (int, optional): The most bodies to sum the potential energy of exactly in
+                diagnostics. Defaults to EXACT_LIMIT.
+        """
+        sim = SimulationRunner.load(config_file, checkpoint_file, resume, precision, threads)
+        if steps is not None:
+            steps = max(0, steps - sim.step_count)
+        if seconds is not None:
+            seconds = max(0.0, seconds - sim.time)
+
+        print(f"Running {sim.name} headless with {sim.get_num_objects()} objects in {sim.precision.name}")
+        # A resumed run continues the trajectory, metrics and diagnostics of the original run
+        resumed = resume and sim.step_count > 0
+        recorder = TrajectoryWriter(record_file, sim, append=resumed) if record_file else None
+        exporter = MetricsExporter(metrics_file, append=resumed) if metrics_file else None
+        diagnostics = (
+            DiagnosticsLog(diagnostics_file, append=resumed, exact_limit=diagnostics_exact_limit)
+            if diagnostics_file
+            else None
+        )
+        runner = HeadlessRunner(
+            sim,
+            recorder=recorder,
+            record_every=record_every,
+            checkpoint_file=checkpoint_file,
+            checkpoint_every=checkpoint_every,
+            metrics_exporter=exporter,
+            metrics_every=metrics_every,
+            diagnostics_log=diagnostics,
+            diagnostics_every=diagnostics_every,
+        )
+        try:
+            report = runner.run(steps=steps, seconds=seconds)
+        finally:
+            if recorder:
+                recorder.close()
+            if exporter:
+                exporter.close()
+            if diagnostics:
+                diagnostics.close()
+        print(report)
+        if recorder:
+            print(f"Recorded {recorder.frame_count} frames to {record_file}")
+        if exporter:
+            print(f"Exported metrics {exporter.export_count} times to {metrics_file}")
+        if diagnostics:
+            drift = diagnostics.last.drift(diagnostics.reference)
+            print(
+                f"Logged {diagnostics.sample_count} diagnostics samples to {diagnostics_file}, energy drift "
+                f"{drift['energy_drift']:.3e}, momentum drift {drift['momentum_drift']:.3e}, "
+                f"angular momentum drift {drift['angular_momentum_drift']:.3e}"
+            )
+        if checkpoint_file:
+            print(f"Saved checkpoint to {checkpoint_file}")
@@ -0,0 +1,313 @@
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Callable, Optional
+
+import numpy as np
+
+from gravity_sim.linear_quadtree import LinearQuadTree
+from gravity_sim.simulation import Simulation
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """A copy of the state of a simulation after a step, safe to read while the simulation keeps stepping."""
+
+    step: int
+    time: float
+    # Positions of every body as float64, shape (n, 2)
+    positions: np.ndarray
+    # The perf_counter() time the snapshot was published at
+    published: float
+    # Centers and half widths of the squares of the last tree, shapes (m, 2) and (m,), if captured
+    tree: Optional[tuple[np.ndarray, np.ndarray]] = None
+    # A tree of every body to find them with spatial queries, the engine's own if it builds one
+    index: Optional[LinearQuadTree] = None
+    # Paddings of queries of the index for how far each body may be drawn from its position in it
+    index_paddings: Optional[tuple[np.ndarray, np.ndarray]] = None
+
+
+def tree_squares(tree: Optional[LinearQuadTree]) -> Optional[tuple[np.ndarray, np.ndarray]]:
+    """Return the squares of a LinearQuadTree as arrays.
+
+    Args:
+        tree (Optional[LinearQuadTree]): The tree, or None.
+
+    Returns:
+        Optional[tuple[np.ndarray, np.ndarray]]: The center and half width of every node, or None if there
+            is no tree.
+    """
+    if not isinstance(tree, LinearQuadTree):
+        return None
+    # A new tree is built every step, so its arrays are never modified after this
+    return tree.centers, tree.half_widths
+
+
+def tree_offsets(tree: LinearQuadTree, positions: np.ndarray) -> np.ndarray:
+    """Return the distance of every body from its position in a tree.
+
+    Args:
+        tree (LinearQuadTree): The tree.
+        positions (np.ndarray): Positions of the bodies as float64, shape (n, 2).
+
+    Returns:
+        np.ndarray: The distances, in the order of the positions, shape (n,).
+    """
+    offsets = np.empty_like(positions)
+    offsets[tree.order] = np.asarray(tree.positions, dtype=np.float64)
+    offsets -= positions
+    return np.hypot(offsets[:, 0], offsets[:, 1])
+
+
+class SimulationWorker:
+    """Steps a simulation on a background thread, publishing double-buffered snapshots of its state.
+
+    After every step the worker copies the positions into a new snapshot and swaps it in as the latest,
+    keeping the one before, so a renderer can draw at its own rate by interpolating between the two without
+    waiting for a step to finish. Steps are paced to steps_per_second, and run back to back when a step takes
+    longer than that.
+
+    Only the worker thread touches the simulation while it runs, so changes such as a new timestep are
+    submitted as commands, which run between steps.
+    """
+
+    def __init__(self, simulation: Simulation, steps_per_second: float = 60):
+        """Create a new worker, publishing the current state of the simulation as the first snapshot.
+
+        Args:
+            simulation (Simulation): The simulation to step.
+            steps_per_second (float, optional): The most steps to run each second, 0 for no limit.
+                Defaults to 60.
+
+        Raises:
+            ValueError: If steps_per_second is negative.
+        """
+        if steps_per_second < 0:
+            raise ValueError(f"Steps per second cannot be negative, got {steps_per_second}.")
+        self.simulation = simulation
+        self.steps_per_second = steps_per_second
+        # Copy the tree into each snapshot, only needed while it is displayed
+        self.capture_tree = False
+        self.paused = False
+        self._condition = threading.Condition()
+        self._commands: list[Callable[[], None]] = []
+        self._stopping = False
+        self._error = None
+        self._thread: Optional[threading.Thread] = None
+        self._snapshots: tuple[Snapshot, ...] = ()
+        snapshot = self.take_snapshot()
+        self._snapshots = (snapshot, snapshot)
+
+    def __enter__(self) -> "SimulationWorker":
+        """Start the worker for use in a with statement."""
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        """Stop the worker at the end of a with statement."""
+        self.stop()
+
+    @property
+    def running(self) -> bool:
+        """Whether the worker thread has been started and not stopped."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start stepping the simulation on the worker thread."""
+        if self._thread is not None:
+            return
+        self.republish()
+        self._thread = threading.Thread(target=self._run, name="simulation-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the worker thread after the current step and wait for it to finish."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def set_paused(self, paused: bool) -> None:
+        """Pause or resume stepping.
+
+        Args:
+            paused (bool): True to pause after the current step, False to resume.
+        """
+        with self._condition:
+            if self.paused and not paused:
+                # Start interpolating from now, rather than from when the simulation was paused
+                self.republish()
+            self.paused = paused
+            self._condition.notify()
+
+    def submit(self, command: Callable[[], None]) -> None:
+        """Run a function that changes the simulation between steps, or now if the worker is not running.
+
+        Args:
+            command (Callable[[], None]): The function to run.
+        """
+        if not self.running:
+            command()
+            return
+        with self._condition:
+            self._commands.append(command)
+            self._condition.notify()
+
+    def take_snapshot(self) -> Snapshot:
+        """Return a snapshot of the current state of the simulation.
+
+        Returns:
+            Snapshot: The snapshot, published now.
+        """
+        simulation = self.simulation
+        positions = np.array(simulation.state.positions, dtype=np.float64)
+        index, paddings = self.spatial_index(positions)
+        return Snapshot(
+            step=simulation.step_count,
+            time=simulation.time,
+            positions=positions,
+            published=time.perf_counter(),
+            tree=tree_squares(simulation.last_quadtree) if self.capture_tree else None,
+            index=index,
+            index_paddings=paddings,
+        )
+
+    def spatial_index(
+        self, positions: np.ndarray
+    ) -> tuple[Optional[LinearQuadTree], Optional[tuple[np.ndarray, np.ndarray]]]:
+        """Return a tree for finding the bodies of a new snapshot, and the paddings of its queries.
+
+        The engine's last tree is reused if it holds every body, otherwise a tree is built at the snapshot's
+        positions. The engine builds its tree at the positions of its last force evaluation, which may be part
+        way through the step, and bodies are drawn between the previous and the new snapshot, so each body may
+        be as far from the tree as it moved from the tree plus as far as it moved since the previous snapshot.
+        The tree and paddings are found here, once per snapshot and off the display thread.
+
+        Args:
+            positions (np.ndarray): Positions of the bodies in the new snapshot.
+
+        Returns:
+            tuple[Optional[LinearQuadTree], Optional[tuple[np.ndarray, np.ndarray]]]: The tree and its
+                paddings, or None and None if there are no bodies.
+        """
+        if not len(positions):
+            return None, None
+        tree = self.simulation.last_quadtree
+        if not isinstance(tree, LinearQuadTree) or len(tree.order) != len(positions):
+            tree = LinearQuadTree(positions, np.ones(len(positions)))
+        slack = tree_offsets(tree, positions)
+        if self._snapshots:
+            motion = positions - self._snapshots[1].positions
+            slack += np.hypot(motion[:, 0], motion[:, 1])
+        return tree, tree.paddings(slack)
+
+    def publish(self, snapshot: Snapshot) -> None:
+        """Make a snapshot the latest, keeping the previous latest to interpolate from.
+
+        Args:
+            snapshot (Snapshot): The new snapshot.
+        """
+        self._snapshots = (self._snapshots[1], snapshot)
+
+    def republish(self) -> None:
+        """Publish the latest snapshot again as of now, so both buffers hold it and interpolation stops."""
+        latest = self._snapshots[1]
+        # Neither snapshot is moving from the other any more
+        paddings = latest.index_paddings
+        if latest.index is not None:
+            paddings = latest.index.paddings(tree_offsets(latest.index, latest.positions))
+        self._snapshots = (latest, replace(latest, published=time.perf_counter(), index_paddings=paddings))
+
+    def snapshots(self) -> tuple[Snapshot, Snapshot]:
+        """Return the previous and latest snapshots.
+
+        Returns:
+            tuple[Snapshot, Snapshot]: The two snapshots, which are equal before the first step.
+        """
+        # Swapping the tuple is atomic, so both snapshots always come from the same publish
+        return self._snapshots
+
+    @property
+    def latest(self) -> Snapshot:
+        """The most recently published snapshot."""
+        return self._snapshots[1]
+
+    def positions(self, now: Optional[float] = None, indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return the positions of every body interpolated between the previous and latest snapshots.
+
+        The display runs one step behind the simulation: the time since the latest snapshot was published,
+        as a fraction of the time between the two snapshots, is how far to move from the previous snapshot
+        to the latest.
+
+        Args:
+            now (Optional[float], optional): The perf_counter() time to interpolate to. Defaults to now.
+            indices (Optional[np.ndarray], optional): Indices of the bodies to return. Defaults to None for all.
+
+        Returns:
+            np.ndarray: The positions, shape (n, 2).
+        """
+        previous, latest = self._snapshots
+        target = latest.positions if indices is None else latest.positions[indices]
+        interval = latest.published - previous.published
+        if interval <= 0:
+            return target
+        elapsed = (time.perf_counter() if now is None else now) - latest.published
+        fraction = min(max(elapsed / interval, 0.0), 1.0)
+        if fraction == 1.0:
+            return target
+        start = previous.positions if indices is None else previous.positions[indices]
+        return start + (target - start) * fraction
+
+    def check_error(self) -> None:
+        """Raise any error from the worker thread.
+
+        Raises:
+            RuntimeError: If stepping the simulation failed.
+        """
+        if self._error is not None:
+            raise RuntimeError(f"Stepping {self.simulation.name} failed.") from self._error
+
+    def _run(self) -> None:
+        """Step the simulation and publish snapshots until stopped."""
+        next_step = time.perf_counter()
+        try:
+            while self._wait(next_step):
+                for command in self._take_commands():
+                    command()
+                if self.paused or time.perf_counter() < next_step:
+                    continue
+                started = time.perf_counter()
+                self.simulation.step()
+                self.publish(self.take_snapshot())
+                interval = 1 / self.steps_per_second if self.steps_per_second else 0.0
+                # A late step does not make the following steps run faster to catch up
+                next_step = max(next_step + interval, started)
+        except Exception as error:  # Surfaced on the display thread by check_error()
+            self._error = error
+
+    def _wait(self, deadline: float) -> bool:
+        """Wait until the next step is due, a command is submitted or the worker is stopped.
+
+        Args:
+            deadline (float): The perf_counter() time the next step is due.
+
+        Returns:
+            bool: False if the worker is stopping, True otherwise.
+        """
+        with self._condition:
+            while not self._stopping and not self._commands:
+                if self.paused:
+                    self._condition.wait()
+                    continue
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return not self._stopping
+
+    def _take_commands(self) -> list[Callable[[], None]]:
+        """Remove and return the submitted commands."""
+        with self._condition:
+            commands, self._commands = self._commands, []
+        return commands
@@ -0,0 +1,115 @@
+from typing import TYPE_CHECKING, Optional, Union
+
+import numpy as np
+
+from gravity_sim.precision import Precision
+
+if TYPE_CHECKING:
+    from gravity_sim.object import Object
+
+
+class BodyState:
+    """Structure-of-arrays store for the physical state of every body in a simulation.
+
+    Row i of each array describes body i, positions, velocities and forces have shape (n, 2).
+    Every array uses the dtype of the state's precision.
+    """
+
+    def __init__(
+        self,
+        positions: np.ndarray,
+        velocities: np.ndarray,
+        masses: np.ndarray,
+        precision: Optional[Union[Precision, str]] = None,
+    ):
+        """Create a new body state from existing arrays.
+
+        Args:
+            positions (np.ndarray): Positions of the bodies in metres, shape (n, 2).
+            velocities (np.ndarray): Velocities of the bodies in metres/second, shape (n, 2).
+            masses (np.ndarray): Masses of the bodies in kg, shape (n,).
+            precision (Optional[Union[Precision, str]], optional): The precision to store the state in.
+                Defaults to None for float64.
+
+        Raises:
+            ValueError: If the arrays do not describe the same number of bodies.
+        """
+        if not isinstance(precision, Precision):
+            precision = Precision(precision or "float64")
+        self.precision = precision
+        self.positions = precision.array(positions).reshape(-1, 2)
+        self.velocities = precision.array(velocities).reshape(-1, 2)
+        self.masses = precision.array(masses).reshape(-1)
+        if not len(self.positions) == len(self.velocities) == len(self.masses):
+            raise ValueError(
+                f"Positions ({len(self.positions)}), velocities ({len(self.velocities)}) and masses "
+                f"({len(self.masses)}) must contain the same number of bodies."
+            )
+        self.forces = np.zeros_like(self.positions)
+
+    @classmethod
+    def from_objects(cls, objects: list["Object"], precision: Optional[Union[Precision, str]] = None) -> "BodyState":
+        """Return a body state holding the positions, velocities and masses of the provided objects.
+
+        Args:
+            objects (list[Object]): The objects to copy the state of.
+            precision (Optional[Union[Precision, str]], optional): The precision to store the state in.
+                Defaults to None for float64.
+
+        Returns:
+            BodyState: A new state with one row per object.
+        """
+        return cls(
+            positions=[tuple(obj.position) for obj in objects],
+            velocities=[tuple(obj.velocity) for obj in objects],
+            masses=[obj.mass for obj in objects],
+            precision=precision,
+        )
+
+    def astype(self, precision: Union[Precision, str]) -> "BodyState":
+        """Return a copy of the state converted to another precision.
+
+        Args:
+            precision (Union[Precision, str]): The precision to convert to.
+
+        Returns:
+            BodyState: The converted state, with forces reset.
+        """
+        return BodyState(self.positions, self.velocities, self.masses, precision=precision)
+
+    def __len__(self) -> int:
+        """Return the number of bodies in the state."""
+        return len(self.masses)
+
+    def reset_forces(self) -> None:
+        """Reset all forces to zero."""
+        self.forces.fill(0)
+
+    def accelerations(self) -> np.ndarray:
+        """Return the acceleration of every body from the current forces.
+
+        Bodies with zero mass are given zero acceleration.
+
+        Returns:
+            np.ndarray: Accelerations in metres/second^2, shape (n, 2).
+        """
+        masses = self.masses[:, np.newaxis]
+        return np.divide(self.forces, masses, out=np.zeros_like(self.forces), where=masses != 0)
+
+    def step(self, timestep: float) -> None:
+        """Advance every body using the current forces with semi-implicit Euler integration.
+
+        Args:
+            timestep (float): Time passed in seconds, any number convertible to the state's precision.
+        """
+        timestep = self.precision.scalar(timestep)
+        self.velocities += self.accelerations() * timestep
+        self.positions += self.velocities * timestep
+
+    def bounds(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return the axis aligned bounding box containing every body.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The minimum and maximum corners of the box.
+        """
+        return self.positions.min(axis=0), self.positions.max(axis=0)
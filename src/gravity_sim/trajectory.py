@@ -0,0 +1,317 @@
+import json
+import os
+import queue
+import threading
+from typing import Optional
+
+import numpy as np
+
+from gravity_sim.simulation import Simulation
+
+# Fixed size header at the start of every trajectory file, followed by the body colors and names.
+HEADER_DTYPE = np.dtype(
+    [
+        ("magic", "S8"),
+        ("version", "<u4"),
+        ("num_bodies", "<u4"),
+        ("capacity", "<u8"),
+        ("frame_count", "<u8"),
+        ("data_offset", "<u8"),
+        ("names_length", "<u8"),
+    ]
+)
+MAGIC = b"GRAVTRAJ"
+VERSION = 1
+ALIGNMENT = 64
+
+
+def frame_dtype(num_bodies: int) -> np.dtype:
+    """Return the dtype of one frame block for a number of bodies.
+
+    Args:
+        num_bodies (int): The number of bodies in each frame.
+
+    Returns:
+        np.dtype: A structured dtype holding the time, step, positions and velocities of a frame.
+    """
+    return np.dtype(
+        [
+            ("time", "<f8"),
+            ("step", "<u8"),
+            ("positions", "<f8", (num_bodies, 2)),
+            ("velocities", "<f8", (num_bodies, 2)),
+        ]
+    )
+
+
+class TrajectoryWriter:
+    """Records simulation frames to a preallocated, memory-mapped binary file.
+
+    The file starts with a fixed header, the body colors as uint8 RGB and the body names as JSON,
+    followed by fixed size frame blocks from data_offset so frame k can be read without parsing the others.
+    Frames are copied on record() and written by a background thread, the bounded queue limits memory
+    use if writing falls behind, in which case record() waits for space.
+    """
+
+    def __init__(
+        self, filename: str, simulation: Simulation, capacity: int = 1024, queue_size: int = 64, append: bool = False
+    ):
+        """Create a new trajectory file for a simulation and start the writer thread.
+
+        Args:
+            filename (str): The file to write, overwritten if it exists.
+            simulation (Simulation): The simulation that will be recorded.
+            capacity (int, optional): The number of frames to preallocate, the file grows if exceeded.
+                Defaults to 1024.
+            queue_size (int, optional): The maximum number of frames waiting to be written. Defaults to 64.
+            append (bool, optional): Continue an existing file instead of replacing it, for resumed runs.
+                Frames from before the simulation's current step are kept. Defaults to False.
+
+        Raises:
+            ValueError: If appending to a file that is not a trajectory of the same number of bodies.
+        """
+        self.filename = filename
+        self.num_bodies = simulation.get_num_objects()
+        self.frame_dtype = frame_dtype(self.num_bodies)
+        self.capacity = max(1, capacity)
+        self.frame_count = 0
+        self._frames = None
+        self._header = None
+        if append and os.path.exists(filename):
+            self._reopen(simulation)
+        else:
+            self._create(simulation)
+
+        self.closed = False
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._write_frames, name="trajectory-writer", daemon=True)
+        self._thread.start()
+
+    def _create(self, simulation: Simulation) -> None:
+        """Write the header and metadata of a new file and map its frames.
+
+        Args:
+            simulation (Simulation): The simulation that will be recorded.
+        """
+        names = json.dumps(simulation.names).encode("utf-8")
+        colors = np.ascontiguousarray(simulation.colors, dtype=np.uint8)
+        metadata_end = HEADER_DTYPE.itemsize + colors.nbytes + len(names)
+        self.data_offset = -(-metadata_end // ALIGNMENT) * ALIGNMENT
+
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header[0] = (MAGIC, VERSION, self.num_bodies, self.capacity, 0, self.data_offset, len(names))
+        with open(self.filename, "wb") as file:
+            file.write(header.tobytes())
+            file.write(colors.tobytes())
+            file.write(names)
+        self._allocate(self.capacity)
+
+    def _reopen(self, simulation: Simulation) -> None:
+        """Map the frames of an existing file to continue it.
+
+        Frames from the simulation's current step on are dropped, as a resumed run records them again.
+
+        Args:
+            simulation (Simulation): The simulation that will be recorded.
+
+        Raises:
+            ValueError: If the file is not a trajectory of the same number of bodies.
+        """
+        header = np.fromfile(self.filename, dtype=HEADER_DTYPE, count=1)
+        if len(header) == 0 or header[0]["magic"] != MAGIC or header[0]["version"] != VERSION:
+            raise ValueError(f"Cannot append to {self.filename}, it is not a trajectory file of this version.")
+        if header[0]["num_bodies"] != self.num_bodies:
+            raise ValueError(
+                f"Cannot append to {self.filename}, it records {header[0]['num_bodies']} bodies "
+                f"but the simulation has {self.num_bodies}."
+            )
+        self.data_offset = int(header[0]["data_offset"])
+        frame_count = int(header[0]["frame_count"])
+        if frame_count:
+            frames = np.memmap(
+                self.filename, dtype=self.frame_dtype, mode="r", offset=self.data_offset, shape=(frame_count,)
+            )
+            self.frame_count = int(np.searchsorted(frames["step"], simulation.step_count))
+            del frames
+        self._allocate(max(self.capacity, self.frame_count))
+        self._header["frame_count"][0] = self.frame_count
+
+    def __enter__(self) -> "TrajectoryWriter":
+        """Return the writer for use in a with statement."""
+        return self
+
+    def __exit__(self, *args) -> None:
+        """Close the writer at the end of a with statement."""
+        self.close()
+
+    def _allocate(self, capacity: int) -> None:
+        """Size the file to hold a number of frames and map the header and frame blocks.
+
+        Args:
+            capacity (int): The number of frames the file should hold.
+        """
+        self._unmap()
+        with open(self.filename, "r+b") as file:
+            file.truncate(self.data_offset + capacity * self.frame_dtype.itemsize)
+        self.capacity = capacity
+        self._header = np.memmap(self.filename, dtype=HEADER_DTYPE, mode="r+", shape=(1,))
+        self._header["capacity"][0] = capacity
+        self._frames = np.memmap(
+            self.filename, dtype=self.frame_dtype, mode="r+", offset=self.data_offset, shape=(capacity,)
+        )
+
+    def _unmap(self) -> None:
+        """Flush and release the memory maps, files cannot be resized while mapped on some platforms."""
+        for mapping in (self._header, self._frames):
+            if mapping is not None:
+                mapping.flush()
+        self._header = None
+        self._frames = None
+
+    def record(self, simulation: Simulation) -> None:
+        """Queue the current state of the simulation to be written as the next frame.
+
+        Args:
+            simulation (Simulation): The simulation to record.
+
+        Raises:
+            RuntimeError: If the writer is closed or the writer thread failed.
+        """
+        self._check_error()
+        if self.closed:
+            raise RuntimeError(f"Trajectory writer for {self.filename} is closed.")
+        state = simulation.state
+        # Frames are always stored as float64, whatever the precision of the simulation
+        positions = np.array(state.positions, dtype=np.float64)
+        velocities = np.array(state.velocities, dtype=np.float64)
+        self._queue.put((simulation.time, simulation.step_count, positions, velocities))
+
+    def _write_frames(self) -> None:
+        """Write queued frames until the closing sentinel is received."""
+        while (frame := self._queue.get()) is not None:
+            if self._error is not None:
+                # Keep draining so record() and close() never block on a full queue
+                continue
+            try:
+                self._write_frame(*frame)
+            except Exception as error:  # Surfaced on the stepping thread by record() and close()
+                self._error = error
+
+    def _write_frame(self, time: float, step: int, positions: np.ndarray, velocities: np.ndarray) -> None:
+        """Write one frame to the file and update the header's frame count.
+
+        Args:
+            time (float): The simulated time of the frame.
+            step (int): The simulation step of the frame.
+            positions (np.ndarray): Positions of the bodies.
+            velocities (np.ndarray): Velocities of the bodies.
+        """
+        if self.frame_count == self.capacity:
+            self._allocate(self.capacity * 2)
+        index = self.frame_count
+        self._frames["time"][index] = time
+        self._frames["step"][index] = step
+        self._frames["positions"][index] = positions
+        self._frames["velocities"][index] = velocities
+        self.frame_count += 1
+        self._header["frame_count"][0] = self.frame_count
+
+    def _check_error(self) -> None:
+        """Raise any error from the writer thread."""
+        if self._error is not None:
+            raise RuntimeError(f"Failed writing trajectory {self.filename}.") from self._error
+
+    def close(self) -> None:
+        """Write all queued frames, trim unused capacity and close the file."""
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self._check_error()
+        self._unmap()
+        header = np.memmap(self.filename, dtype=HEADER_DTYPE, mode="r+", shape=(1,))
+        header["capacity"][0] = self.frame_count
+        header.flush()
+        del header
+        with open(self.filename, "r+b") as file:
+            file.truncate(self.data_offset + self.frame_count * self.frame_dtype.itemsize)
+
+
+class TrajectoryReader:
+    """Random access to the frames of a trajectory file through a memory map."""
+
+    def __init__(self, filename: str):
+        """Open a trajectory file.
+
+        Args:
+            filename (str): The file to read.
+
+        Raises:
+            ValueError: If the file is not a trajectory file of a supported version.
+        """
+        self.filename = filename
+        header = np.fromfile(filename, dtype=HEADER_DTYPE, count=1)
+        if len(header) == 0 or header[0]["magic"] != MAGIC:
+            raise ValueError(f"{filename} is not a trajectory file.")
+        if header[0]["version"] != VERSION:
+            raise ValueError(f"Unsupported trajectory version {header[0]['version']} in {filename}.")
+
+        self.num_bodies = int(header[0]["num_bodies"])
+        data_offset = int(header[0]["data_offset"])
+        with open(filename, "rb") as file:
+            file.seek(HEADER_DTYPE.itemsize)
+            colors = np.frombuffer(file.read(self.num_bodies * 3), dtype=np.uint8).reshape(-1, 3)
+            self.names: list[str] = json.loads(file.read(int(header[0]["names_length"])).decode("utf-8"))
+        self.colors: list[tuple[int, int, int]] = [tuple(color) for color in colors.tolist()]
+
+        frame_count = int(header[0]["frame_count"])
+        dtype = frame_dtype(self.num_bodies)
+        if frame_count == 0:
+            self.frames = np.zeros(0, dtype=dtype)
+        else:
+            self.frames = np.memmap(filename, dtype=dtype, mode="r", offset=data_offset, shape=(frame_count,))
+
+    def __len__(self) -> int:
+        """Return the number of frames in the file."""
+        return len(self.frames)
+
+    def frame(self, index: int) -> np.void:
+        """Return a frame, with fields time, step, positions and velocities.
+
+        Args:
+            index (int): Index of the frame.
+
+        Returns:
+            np.void: The frame, read lazily from the file.
+        """
+        return self.frames[index]
+
+    def positions(self, index: int) -> np.ndarray:
+        """Return the positions of every body in a frame.
+
+        Args:
+            index (int): Index of the frame.
+
+        Returns:
+            np.ndarray: The positions, shape (num_bodies, 2).
+        """
+        return self.frames[index]["positions"]
+
+    @property
+    def times(self) -> np.ndarray:
+        """The simulated time of every frame."""
+        return self.frames["time"]
+
+    def find_frame(self, time: float) -> Optional[int]:
+        """Return the index of the last frame at or before a simulated time.
+
+        Args:
+            time (float): The simulated time.
+
+        Returns:
+            Optional[int]: The index of the frame, or None if every frame is later.
+        """
+        index = int(np.searchsorted(self.times, time, side="right")) - 1
+        return index if index >= 0 else None
@@ -1,59 +1,119 @@
-from collections import deque
+import math
+import time
 from decimal import Decimal
 from os import environ
+from typing import Optional
 
 environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
 
+import numpy as np
 import pygame
 from pygame import Surface
 from pygame.event import Event
 
-from gravity_sim.object import Color
+from gravity_sim.linear_quadtree import LinearQuadTree
+from gravity_sim.metrics import Metrics, format_snapshot
+from gravity_sim.rendering import (
+    DensityRenderer,
+    PointRenderer,
+    label_indices,
+    to_screen,
+    to_world,
+    use_density_map,
+    visible,
+)
 from gravity_sim.simulation import Simulation
+from gravity_sim.simulation_worker import SimulationWorker
 from gravity_sim.vector import Vector
 
 
 class Window:
-    """Pygame window to display simulation."""
-
-    def __init__(self, simulation: Simulation):
+    """Pygame window to display simulation.
+
+    The simulation steps on a SimulationWorker thread while the window draws at the display rate,
+    interpolating positions between the worker's two latest snapshots, so panning and zooming stay
+    smooth however long a step takes.
+    """
+
+    # Seconds between refreshes of the metrics overlay
+    METRICS_INTERVAL = 0.5
+    # Side of the screen cells in pixels, only the most massive body in each cell is named
+    NAME_CELL_SIZE = 64
+    # The furthest in pixels the mouse may move between pressing and releasing a button for a click
+    CLICK_TOLERANCE = 4
+    # The furthest in pixels from a body a click focuses it
+    PICK_RADIUS = 12
+
+    def __init__(self, simulation: Simulation, steps_per_second: float = 60):
         """Intialise a new Window to render a simulation.
 
         Args:
             simulation (Simulation): The simulation to start rendering.
+            steps_per_second (float, optional): The most simulation steps to run each second, 0 for no limit.
+                Defaults to 60.
         """
         pygame.init()
         self.simulation = simulation
+        self.worker = self.create_worker(steps_per_second)
 
         self._fps = 60
         self.screen_size = Vector(600, 600)
         self.camera_pos = Vector(0, 0)
+        # The time positions are drawn at this frame, and the bodies that may be on the screen or None for all
+        self.frame_time = None
+        self.shown_bodies: Optional[np.ndarray] = None
         self.scale = Decimal(self.estimate_scale())
+        self.positions = self.get_positions()
 
-        pygame.display.set_caption(simulation.name)
+        pygame.display.set_caption(self.get_title())
         self.screen = pygame.display.set_mode(self.screen_size.to_tuple(), pygame.RESIZABLE)
         self.clock = pygame.time.Clock()
+        self.screen_points = self.to_screen(self.positions)
 
         self.paused = False
         self.focused_object = None
+        self.click_start: Optional[tuple[int, int]] = None
         self.zoom_factor = Decimal(1.2)
         self.speed_factor = Decimal(1.5)
         self.show_names = True
         self.show_quadtree = False
         self.show_center_masses = False
+        self.show_metrics = False
+        self.metrics = self.get_metrics()
+        self.metrics_lines: list[str] = []
+        self.metrics_collected = time.perf_counter()
 
         self.font = pygame.font.SysFont("Calibri", 20)
-        self.object_names = self._generate_object_names()
+        self.names = self.get_names()
+        self.colors = self.get_colors()
+        self.masses = self.get_masses()
+        self.point_renderer = PointRenderer(self.colors)
+        self.density_renderer = DensityRenderer()
+        # Draw a density map instead of bodies when zoomed out far enough that they crowd together
+        self.allow_density_map = True
+        self.showing_density_map = False
+        # Surfaces of the names rendered so far, names are only rendered once they are shown
+        self.name_surfaces: dict[int, Surface] = {}
+        # Bodies from the most to the least massive, the order they get a name when crowded together
+        self.name_order = np.arange(len(self.names)) if self.masses is None else np.argsort(-self.masses, kind="stable")
+        self.name_ranks = np.empty_like(self.name_order)
+        self.name_ranks[self.name_order] = np.arange(len(self.name_order))
 
         self.print_help()
 
     def run(self):
         """Start the window to render the simulation."""
-        while 1:
-            result = self.update()
-            if not result:
-                break
-        pygame.quit()
+        if self.worker:
+            self.worker.start()
+        try:
+            while 1:
+                result = self.update()
+                if not result:
+                    break
+        finally:
+            if self.worker:
+                self.worker.stop()
+            pygame.quit()
 
     def update(self) -> bool:
         """Update loop for window and simulation logic.
@@ -64,13 +124,19 @@ class Window:
         if not self.handle_events():
             return False
 
-        self.screen.fill((0, 0, 0))
-        self.move_camera()
-        self.update_simulation()
-        self.focus_camera()
-        self.render_simulation()
-        self.render_quadtree()
-        self.render_object_names()
+        with self.metrics.timer("frame"):
+            self.screen.fill((0, 0, 0))
+            self.move_camera()
+            self.update_simulation()
+            self.frame_time = time.perf_counter()
+            self.focus_camera()
+            self.shown_bodies = self.cull()
+            self.positions = self.get_positions(self.shown_bodies)
+            with self.metrics.timer("render"):
+                self.render_simulation()
+                self.render_quadtree()
+                self.render_object_names()
+        self.render_metrics()
 
         pygame.display.update()
         self.clock.tick(self._fps)
@@ -90,10 +156,63 @@ class Window:
                 self.handle_event(event)
         return True
 
+    def create_worker(self, steps_per_second: float) -> Optional[SimulationWorker]:
+        """Return the worker that steps the simulation.
+
+        Args:
+            steps_per_second (float): The most steps to run each second, 0 for no limit.
+
+        Returns:
+            Optional[SimulationWorker]: The worker, not yet started.
+        """
+        return SimulationWorker(self.simulation, steps_per_second)
+
     def update_simulation(self):
-        """Update the simulation to the next state."""
-        if not self.paused:
-            self.simulation.step()
+        """Check on the simulation, which steps on the worker thread."""
+        self.worker.check_error()
+
+    def get_title(self) -> str:
+        """Return the title of the window."""
+        return self.simulation.name
+
+    def get_names(self) -> list[str]:
+        """Return the name of every body."""
+        return self.simulation.names
+
+    def get_colors(self) -> list[tuple[int, int, int]]:
+        """Return the RGB color of every body."""
+        return [tuple(color) for color in self.simulation.colors.tolist()]
+
+    def get_masses(self) -> Optional[np.ndarray]:
+        """Return the mass of every body as float64, or None to weight every body equally."""
+        return np.asarray(self.simulation.state.masses, dtype=np.float64)
+
+    def get_metrics(self) -> Metrics:
+        """Return the registry shown by the metrics overlay."""
+        return self.simulation.metrics
+
+    def get_positions(self, indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return the positions of bodies to draw this frame as float64.
+
+        Args:
+            indices (Optional[np.ndarray], optional): Indices of the bodies. Defaults to None for every body.
+
+        Returns:
+            np.ndarray: The positions, shape (n, 2).
+        """
+        return self.worker.positions(self.frame_time, indices)
+
+    def spatial_index(self) -> tuple[Optional[LinearQuadTree], Optional[tuple[np.ndarray, np.ndarray]]]:
+        """Return the latest snapshot's tree to find the bodies drawn this frame with, and the paddings of its queries.
+
+        Returns:
+            tuple[Optional[LinearQuadTree], Optional[tuple[np.ndarray, np.ndarray]]]: The tree and its paddings,
+                or None and None if there is no tree, as in replays.
+        """
+        snapshot = self.worker.latest if self.worker else None
+        if snapshot is None:
+            return None, None
+        return snapshot.index, snapshot.index_paddings
 
     def handle_event(self, event: Event) -> None:
         """Update the simulation's status based on pygame event.
@@ -108,6 +227,13 @@ class Window:
             case pygame.KEYDOWN:
                 self.handle_key_down(event.key)
                 return
+            case pygame.MOUSEBUTTONDOWN if event.button == 1:
+                self.click_start = event.pos
+            case pygame.MOUSEBUTTONUP if event.button == 1:
+                # Releasing after dragging the camera is not a click
+                if self.click_start is not None and math.dist(event.pos, self.click_start) <= self.CLICK_TOLERANCE:
+                    self.click(event.pos)
+                self.click_start = None
 
     def handle_key_down(self, key: int) -> None:
         """Update the status of the simulation based on a key down press.
@@ -118,10 +244,6 @@ class Window:
         match key:
             case pygame.K_SPACE:
                 self.toggle_pause()
-            case pygame.K_RIGHT:
-                self.update_focused_object_index(1)
-            case pygame.K_LEFT:
-                self.update_focused_object_index(-1)
             case pygame.K_PERIOD:
                 self.change_simulation_speed(self.speed_factor)
             case pygame.K_COMMA:
@@ -130,10 +252,27 @@ class Window:
                 self.toggle_show_names()
             case pygame.K_q:
                 self.toggle_show_quadtree()
+            case pygame.K_m:
+                self.toggle_show_metrics()
+            case pygame.K_d:
+                self.toggle_density_map()
 
     def toggle_show_quadtree(self) -> None:
         """Toggle displaying the quadtree."""
         self.show_quadtree = not self.show_quadtree
+        if self.worker:
+            self.worker.capture_tree = self.show_quadtree
+
+    def toggle_show_metrics(self) -> None:
+        """Toggle displaying the metrics overlay, starting a new measurement when shown."""
+        self.show_metrics = not self.show_metrics
+        self.metrics.reset()
+        self.metrics_lines = []
+        self.metrics_collected = time.perf_counter()
+
+    def toggle_density_map(self) -> None:
+        """Toggle switching to a density map when zoomed out."""
+        self.allow_density_map = not self.allow_density_map
 
     def toggle_show_names(self) -> None:
         """Toggle displaying names in the simulation."""
@@ -142,6 +281,7 @@ class Window:
     def toggle_pause(self) -> None:
         """Toggle the simulation between paused and unpaused."""
         self.paused = not self.paused
+        self.worker.set_paused(self.paused)
 
     def move_camera(self):
         """If the left mouse button is held, moves the camera."""
@@ -150,26 +290,59 @@ class Window:
             self.focused_object = None
             self.camera_pos -= Vector(self.mouse_movement[0], self.mouse_movement[1] * -1)
 
-    def update_focused_object_index(self, amount: int) -> None:
-        """Change the index of the focused object by an amount.
+    def click(self, position: tuple[int, int]) -> None:
+        """Focus the object under a click, or stop following any object if there is none.
 
         Args:
-            amount (int): The amount to change the focused object by.
+            position (tuple[int, int]): The screen coordinates of the click.
         """
-        self.camera_pos = Vector(0, 0)
-        if self.focused_object is None:
-            self.focused_object = -1
-        self.focused_object += amount
+        self.focused_object = self.pick(position)
+
+    def pick(self, position: tuple[int, int]) -> Optional[int]:
+        """Return the object drawn nearest to a point on the screen, with a radius query of the spatial index.
 
-        if self.focused_object >= self.simulation.get_num_objects():
-            self.focused_object = 0
-        if self.focused_object < 0:
-            self.focused_object = self.simulation.get_num_objects() - 1
+        Without a spatial index every object is a candidate.
+
+        Args:
+            position (tuple[int, int]): The screen coordinates.
+
+        Returns:
+            Optional[int]: Index of the nearest object within PICK_RADIUS pixels, or None if there is none.
+        """
+        if not self.names:
+            return None
+        point = self.to_world(np.array([position]))[0]
+        radius = self.PICK_RADIUS / float(self.scale)
+        tree, paddings = self.spatial_index()
+        candidates = np.arange(len(self.names)) if tree is None else tree.query_radius(point, radius, paddings)
+        if not len(candidates):
+            return None
+        offsets = self.get_positions(candidates) - point
+        distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        nearest = int(np.argmin(distances))
+        return int(candidates[nearest]) if distances[nearest] <= radius else None
+
+    def cull(self) -> Optional[np.ndarray]:
+        """Return the bodies that may be on the screen, with a range query of the spatial index.
+
+        The viewport is widened by the size of a name cell, so names of bodies just off the screen still show.
+
+        Returns:
+            Optional[np.ndarray]: Indices of the bodies, or None for every body if there is no spatial index.
+        """
+        tree, paddings = self.spatial_index()
+        if tree is None:
+            return None
+        width, height = self.screen.get_size()
+        lower, upper = self.to_world(np.array([[0, height], [width, 0]]))
+        margin = self.NAME_CELL_SIZE / float(self.scale)
+        return tree.query_range(lower - margin, upper + margin, paddings)
 
     def focus_camera(self):
         """Set the cameras position to the location of the focused object."""
         if self.focused_object is not None:
-            self.camera_pos = self.simulation.get_object(self.focused_object).position * self.scale
+            position = self.get_positions(np.array([self.focused_object]))[0]
+            self.camera_pos = Vector(position) * self.scale
 
     def handle_zoom(self, y: int) -> None:
         """Zoom in or out based on the mouse wheel movement.
@@ -183,32 +356,58 @@ class Window:
             self.zoom_out()
 
     def render_simulation(self) -> None:
-        """Draw all the objects on the screen."""
-        for obj in self.simulation.get_objects():
-            pos = self.scale_point(obj.get_position(), self.camera_pos)
-            self.draw_point(pos, obj.color)
+        """Draw all the objects on the screen, or a map of their density when too many crowd together."""
+        self.screen_points = points = self.to_screen(self.positions)
+        size = self.screen.get_size()
+        crowded = use_density_map(int(np.count_nonzero(visible(points, size))), size, self.showing_density_map)
+        self.showing_density_map = self.allow_density_map and crowded
+        if self.showing_density_map:
+            masses = self.masses
+            if masses is not None and self.shown_bodies is not None:
+                masses = masses[self.shown_bodies]
+            drawn = self.density_renderer.draw(self.screen, points, masses)
+        else:
+            drawn = self.point_renderer.draw(self.screen, points, self.shown_bodies)
+        self.metrics.gauge("bodies_drawn", drawn)
+        self.metrics.gauge("density_map", int(self.showing_density_map))
 
     def render_object_names(self) -> None:
-        """Render object names."""
+        """Render the names of the objects on the screen, only naming the most massive of those close together.
+
+        The focused object is always named.
+        """
         if not self.show_names:
             return
-        for name, obj in zip(self.object_names, self.simulation.get_objects()):
-            pos = self.scale_point(obj.get_position(), self.camera_pos).to_tuple()
-            self.screen.blit(name, (pos[0] - name.get_width() // 2, pos[1] - name.get_height() * 1.8))
+        shown = label_indices(
+            self.screen_points, self.screen.get_size(), self.label_order(), self.NAME_CELL_SIZE, self.NAME_CELL_SIZE
+        )
+        bodies = shown if self.shown_bodies is None else self.shown_bodies[shown]
+        for index, (x, y) in zip(bodies.tolist(), self.screen_points[shown].tolist()):
+            name = self.name_surface(index)
+            self.screen.blit(name, (x - name.get_width() // 2, y - name.get_height() * 1.8))
+
+    def render_metrics(self) -> None:
+        """Draw the timers, counters and gauges collected over the last interval in the top left corner."""
+        if not self.show_metrics:
+            return
+        now = time.perf_counter()
+        if now - self.metrics_collected >= self.METRICS_INTERVAL:
+            self.metrics_lines = format_snapshot(self.metrics.collect())
+            self.metrics_collected = now
+        y = 10
+        for line in self.metrics_lines:
+            label = self.font.render(line, True, (200, 200, 200), (0, 0, 0))
+            self.screen.blit(label, (10, y))
+            y += label.get_height()
 
     def render_quadtree(self) -> None:
-        """Draw the quadtree to the screen."""
-        if not self.show_quadtree or not self.simulation.last_quadtree:
+        """Draw the tree of the latest snapshot to the screen."""
+        if not self.show_quadtree or self.worker.latest.tree is None:
             return
-        stack = deque([self.simulation.last_quadtree])
-        while stack:
-            node = stack.pop()
-            center = self.scale_point(node.center, self.camera_pos)
-            self.draw_square(center, node.width * self.scale)
-
-            for subtree in node.subtrees.values():
-                if subtree:
-                    stack.append(subtree)
+        centers, half_widths = self.worker.latest.tree
+        scale = float(self.scale)
+        for center, width in zip(self.to_screen(centers).tolist(), (half_widths * scale).tolist()):
+            self.draw_square(Vector(center), width)
 
     def draw_square(self, center: Vector, width: int) -> None:
         """Draw a green square to the screen.
@@ -222,42 +421,29 @@ class Window:
         rect.clip(self.screen.get_rect())
         pygame.draw.rect(self.screen, (0, 255, 0), rect, width=1)
 
-    def draw_point(self, position: Vector, color: Color) -> None:
-        """Draw a point on the screen at the given position, centering the point on the screen.
+    def to_world(self, points: np.ndarray) -> np.ndarray:
+        """Transform screen coordinates to positions in the simulation, the inverse of to_screen().
 
         Args:
-            position (Vector): The position to draw the point.
-            color (Color): Color of the point.
-        """
-        radius = 8
-        width, height = self.screen.get_size()
-        if position.x < -radius or position.x > width + radius:
-            return
-        if position.y < -radius or position.y > height + radius:
-            return
-        pygame.draw.circle(surface=self.screen, color=tuple(color), center=position.to_tuple(), radius=radius)
+            points (np.ndarray): The screen coordinates, shape (n, 2).
 
-    def scale_point(self, point: Vector, refPoint: Vector) -> Vector:
-        """Scale a point to render it to the screen.
+        Returns:
+            np.ndarray: Positions as float64, shape (n, 2).
+        """
+        camera = (float(self.camera_pos[0]), float(self.camera_pos[1]))
+        return to_world(points, float(self.scale), camera, self.screen.get_size())
 
-        Applies the current scale to the point.
-        Moves the point relative to the camera position,
-        Flips the y position.
-        Center the point on the screen.
+    def to_screen(self, positions: np.ndarray) -> np.ndarray:
+        """Transform positions in the simulation to screen coordinates, with the current scale and camera.
 
         Args:
-            point (Vector): The point to scale.
-            refPoint (Vector): The position of the "camera".
+            positions (np.ndarray): The positions, shape (n, 2).
 
         Returns:
-            Vector: The scaled point.
+            np.ndarray: Screen coordinates as float64, shape (n, 2).
         """
-        width, height = self.screen.get_size()
-        point *= self.scale
-        point -= refPoint
-        point = Vector(point[0], point[1] * -1)
-        point += Vector(width // 2, height // 2)
-        return point
+        camera = (float(self.camera_pos[0]), float(self.camera_pos[1]))
+        return to_screen(positions, float(self.scale), camera, self.screen.get_size())
 
     def zoom_in(self):
         """Increase the scale of the simulation."""
@@ -275,7 +461,8 @@ class Window:
         Args:
             factor (Decimal): The factor to multiply it by.
         """
-        self.simulation.set_timestep(self.simulation.get_timestep() * factor)
+        simulation = self.simulation
+        self.worker.submit(lambda: simulation.set_timestep(simulation.get_timestep() * factor))
 
     def estimate_scale(self) -> float:
         """Estimate an initial scale for the simulation based on the objects furthest apart.
@@ -283,37 +470,57 @@ class Window:
         Returns:
             float: The estimated scale value.
         """
-        if len(self.simulation.objects) < 2:
+        positions = self.get_positions()
+        if len(positions) < 2:
             return 1
 
-        x_values = [obj.position[0] for obj in self.simulation.objects]
-        y_values = [obj.position[1] for obj in self.simulation.objects]
+        x_range, y_range = np.ptp(positions, axis=0)
+
+        return max(self.screen_size[0], self.screen_size[1]) / Decimal(max(x_range, y_range))
+
+    def label_order(self) -> np.ndarray:
+        """Return the bodies drawn this frame from the most to the least important to name.
 
-        x_range = max(x_values) - min(x_values)
-        y_range = max(y_values) - min(y_values)
+        The focused object comes first, then the others from the most massive.
 
-        return max(self.screen_size[0], self.screen_size[1]) / max(x_range, y_range)
+        Returns:
+            np.ndarray: Indices into the positions drawn this frame.
+        """
+        if self.shown_bodies is None:
+            order = self.name_order
+            focused = self.focused_object
+        else:
+            order = np.argsort(self.name_ranks[self.shown_bodies], kind="stable")
+            matches = np.flatnonzero(self.shown_bodies == self.focused_object)
+            focused = int(matches[0]) if len(matches) else None
+        if focused is None:
+            return order
+        return np.concatenate(([focused], order[order != focused]))
+
+    def name_surface(self, index: int) -> Surface:
+        """Return the surface of an object's name, rendering it the first time it is shown.
 
-    def _generate_object_names(self) -> list[Surface]:
-        """Render each object's name onto a surface.
+        Args:
+            index (int): Index of the object.
 
         Returns:
-            list[Surface]: A list of surfaces, each surface containing an object's name.
+            Surface: The name in the object's color.
         """
-        names = []
-        for obj in self.simulation.get_objects():
-            names.append(self.font.render(obj.name, True, tuple(obj.color)))
-        return names
+        surface = self.name_surfaces.get(index)
+        if surface is None:
+            surface = self.name_surfaces[index] = self.font.render(self.names[index], True, self.colors[index])
+        return surface
 
     def print_help(self):
         """Print the controls to the terminal."""
         help = """
 Controls:
 Space - Pause/play simulation
-Right Arrow - Increment focused object
-Left Arrow - Decrement focused object
+Click - Follow the object under the cursor, or stop following on empty space
 Period - Increase speed
 Comma - Decrease speed
 N - Toggle names
-Q - Toggle showing quadtree"""
+Q - Toggle showing quadtree
+M - Toggle performance metrics
+D - Toggle the density map shown when zoomed out"""
         print(help)
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+
+def random_bodies(count: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Return the positions and masses of a clustered set of bodies.
+
+    Args:
+        count (int): The number of bodies.
+        seed (int, optional): Seed for the random positions and masses. Defaults to 0.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The positions, shape (count, 2), and masses, shape (count,).
+    """
+    rng = np.random.default_rng(seed)
+    return rng.normal(0, 1e11, (count, 2)), rng.uniform(1e20, 1e24, count)
+
+
+def relative_errors(actual: np.ndarray, expected: np.ndarray) -> np.ndarray:
+    """Return the error of each acceleration relative to its expected magnitude."""
+    return np.linalg.norm(actual - expected, axis=1) / np.linalg.norm(expected, axis=1)
+
+
+@pytest.fixture
+def bodies() -> tuple[np.ndarray, np.ndarray]:
+    """Fixture to create the positions and masses of a clustered set of bodies."""
+    return random_bodies(1000)
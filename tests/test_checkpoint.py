@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from gravity_sim.checkpoint import Checkpoint
+from gravity_sim.config_loader import ConfigLoader
+from gravity_sim.headless import HeadlessRunner
+from gravity_sim.random_factory import RandomFactory
+from gravity_sim.simulation import Simulation
+
+
+class TestCheckpoint:
+    """Test the Checkpoint class."""
+
+    @pytest.fixture
+    def simulation(self) -> Simulation:
+        """Fixture to create a simulation of three bodies that has already been stepped."""
+        simulation = Simulation.from_dict(
+            {
+                "name": "Test",
+                "description": "Checkpoint test",
+                "timestep": 100,
+                "steps": 2,
+                "engine": "linear_barnes_hut",
+                "engine_options": {"leaf_size": 1},
+                "objects": [
+                    {"name": "Sun", "mass": 1.989e30, "position": [0, 0], "velocity": [0, 0], "color": [255, 255, 0]},
+                    {"name": "Earth", "mass": 5.972e24, "position": [149_597_870_700, 0], "velocity": [0, 29_780]},
+                    {"name": "Mars", "mass": 6.417e23, "position": [0, 227_939_366_000], "velocity": [-24_077, 0]},
+                ],
+            }
+        )
+        simulation.step()
+        simulation.step()
+        return simulation
+
+    def test_round_trip(self, simulation: Simulation, tmp_path):
+        """A loaded checkpoint should hold exactly the saved state and settings."""
+        filename = str(tmp_path / "test.ckpt")
+        Checkpoint.save(simulation, filename)
+        loaded = Checkpoint.load(filename)
+
+        np.testing.assert_array_equal(loaded.state.positions, simulation.state.positions)
+        np.testing.assert_array_equal(loaded.state.velocities, simulation.state.velocities)
+        np.testing.assert_array_equal(loaded.state.masses, simulation.state.masses)
+        np.testing.assert_array_equal(loaded.colors, simulation.colors)
+        assert loaded.names == simulation.names
+        assert loaded.name == simulation.name
+        assert loaded.description == simulation.description
+        assert loaded.timestep == simulation.timestep
+        assert loaded.grav_constant == simulation.grav_constant
+        assert loaded.steps == simulation.steps
+        assert loaded.time == simulation.time
+        assert loaded.step_count == simulation.step_count
+        assert loaded.engine == simulation.engine
+        assert loaded.engine_options == simulation.engine_options
+        assert loaded.integrator_name == simulation.integrator_name
+        assert loaded.get_object(1).name == "Earth"
+
+    def test_resumed_run_matches(self, simulation: Simulation, tmp_path):
+        """Stepping a loaded checkpoint should give the same result as stepping the original."""
+        filename = str(tmp_path / "test.ckpt")
+        Checkpoint.save(simulation, filename)
+        loaded = Checkpoint.load(filename)
+        for _ in range(3):
+            simulation.step()
+            loaded.step()
+
+        np.testing.assert_array_equal(loaded.state.positions, simulation.state.positions)
+
+    def test_resume_default_engine(self, simulation: Simulation, tmp_path):
+        """A loaded checkpoint should step with the default engine."""
+        simulation.engine = "barnes_hut"
+        simulation.engine_options = {}
+        filename = str(tmp_path / "test.ckpt")
+        Checkpoint.save(simulation, filename)
+        loaded = Checkpoint.load(filename)
+        loaded.step()
+
+        assert loaded.step_count == simulation.step_count + 1
+
+    def test_random_state(self, simulation: Simulation, tmp_path):
+        """Loading a checkpoint should restore the random number generator."""
+        RandomFactory.set_random(1)
+        filename = str(tmp_path / "test.ckpt")
+        Checkpoint.save(simulation, filename)
+        expected = RandomFactory.get_random().random()
+
+        Checkpoint.load(filename)
+
+        assert RandomFactory.get_random().random() == expected
+
+    def test_invalid_file(self, tmp_path):
+        """Loading a file that is not a checkpoint should raise a ValueError."""
+        filename = tmp_path / "test.ckpt"
+        filename.write_bytes(b"not a checkpoint")
+
+        with pytest.raises(ValueError):
+            Checkpoint.load(str(filename))
+
+    def test_config_loader(self, simulation: Simulation, tmp_path):
+        """ConfigLoader should load .ckpt files as checkpoints."""
+        filename = str(tmp_path / "test.ckpt")
+        Checkpoint.save(simulation, filename)
+
+        assert ConfigLoader.load_file(filename).step_count == simulation.step_count
+
+    def test_headless_checkpoints(self, simulation: Simulation, tmp_path):
+        """HeadlessRunner should save a checkpoint periodically and at the end of a run."""
+        filename = str(tmp_path / "test.ckpt")
+        runner = HeadlessRunner(simulation, checkpoint_file=filename, checkpoint_every=2)
+
+        runner.advance()
+        runner.advance()
+        assert Checkpoint.load(filename).step_count == 4
+        runner.run(steps=1)
+
+        assert Checkpoint.load(filename).step_count == 5
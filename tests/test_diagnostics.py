@@ -0,0 +1,137 @@
+import json
+
+import numpy as np
+import pytest
+from conftest import random_bodies
+
+from gravity_sim.barnes_hut import BarnesHutEngine
+from gravity_sim.diagnostics import Diagnostics, DiagnosticsLog, potential_energy
+from gravity_sim.direct import DirectEngine
+from gravity_sim.headless import HeadlessRunner
+from gravity_sim.simulation import Simulation
+from gravity_sim.state import BodyState
+
+G = 6.6743e-11
+
+CONFIG = {
+    "name": "Test",
+    "timestep": 100,
+    "engine": "direct",
+    "objects": [
+        {"name": "A", "mass": 1e24, "position": [0, 0], "velocity": [0, 0]},
+        {"name": "B", "mass": 1e22, "position": [1e8, 0], "velocity": [0, 1000]},
+        {"name": "C", "mass": 1e20, "position": [0, -3e8], "velocity": [500, 0]},
+    ],
+}
+
+
+class TestDiagnostics:
+    """Test the Diagnostics class."""
+
+    def test_two_bodies(self):
+        """Energy, momentum and angular momentum of two bodies should match their formulas."""
+        state = BodyState(
+            positions=np.array([[0.0, 0.0], [2.0, 0.0]]),
+            velocities=np.array([[0.0, -1.0], [0.0, 3.0]]),
+            masses=np.array([3.0, 1.0]),
+        )
+        diagnostics = Diagnostics.from_state(state, G, step=5, time=500.0)
+
+        assert diagnostics.step == 5
+        assert diagnostics.kinetic_energy == pytest.approx(0.5 * 3 * 1 + 0.5 * 1 * 9)
+        assert diagnostics.potential_energy == pytest.approx(-G * 3 * 1 / 2)
+        assert diagnostics.total_energy == pytest.approx(6 - G * 1.5)
+        assert diagnostics.momentum == pytest.approx((0.0, 0.0))
+        assert diagnostics.angular_momentum == pytest.approx(6.0)
+        assert diagnostics.momentum_scale == pytest.approx(6.0)
+
+    def test_drift(self):
+        """Drift should be zero from the reference and relative to its values otherwise."""
+        reference = Diagnostics(0, 0.0, 2.0, -4.0, (0.0, 0.0), 10.0, 8.0, 20.0)
+        later = Diagnostics(1, 1.0, 2.0, -3.9, (0.4, 0.3), 9.0, 8.0, 20.0)
+
+        assert reference.drift(reference) == {
+            "energy_drift": 0.0,
+            "momentum_drift": 0.0,
+            "angular_momentum_drift": 0.0,
+        }
+        drift = later.drift(reference)
+        assert drift["energy_drift"] == pytest.approx(0.1 / 2)
+        assert drift["momentum_drift"] == pytest.approx(0.5 / 8)
+        assert drift["angular_momentum_drift"] == pytest.approx(-0.1)
+
+    def test_dict(self):
+        """Samples should survive a round trip through JSON."""
+        diagnostics = Diagnostics.from_state(Simulation.from_dict(CONFIG).state, G)
+        copy = Diagnostics.from_dict(json.loads(json.dumps(diagnostics.to_dict())))
+
+        assert copy == diagnostics
+
+
+class TestPotentialEnergy:
+    """Test the potential energy of systems of bodies."""
+
+    def test_direct_potentials(self):
+        """The direct engine should match a sum over every pair of bodies."""
+        positions, masses = random_bodies(50)
+        expected = np.zeros(len(masses))
+        for i in range(len(masses)):
+            for j in range(len(masses)):
+                if i != j:
+                    expected[i] -= G * masses[j] / np.hypot(*(positions[j] - positions[i]))
+
+        np.testing.assert_allclose(DirectEngine(tile_size=16).potentials(positions, masses, G), expected, rtol=1e-12)
+
+    def test_tree_potentials(self):
+        """The Barnes-Hut potentials should be close to the exact potentials."""
+        positions, masses = random_bodies(2000)
+        exact = DirectEngine().potentials(positions, masses, G)
+
+        np.testing.assert_allclose(BarnesHutEngine(theta=0.5).potentials(positions, masses, G), exact, rtol=1e-2)
+
+    def test_large_systems(self):
+        """Systems above the exact limit should be approximated closely with a tree."""
+        positions, masses = random_bodies(3000)
+        exact = potential_energy(positions, masses, G, exact_limit=3000)
+
+        approximate = potential_energy(positions, masses, G, theta=0.3, exact_limit=1000)
+
+        assert approximate == pytest.approx(exact, rel=2e-3)
+
+    def test_single_body(self):
+        """A single body should have no potential energy."""
+        assert potential_energy(np.zeros((1, 2)), np.ones(1), G) == 0.0
+
+
+class TestDiagnosticsLog:
+    """Test the DiagnosticsLog class."""
+
+    def test_headless_sampling(self, tmp_path):
+        """Headless runs should sample at the start, every few steps and at the end of the run."""
+        path = tmp_path / "diagnostics.jsonl"
+        log = DiagnosticsLog(str(path))
+        HeadlessRunner(Simulation.from_dict(CONFIG), diagnostics_log=log, diagnostics_every=2).run(steps=5)
+        log.close()
+
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [record["step"] for record in records] == [0, 2, 4, 5]
+        assert records[0]["energy_drift"] == 0.0
+        assert all(abs(record["energy_drift"]) < 1e-4 for record in records)
+        assert all(abs(record["momentum_drift"]) < 1e-12 for record in records)
+        assert log.sample_count == 4
+
+    def test_append(self, tmp_path):
+        """Appending should keep measuring drift from the first sample in the file."""
+        path = tmp_path / "diagnostics.jsonl"
+        simulation = Simulation.from_dict(CONFIG)
+        log = DiagnosticsLog(str(path))
+        first = log.sample(simulation)
+        log.close()
+
+        simulation.step()
+        log = DiagnosticsLog(str(path), append=True)
+        log.sample(simulation)
+        log.close()
+
+        assert log.reference == first
+        assert len(path.read_text().splitlines()) == 2
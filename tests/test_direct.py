@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from gravity_sim.direct import DirectEngine
+from gravity_sim.simulation import Simulation
+
+
+class TestDirectEngine:
+    """Test the DirectEngine class."""
+
+    @pytest.fixture
+    def simulation(self) -> Simulation:
+        """Fixture to create a small simulation with randomly placed bodies."""
+        rng = np.random.default_rng(4)
+        objects = [
+            {"name": f"Body {i}", "mass": mass, "position": position, "velocity": [0, 0]}
+            for i, (mass, position) in enumerate(zip(rng.uniform(1e20, 1e24, 12), rng.uniform(-1e9, 1e9, (12, 2))))
+        ]
+        return Simulation.from_dict({"name": "Test", "timestep": 1, "objects": objects})
+
+    def test_invalid_tile_size(self):
+        """A tile size below one should raise a ValueError."""
+        with pytest.raises(ValueError):
+            DirectEngine(tile_size=0)
+
+    @pytest.mark.parametrize("tile_size", [1, 5, 256])
+    def test_matches_pairwise_forces(self, simulation: Simulation, tile_size: int):
+        """Accelerations should match the pairwise method for any tile size."""
+        simulation.calculate_forces()
+        expected = simulation.state.accelerations()
+
+        state = simulation.state
+        actual = DirectEngine(tile_size).accelerations(state.positions, state.masses, float(simulation.grav_constant))
+
+        np.testing.assert_allclose(actual, expected, rtol=1e-10)
+
+    def test_targets(self, simulation: Simulation):
+        """Only the requested targets should be returned, in the order requested."""
+        state = simulation.state
+        engine = DirectEngine(tile_size=2)
+        full = engine.accelerations(state.positions, state.masses, 1.0)
+        actual = engine.accelerations(state.positions, state.masses, 1.0, targets=np.array([7, 2, 5]))
+
+        np.testing.assert_array_equal(actual, full[[7, 2, 5]])
+
+    def test_coincident_bodies(self):
+        """Bodies at the same position should exert no force on each other."""
+        positions = np.array([[0.0, 0.0], [0.0, 0.0], [2.0, 0.0]])
+        masses = np.array([1.0, 1.0, 4.0])
+
+        actual = DirectEngine().accelerations(positions, masses, 1.0)
+
+        np.testing.assert_allclose(actual, [[1, 0], [1, 0], [-0.5, 0]])
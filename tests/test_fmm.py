@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from conftest import relative_errors
+
+from gravity_sim.direct import DirectEngine
+from gravity_sim.fmm import FMMEngine
+from gravity_sim.simulation import Simulation
+
+
+class TestFMMEngine:
+    """Test the FMMEngine class."""
+
+    @pytest.mark.parametrize("options", [{"theta": 0}, {"theta": 1}, {"order": -1}])
+    def test_invalid_options(self, options: dict):
+        """Theta outside (0, 1) or a negative order should raise a ValueError."""
+        with pytest.raises(ValueError):
+            FMMEngine(**options)
+
+    def test_error_falls_with_order(self, bodies: tuple[np.ndarray, np.ndarray]):
+        """The error compared to direct summation should fall quickly as the order rises."""
+        positions, masses = bodies
+        expected = DirectEngine().accelerations(positions, masses, 6.6743e-11)
+        errors = [
+            np.median(relative_errors(FMMEngine(order=order).accelerations(positions, masses, 6.6743e-11), expected))
+            for order in (2, 4, 8)
+        ]
+
+        assert errors[0] < 1e-2
+        assert errors[1] < errors[0] / 10
+        assert errors[2] < errors[1] / 10
+        assert errors[2] < 1e-6
+
+    def test_small_theta_is_direct(self, bodies: tuple[np.ndarray, np.ndarray]):
+        """With a tiny opening angle every pair of leaves is summed directly."""
+        positions, masses = bodies
+        expected = DirectEngine().accelerations(positions, masses, 1.0)
+        actual = FMMEngine(theta=1e-9, order=0).accelerations(positions, masses, 1.0)
+
+        np.testing.assert_allclose(actual, expected, rtol=1e-9)
+
+    def test_targets(self, bodies: tuple[np.ndarray, np.ndarray]):
+        """Only the requested targets should be returned, in the order requested."""
+        positions, masses = bodies
+        engine = FMMEngine()
+        full = engine.accelerations(positions, masses, 1.0)
+        actual = engine.accelerations(positions, masses, 1.0, targets=np.array([900, 3, 41]))
+
+        np.testing.assert_array_equal(actual, full[[900, 3, 41]])
+        assert engine.last_tree is not None
+
+    def test_coincident_bodies(self):
+        """Bodies at the same position should exert no force on each other."""
+        positions = np.array([[0.0, 0.0], [0.0, 0.0], [2.0, 0.0]])
+        masses = np.array([1.0, 1.0, 4.0])
+        actual = FMMEngine(theta=1e-9, leaf_size=1).accelerations(positions, masses, 1.0)
+
+        np.testing.assert_allclose(actual, [[1.0, 0.0], [1.0, 0.0], [-0.5, 0.0]])
+
+    def test_float32(self, bodies: tuple[np.ndarray, np.ndarray]):
+        """float32 positions should give float32 accelerations close to the float64 ones."""
+        positions, masses = bodies
+        expected = FMMEngine().accelerations(positions, masses, 1.0)
+        actual = FMMEngine().accelerations(positions.astype(np.float32), masses.astype(np.float32), 1.0)
+
+        assert actual.dtype == np.float32
+        assert np.median(relative_errors(actual, expected)) < 1e-5
+
+    def test_simulation_engine(self):
+        """The fmm engine should be selectable in a config and reject decimal precision."""
+        config = {
+            "name": "Test",
+            "timestep": 1,
+            "engine": "fmm",
+            "engine_options": {"order": 4},
+            "objects": [
+                {"name": "A", "mass": 1e24, "position": [0, 0], "velocity": [0, 0]},
+                {"name": "B", "mass": 1e22, "position": [1e8, 0], "velocity": [0, 0]},
+            ],
+        }
+        simulation = Simulation.from_dict(config)
+
+        assert isinstance(simulation.force_engine, FMMEngine)
+        assert simulation.force_engine.order == 4
+        with pytest.raises(ValueError):
+            Simulation.from_dict({**config, "precision": "decimal"})
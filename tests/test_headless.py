@@ -0,0 +1,63 @@
+import subprocess
+import sys
+
+import pytest
+
+from gravity_sim.headless import HeadlessReport, HeadlessRunner
+from gravity_sim.simulation import Simulation
+
+
+class TestHeadlessRunner:
+    """Test the HeadlessRunner class."""
+
+    @pytest.fixture
+    def simulation(self) -> Simulation:
+        """Fixture to create a simulation of two bodies."""
+        return Simulation.from_dict(
+            {
+                "name": "Test",
+                "timestep": 100,
+                "steps": 2,
+                "objects": [
+                    {"name": "Sun", "mass": 1.989e30, "position": [0, 0], "velocity": [0, 0]},
+                    {"name": "Earth", "mass": 5.972e24, "position": [149_597_870_700, 0], "velocity": [0, 29_780]},
+                ],
+            }
+        )
+
+    def test_run_steps(self, simulation: Simulation):
+        """Running for a number of steps should step the simulation that many times."""
+        report = HeadlessRunner(simulation).run(steps=5)
+
+        assert report.steps == 5
+        assert report.simulated_seconds == 500
+        assert simulation.step_count == 5
+
+    def test_run_seconds(self, simulation: Simulation):
+        """Running for a number of simulated seconds should step until that time has passed."""
+        report = HeadlessRunner(simulation).run(seconds=250)
+
+        assert report.steps == 3
+        assert simulation.time == 300
+
+    @pytest.mark.parametrize("steps, seconds", [(None, None), (1, 1.0)])
+    def test_run_invalid_duration(self, simulation: Simulation, steps, seconds):
+        """Exactly one of steps and seconds should be required."""
+        with pytest.raises(ValueError):
+            HeadlessRunner(simulation).run(steps=steps, seconds=seconds)
+
+    def test_steps_per_second(self):
+        """Steps per second should be the number of steps over the wall time."""
+        report = HeadlessReport(steps=10, simulated_seconds=100, wall_seconds=2)
+
+        assert report.steps_per_second == 5
+
+    def test_does_not_import_pygame(self):
+        """Importing the package and running headless should never import pygame."""
+        code = (
+            "import sys, gravity_sim\n"
+            "from gravity_sim.headless import HeadlessRunner\n"
+            "from gravity_sim.simulation_runner import SimulationRunner\n"
+            "assert 'pygame' not in sys.modules\n"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,271 @@
+import math
+
+import numpy as np
+import pytest
+
+from gravity_sim.direct import DirectEngine
+from gravity_sim.integrator import (
+    BlockIntegrator,
+    EulerIntegrator,
+    Integrator,
+    LeapfrogIntegrator,
+    VelocityVerletIntegrator,
+    YoshidaIntegrator,
+)
+from gravity_sim.simulation import Simulation
+from gravity_sim.state import BodyState
+
+INTEGRATORS = [EulerIntegrator, LeapfrogIntegrator, VelocityVerletIntegrator, YoshidaIntegrator]
+
+
+def orbit_state() -> BodyState:
+    """Return a light body in a circular orbit of radius 1 and period 2pi around a unit mass, with G = 1."""
+    return BodyState(positions=[[0, 0], [1, 0]], velocities=[[0, 0], [0, 1]], masses=[1, 1e-12])
+
+
+def accelerate(state: BodyState):
+    """Return a function computing the accelerations of an orbit state, counting its calls."""
+
+    def accelerations():
+        accelerations.calls += 1
+        offset = state.positions[1] - state.positions[0]
+        pull = offset / np.linalg.norm(offset) ** 3
+        return np.array([pull * state.masses[1], -pull * state.masses[0]])
+
+    accelerations.calls = 0
+    return accelerations
+
+
+def orbit_error(integrator: Integrator, steps: int) -> float:
+    """Return the position error of the orbiting body after a quarter orbit in a number of steps."""
+    state = orbit_state()
+    function = accelerate(state)
+    for _ in range(steps):
+        integrator.step(state, (math.pi / 2) / steps, function)
+    return float(np.linalg.norm(state.positions[1] - (0, 1)))
+
+
+class TestIntegrators:
+    """Test the Integrator classes."""
+
+    @pytest.mark.parametrize("integrator", INTEGRATORS)
+    def test_order(self, integrator: type[Integrator]):
+        """Halving the timestep should reduce the error by 2 to the power of the order."""
+        ratio = orbit_error(integrator(), 32) / orbit_error(integrator(), 64)
+
+        assert ratio == pytest.approx(2**integrator.order, rel=0.25)
+
+    @pytest.mark.parametrize(
+        "integrator, calls",
+        [(EulerIntegrator, 10), (LeapfrogIntegrator, 11), (VelocityVerletIntegrator, 11), (YoshidaIntegrator, 30)],
+    )
+    def test_evaluations(self, integrator: type[Integrator], calls: int):
+        """Leapfrog schemes should reuse the final evaluation of a step at the start of the next."""
+        state = orbit_state()
+        function = accelerate(state)
+        instance = integrator()
+        for _ in range(10):
+            instance.step(state, 0.01, function)
+
+        assert function.calls == calls
+
+    def test_cache_invalidated(self):
+        """Moving the bodies between steps should cause the accelerations to be evaluated again."""
+        state = orbit_state()
+        function = accelerate(state)
+        integrator = LeapfrogIntegrator()
+        integrator.step(state, 0.01, function)
+        state.positions[1] += 0.1
+        integrator.step(state, 0.01, function)
+
+        assert function.calls == 4
+
+    def test_cache_invalidated_by_masses(self):
+        """Changing a mass between steps should cause the accelerations to be evaluated again."""
+        state = orbit_state()
+        function = accelerate(state)
+        integrator = LeapfrogIntegrator()
+        integrator.step(state, 0.01, function)
+        state.masses[0] *= 2
+        integrator.step(state, 0.01, function)
+
+        assert function.calls == 4
+
+    @pytest.mark.parametrize(
+        "change",
+        [
+            lambda simulation: setattr(simulation.objects[0], "mass", simulation.objects[0].mass * 1000),
+            lambda simulation: simulation.set_grav_constant(1e-10),
+        ],
+        ids=["mass", "grav_constant"],
+    )
+    def test_simulation_changes(self, change):
+        """Changing what the accelerations depend on between steps should not reuse the old accelerations."""
+        config = {
+            "name": "Test",
+            "timestep": 1000,
+            "engine": "direct",
+            "integrator": "leapfrog",
+            "objects": [
+                {"name": "A", "mass": 1e24, "position": [0, 0], "velocity": [0, 0]},
+                {"name": "B", "mass": 1e22, "position": [1e8, 0], "velocity": [0, 1000]},
+            ],
+        }
+        simulation = Simulation.from_dict(config)
+        simulation.step()
+        change(simulation)
+        simulation.step()
+        expected = Simulation.from_dict(config)
+        expected.step()
+        change(expected)
+        expected.integrator.invalidate()
+        expected.step()
+
+        np.testing.assert_array_equal(simulation.state.velocities, expected.state.velocities)
+
+    @pytest.mark.parametrize("integrator", [LeapfrogIntegrator, VelocityVerletIntegrator, YoshidaIntegrator])
+    def test_time_reversible(self, integrator: type[Integrator]):
+        """Reversing the velocities and stepping again should return the bodies to their start."""
+        state = orbit_state()
+        function = accelerate(state)
+        instance = integrator()
+        for _ in range(20):
+            instance.step(state, 0.05, function)
+        state.velocities *= -1
+        for _ in range(20):
+            instance.step(state, 0.05, function)
+
+        np.testing.assert_allclose(state.positions, orbit_state().positions, atol=1e-12)
+
+    @pytest.mark.parametrize(
+        "name, integrator",
+        [
+            ("euler", EulerIntegrator),
+            ("leapfrog", LeapfrogIntegrator),
+            ("velocity_verlet", VelocityVerletIntegrator),
+            ("yoshida4", YoshidaIntegrator),
+        ],
+    )
+    def test_config(self, name: str, integrator: type[Integrator]):
+        """The integrator should be selected by the integrator field of a config."""
+        simulation = Simulation.from_dict(
+            {
+                "name": "Test",
+                "timestep": 1,
+                "integrator": name,
+                "objects": [{"name": "Sun", "mass": 1, "position": [0, 0], "velocity": [0, 0]}],
+            }
+        )
+
+        assert isinstance(simulation.integrator, integrator)
+
+    def test_unknown(self):
+        """An unknown integrator should raise a ValueError."""
+        with pytest.raises(ValueError):
+            Simulation("Test", 1, 1, [], integrator="rk4")
+
+
+def hierarchical_state() -> BodyState:
+    """Return a star with a close binary pair and a distant planet, with G = 1."""
+    return BodyState(
+        positions=[[0, 0], [1, 0], [1.01, 0], [10, 0]],
+        velocities=[[0, 0], [0, 1], [0, 1 + 0.1**0.5], [0, 10**-0.5]],
+        masses=[1, 1e-3, 1e-6, 1e-3],
+    )
+
+
+def counting_direct(state: BodyState):
+    """Return a direct summation accelerate function for a state with G = 1, counting evaluations per body."""
+    engine = DirectEngine()
+
+    def accelerations(targets=None):
+        targets = engine.resolve_targets(len(state), targets)
+        accelerations.counts[targets] += 1
+        return engine.accelerations(state.positions, state.masses, 1.0, targets)
+
+    accelerations.counts = np.zeros(len(state), dtype=int)
+    return accelerations
+
+
+class TestBlockIntegrator:
+    """Test the BlockIntegrator class."""
+
+    def test_levels(self):
+        """Bodies in tight orbits should be placed on finer levels and evaluated more often."""
+        state = hierarchical_state()
+        function = counting_direct(state)
+        integrator = BlockIntegrator(grav_constant=1, eta=0.05, max_level=10)
+        integrator.step(state, 0.5, function)
+
+        assert integrator.levels[1] > integrator.levels[3]
+        assert integrator.levels[2] > integrator.levels[3]
+        assert function.counts[2] > function.counts[3] > 0
+        assert integrator.last_evaluations == function.counts.sum()
+
+    def test_accuracy(self):
+        """Block steps should follow a finely stepped leapfrog closely with fewer evaluations."""
+        expected = hierarchical_state()
+        reference = counting_direct(expected)
+        leapfrog = LeapfrogIntegrator()
+        for _ in range(10 * 512):
+            leapfrog.step(expected, 0.5 / 512, reference)
+
+        state = hierarchical_state()
+        function = counting_direct(state)
+        integrator = BlockIntegrator(grav_constant=1, eta=0.02, max_level=12)
+        for _ in range(10):
+            integrator.step(state, 0.5, function)
+
+        np.testing.assert_allclose(state.positions, expected.positions, atol=1e-3)
+        assert function.counts.sum() < reference.counts.sum() * 0.6
+
+    def test_single_level(self):
+        """With only one level the integrator should match leapfrog exactly."""
+        expected = hierarchical_state()
+        state = hierarchical_state()
+        LeapfrogIntegrator().step(expected, 0.01, counting_direct(expected))
+        BlockIntegrator(grav_constant=1, max_level=0).step(state, 0.01, counting_direct(state))
+
+        np.testing.assert_array_equal(state.positions, expected.positions)
+        np.testing.assert_array_equal(state.velocities, expected.velocities)
+
+    @pytest.mark.parametrize("engine", ["barnes_hut", "direct"])
+    def test_simulation(self, engine: str):
+        """Block steps should work through a simulation."""
+        simulation = Simulation.from_dict(
+            {
+                "name": "Test",
+                "timestep": 86400,
+                "engine": engine,
+                "integrator": "block",
+                "integrator_options": {"max_level": 4},
+                "objects": [
+                    {"name": "Sun", "mass": 1.989e30, "position": [0, 0], "velocity": [0, 0]},
+                    {"name": "Earth", "mass": 5.972e24, "position": [149_597_870_700, 0], "velocity": [0, 29_780]},
+                    {"name": "Moon", "mass": 7.342e22, "position": [149_982_270_700, 0], "velocity": [0, 30_802]},
+                ],
+            }
+        )
+        simulation.step()
+
+        assert simulation.integrator.levels.tolist() == [1, 1, 4]
+        assert simulation.time == 86400
+
+    @pytest.mark.parametrize("engine", ["fmm", "pm"])
+    def test_untargeted_engine(self, engine: str):
+        """Engines that evaluate every body on each call should be rejected, as every sub-step would cost a step."""
+        with pytest.raises(ValueError, match="block integrator"):
+            Simulation.from_dict(
+                {
+                    "name": "Test",
+                    "timestep": 86400,
+                    "engine": engine,
+                    "integrator": "block",
+                    "objects": [{"name": "Sun", "mass": 1.989e30, "position": [0, 0], "velocity": [0, 0]}],
+                }
+            )
+
+    def test_unknown_criterion(self):
+        """An unknown criterion should raise a ValueError."""
+        with pytest.raises(ValueError):
+            BlockIntegrator(criterion="jerk")
@@ -0,0 +1,234 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from gravity_sim.barnes_hut import BarnesHutEngine
+from gravity_sim.direct import DirectEngine
+from gravity_sim.linear_quadtree import LinearQuadTree
+
+
+class TestLinearQuadTree:
+    """Tests the LinearQuadTree class."""
+
+    @pytest.fixture
+    def bodies(self) -> tuple[np.ndarray, np.ndarray]:
+        """Fixture to create positions and masses of bodies clustered away from the origin."""
+        rng = np.random.default_rng(7)
+        positions = rng.normal(loc=(5e10, -3e10), scale=1e9, size=(300, 2))
+        masses = rng.uniform(1e22, 1e24, 300)
+        return positions, masses
+
+    def test_invalid_arguments(self):
+        """Building a tree without bodies or with a bad leaf size should raise a ValueError."""
+        with pytest.raises(ValueError):
+            LinearQuadTree(np.zeros((0, 2)), np.zeros(0))
+        with pytest.raises(ValueError):
+            LinearQuadTree(np.zeros((1, 2)), np.ones(1), leaf_size=0)
+
+    @pytest.mark.parametrize(
+        "position, expected",
+        [
+            pytest.param((0, 0), 0b0000),
+            pytest.param((1, 0), 0b0001),
+            pytest.param((0, 1), 0b0010),
+            pytest.param((3, 3), 0b1111),
+            pytest.param((2, 1), 0b0110),
+        ],
+    )
+    def test_morton_keys(self, position: tuple, expected: int):
+        """Keys should interleave the bits of the grid cell, with x in the lower bit."""
+        keys = LinearQuadTree.morton_keys(np.array([position], dtype=float), np.zeros(2), 4.0, 2)
+
+        assert keys.tolist() == [expected]
+
+    def test_bounds_from_data(self, bodies):
+        """The root should cover the bodies' bounding box, wherever the bodies are."""
+        positions, masses = bodies
+        tree = LinearQuadTree(positions, masses)
+
+        tolerance = tree.half_widths[0] * 1e-12
+        assert np.all(tree.centers[0] - tree.half_widths[0] <= positions.min(axis=0) + tolerance)
+        assert np.all(tree.centers[0] + tree.half_widths[0] >= positions.max(axis=0) - tolerance)
+        np.testing.assert_array_equal(tree.lower[0], positions.min(axis=0))
+        np.testing.assert_array_equal(tree.upper[0], positions.max(axis=0))
+
+    def test_root_mass(self, bodies):
+        """The root should hold the total mass and center of mass of every body."""
+        positions, masses = bodies
+        tree = LinearQuadTree(positions, masses)
+
+        assert tree.node_masses[0] == pytest.approx(masses.sum())
+        np.testing.assert_allclose(tree.centers_of_mass[0], np.average(positions, axis=0, weights=masses))
+
+    @pytest.mark.parametrize("leaf_size", [1, 4, 16])
+    def test_leaves_partition_bodies(self, bodies, leaf_size: int):
+        """Every body should be in exactly one leaf, and leaves should hold at most leaf_size bodies."""
+        positions, masses = bodies
+        tree = LinearQuadTree(positions, masses, leaf_size=leaf_size)
+
+        leaves = [node for node in range(len(tree)) if tree.is_leaf(node)]
+        assert all(len(tree.bodies(leaf)) <= leaf_size for leaf in leaves)
+        assert sorted(np.concatenate([tree.bodies(leaf) for leaf in leaves]).tolist()) == list(range(300))
+
+    def test_leaves_partition_float32_bodies(self, bodies):
+        """Every float32 body should be in a leaf, including the body at the far edge of the tree."""
+        positions, masses = bodies
+        tree = LinearQuadTree(positions.astype(np.float32), masses.astype(np.float32))
+
+        leaves = [node for node in range(len(tree)) if tree.is_leaf(node)]
+        assert sorted(np.concatenate([tree.bodies(leaf) for leaf in leaves]).tolist()) == list(range(300))
+
+    def test_children_inside_parent(self, bodies):
+        """Children should cover their parent's range and lie inside their parent's cell."""
+        positions, masses = bodies
+        tree = LinearQuadTree(positions, masses, leaf_size=2)
+
+        for node in range(len(tree)):
+            children = tree.children(node)
+            if not children:
+                continue
+            assert tree.starts[children[0]] == tree.starts[node]
+            assert tree.ends[children[-1]] == tree.ends[node]
+            assert tree.node_masses[list(children)].sum() == pytest.approx(tree.node_masses[node])
+            for child in children:
+                assert tree.half_widths[child] == tree.half_widths[node] / 2
+                offset = np.abs(tree.centers[child] - tree.centers[node])
+                np.testing.assert_allclose(offset, tree.half_widths[child], rtol=1e-9)
+
+    @pytest.mark.parametrize("group_size", [1, 8, 64])
+    def test_groups_partition_bodies(self, bodies, group_size: int):
+        """Groups should cover every body exactly once, holding at most group_size bodies unless a leaf."""
+        positions, masses = bodies
+        tree = LinearQuadTree(positions, masses, leaf_size=4)
+        groups = tree.groups(group_size)
+
+        sizes = tree.ends[groups] - tree.starts[groups]
+        assert np.all((sizes <= group_size) | (tree.child_counts[groups] == 0))
+        assert tree.starts[groups[0]] == 0
+        assert tree.ends[groups[-1]] == 300
+        np.testing.assert_array_equal(tree.ends[groups[:-1]], tree.starts[groups[1:]])
+
+    def test_coincident_bodies(self):
+        """Bodies at the same position should share a leaf at the maximum depth."""
+        positions = np.array([[1.0, 1.0], [1.0, 1.0], [3.0, 2.0]])
+        tree = LinearQuadTree(positions, np.ones(3), leaf_size=1, max_depth=5)
+
+        assert tree.depth == 5
+        assert sum(len(tree.bodies(node)) == 2 for node in range(len(tree)) if tree.is_leaf(node)) == 1
+
+    @pytest.mark.parametrize("leaf_size", [1, 8])
+    def test_query_range(self, bodies, leaf_size: int):
+        """A range query should find exactly the bodies inside the rectangle."""
+        positions, masses = bodies
+        tree = LinearQuadTree(positions, masses, leaf_size=leaf_size)
+        lower, upper = np.array([4.9e10, -3.1e10]), np.array([5.2e10, -2.95e10])
+        expected = np.flatnonzero(np.all((positions >= lower) & (positions <= upper), axis=1))
+
+        np.testing.assert_array_equal(tree.query_range(lower, upper), expected)
+        assert len(tree.query_range(lower - 1e12, lower - 1e11)) == 0
+
+    @pytest.mark.parametrize("leaf_size", [1, 8])
+    def test_query_radius(self, bodies, leaf_size: int):
+        """A radius query should find exactly the bodies within the distance."""
+        positions, masses = bodies
+        tree = LinearQuadTree(positions, masses, leaf_size=leaf_size)
+        center = np.array([5.05e10, -3e10])
+        expected = np.flatnonzero(np.hypot(*(positions - center).T) <= 8e8)
+
+        np.testing.assert_array_equal(tree.query_radius(center, 8e8), expected)
+
+    def test_query_moved_bodies(self, bodies):
+        """Queries given paddings for how far bodies moved should find them at their new positions."""
+        positions, masses = bodies
+        tree = LinearQuadTree(positions, masses)
+        moved = positions + np.random.default_rng(1).normal(scale=3e8, size=positions.shape)
+        paddings = tree.paddings(np.hypot(*(moved - positions).T))
+        lower, upper = np.array([4.9e10, -3.1e10]), np.array([5.2e10, -2.95e10])
+        center = np.array([5.05e10, -3e10])
+
+        found = tree.query_range(lower, upper, paddings)
+        inside = np.flatnonzero(np.all((moved >= lower) & (moved <= upper), axis=1))
+        assert set(inside) <= set(found)
+        found = tree.query_radius(center, 8e8, paddings)
+        assert set(np.flatnonzero(np.hypot(*(moved - center).T) <= 8e8)) <= set(found)
+
+    @pytest.mark.parametrize("k", [1, 5, 400])
+    def test_nearest(self, bodies, k: int):
+        """The nearest bodies should be found in order of distance."""
+        positions, masses = bodies
+        tree = LinearQuadTree(positions, masses)
+        point = np.array([5.1e10, -2.9e10])
+        expected = np.argsort(np.hypot(*(positions - point).T), kind="stable")[:k]
+
+        np.testing.assert_array_equal(tree.nearest(point, k), expected)
+
+
+class TestBarnesHutEngine:
+    """Tests the BarnesHutEngine class."""
+
+    @pytest.fixture
+    def bodies(self) -> tuple[np.ndarray, np.ndarray]:
+        """Fixture to create positions and masses of random bodies."""
+        rng = np.random.default_rng(3)
+        return rng.uniform(-1e11, 1e11, (200, 2)), rng.uniform(1e22, 1e24, 200)
+
+    def test_invalid_traversal(self):
+        """An unknown traversal should raise a ValueError."""
+        with pytest.raises(ValueError):
+            BarnesHutEngine(traversal="sideways")
+
+    @pytest.mark.parametrize("traversal", BarnesHutEngine.TRAVERSALS)
+    def test_theta_zero_is_exact(self, bodies, traversal: str):
+        """With theta of zero every node is opened, so the result should match direct summation."""
+        positions, masses = bodies
+        expected = DirectEngine().accelerations(positions, masses, 1.0)
+        actual = BarnesHutEngine(theta=0, traversal=traversal).accelerations(positions, masses, 1.0)
+
+        np.testing.assert_allclose(actual, expected, rtol=1e-9)
+
+    @pytest.mark.parametrize("traversal", BarnesHutEngine.TRAVERSALS)
+    def test_approximation(self, bodies, traversal: str):
+        """The default opening angle should approximate direct summation closely."""
+        positions, masses = bodies
+        expected = DirectEngine().accelerations(positions, masses, 1.0)
+        actual = BarnesHutEngine(traversal=traversal).accelerations(positions, masses, 1.0)
+
+        error = np.linalg.norm(actual - expected, axis=1) / np.linalg.norm(expected, axis=1)
+        assert np.median(error) < 1e-2
+
+    @pytest.mark.parametrize("traversal", BarnesHutEngine.TRAVERSALS)
+    def test_targets(self, bodies, traversal: str):
+        """Only the requested targets should be returned, in the order requested."""
+        positions, masses = bodies
+        engine = BarnesHutEngine(traversal=traversal, group_size=8)
+
+        full = engine.accelerations(positions, masses, 1.0)
+        actual = engine.accelerations(positions, masses, 1.0, targets=np.array([9, 0, 4]))
+
+        np.testing.assert_array_equal(actual, full[[9, 0, 4]])
+        assert isinstance(engine.last_tree, LinearQuadTree)
+
+    def test_chunked_evaluation(self):
+        """Evaluating the targets in chunks should match one evaluation, without O(n) work for each chunk."""
+        rng = np.random.default_rng(5)
+        positions, masses = rng.normal(scale=1e11, size=(20_000, 2)), rng.uniform(1e22, 1e24, 20_000)
+        engine = BarnesHutEngine()
+        prepared = engine.prepare(positions, masses)
+        targets = np.arange(len(masses))[engine.locality_order(prepared, np.arange(len(masses)))]
+
+        whole = engine.evaluate(prepared, positions, masses, 1.0, targets)
+        chunks = [
+            engine.evaluate(prepared, positions, masses, 1.0, targets[start : start + 256])
+            for start in range(0, 20_000, 256)
+        ]
+        np.testing.assert_array_equal(np.concatenate(chunks), whole)
+
+        tracemalloc.start()
+        try:
+            engine.evaluate(prepared, positions, masses, 1.0, targets[:4])
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        # A buffer of every body's acceleration alone would take 320 kB
+        assert peak < positions.nbytes // 4
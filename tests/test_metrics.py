@@ -0,0 +1,138 @@
+import json
+import pickle
+
+import pytest
+
+from gravity_sim.headless import HeadlessRunner
+from gravity_sim.metrics import Metrics, MetricsExporter, format_snapshot
+from gravity_sim.parallel import ThreadEngine
+from gravity_sim.simulation import Simulation
+
+CONFIG = {
+    "name": "Test",
+    "timestep": 100,
+    "objects": [
+        {"name": "A", "mass": 1e24, "position": [0, 0], "velocity": [0, 0]},
+        {"name": "B", "mass": 1e22, "position": [1e8, 0], "velocity": [0, 1000]},
+        {"name": "C", "mass": 1e20, "position": [0, -3e8], "velocity": [500, 0]},
+        {"name": "D", "mass": 1e20, "position": [2e8, 2e8], "velocity": [0, 0]},
+    ],
+}
+
+
+class TestMetrics:
+    """Test the Metrics class."""
+
+    def test_record(self):
+        """Timers should accumulate time and calls, counters totals and gauges their latest value."""
+        metrics = Metrics()
+        for _ in range(2):
+            with metrics.timer("work"):
+                pass
+        metrics.count("nodes", 3)
+        metrics.count("nodes")
+        metrics.gauge("depth", 4)
+        metrics.gauge("depth", 6)
+        snapshot = metrics.snapshot()
+
+        assert snapshot["timers"]["work"]["calls"] == 2
+        assert snapshot["timers"]["work"]["seconds"] >= 0
+        assert snapshot["counters"] == {"nodes": 4}
+        assert snapshot["gauges"] == {"depth": 6}
+
+    def test_collect(self):
+        """Collecting should return the values and clear them."""
+        metrics = Metrics()
+        metrics.count("nodes", 2)
+
+        assert metrics.collect()["counters"] == {"nodes": 2}
+        assert metrics.snapshot() == {"timers": {}, "counters": {}, "gauges": {}}
+
+    def test_disabled(self):
+        """A disabled registry should ignore everything recorded to it."""
+        metrics = Metrics(enabled=False)
+        with metrics.timer("work"):
+            metrics.count("nodes")
+        metrics.gauge("depth", 1)
+
+        assert metrics.snapshot() == {"timers": {}, "counters": {}, "gauges": {}}
+
+    def test_pickle(self):
+        """Pickled registries should keep their setting but not their values."""
+        metrics = Metrics()
+        metrics.count("nodes")
+        copy = pickle.loads(pickle.dumps(metrics))
+
+        assert copy.enabled
+        assert copy.snapshot()["counters"] == {}
+
+    def test_format_snapshot(self):
+        """Counters should be shown per step when steps are counted."""
+        snapshot = {
+            "timers": {"step": {"seconds": 0.5, "calls": 2}},
+            "counters": {"steps": 2, "nodes_visited": 300},
+            "gauges": {"tree_depth": 5},
+        }
+
+        assert format_snapshot(snapshot) == ["step: 250.00 ms x2", "nodes_visited: 150/step", "tree_depth: 5"]
+
+
+class TestSimulationMetrics:
+    """Test the metrics recorded by simulations and force engines."""
+
+    @pytest.mark.parametrize("engine", ["barnes_hut", "fmm"])
+    def test_tree_engines(self, engine: str):
+        """Tree engines should time their tree builds and count nodes visited, interactions and depth."""
+        simulation = Simulation.from_dict({**CONFIG, "engine": engine})
+        simulation.step()
+        snapshot = simulation.metrics.collect()
+
+        assert {"step", "forces", "tree_build"} <= snapshot["timers"].keys()
+        assert snapshot["counters"]["steps"] == 1
+        assert snapshot["counters"]["nodes_visited"] > 0
+        assert snapshot["counters"]["interactions"] > 0
+        assert snapshot["gauges"]["tree_depth"] >= 0
+
+    def test_direct(self):
+        """The direct engine should count every pair as an interaction."""
+        simulation = Simulation.from_dict({**CONFIG, "engine": "direct"})
+        simulation.step()
+
+        assert simulation.metrics.collect()["counters"]["interactions"] == 16
+
+    def test_threads(self):
+        """Counts from engines run on threads should be recorded."""
+        simulation = Simulation.from_dict({**CONFIG, "engine": "linear_barnes_hut", "threads": 2})
+        assert isinstance(simulation.force_engine, ThreadEngine)
+        simulation.step()
+        simulation.force_engine.close()
+
+        assert simulation.metrics.collect()["counters"]["interactions"] > 0
+
+
+class TestMetricsExporter:
+    """Test the MetricsExporter class."""
+
+    def test_headless_export(self, tmp_path):
+        """Headless runs should export a line every few steps and at the end of the run."""
+        path = tmp_path / "metrics.jsonl"
+        simulation = Simulation.from_dict({**CONFIG, "engine": "direct"})
+        exporter = MetricsExporter(str(path))
+        HeadlessRunner(simulation, metrics_exporter=exporter, metrics_every=2).run(steps=5)
+        exporter.close()
+
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [record["step"] for record in records] == [2, 4, 5]
+        assert [record["counters"]["steps"] for record in records] == [2, 2, 1]
+        assert records[0]["timers"]["step"]["calls"] == 2
+
+    def test_append(self, tmp_path):
+        """Appending should keep the lines already in the file."""
+        path = tmp_path / "metrics.jsonl"
+        simulation = Simulation.from_dict(CONFIG)
+        for append in (False, True):
+            exporter = MetricsExporter(str(path), append=append)
+            exporter.export(simulation)
+            exporter.close()
+
+        assert len(path.read_text().splitlines()) == 2
@@ -1,6 +1,9 @@
+from decimal import Decimal
+
 import pytest
 
 from gravity_sim.object import Object
+from gravity_sim.state import BodyState
 from gravity_sim.vector import Vector
 
 
@@ -104,3 +107,28 @@ class TestObject:
         assert len(satellites) == 2
         assert satellites[0] is obj
         assert satellites[1] is moon
+
+    def test_bind(self, obj: Object):
+        """A bound object should read and write its position, velocity and force from the state."""
+        state = BodyState.from_objects([obj])
+        obj.bind(state, 0)
+
+        state.positions[0] = (5, 6)
+        assert obj.position.to_tuple() == (5, 6)
+
+        obj.velocity = Vector(1, 2)
+        assert state.velocities[0].tolist() == [1, 2]
+
+        obj.add_force(Vector(3, 4))
+        assert state.forces[0].tolist() == [3, 4]
+
+    def test_bind_mass(self, obj: Object):
+        """A bound object's mass should be a view onto the state's masses."""
+        state = BodyState.from_objects([obj])
+        obj.bind(state, 0)
+
+        state.masses[0] = 7e24
+        assert obj.mass == Decimal("7e24")
+
+        obj.mass *= 2
+        assert state.masses[0] == 1.4e25
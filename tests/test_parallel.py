@@ -0,0 +1,192 @@
+import numpy as np
+import pytest
+
+from gravity_sim.barnes_hut import BarnesHutEngine
+from gravity_sim.direct import DirectEngine
+from gravity_sim.force_engine import ForceEngine
+from gravity_sim.parallel import ProcessEngine, SharedArrays, ThreadEngine
+from gravity_sim.simulation import Simulation
+
+
+CONFIG = {
+    "name": "Test",
+    "timestep": 100,
+    "engine": "direct",
+    "objects": [
+        {"name": "A", "mass": 1e24, "position": [0, 0], "velocity": [0, 0]},
+        {"name": "B", "mass": 1e22, "position": [1e8, 0], "velocity": [0, 1000]},
+        {"name": "C", "mass": 1e20, "position": [0, -3e8], "velocity": [500, 0]},
+    ],
+}
+
+
+class TestSharedArrays:
+    """Test the SharedArrays class."""
+
+    def test_publish_and_attach(self):
+        """Attached arrays should hold the published values."""
+        publisher = SharedArrays()
+        reader = SharedArrays()
+        arrays = {"a": np.arange(10.0), "b": np.array(3), "c": np.ones((4, 2), dtype=np.float32)}
+        try:
+            name, layout = publisher.publish(arrays)
+            views = reader.attach(name, layout)
+            for key, array in arrays.items():
+                np.testing.assert_array_equal(views[key], array)
+                assert views[key].dtype == array.dtype
+            del views
+        finally:
+            reader.detach()
+            publisher.release()
+
+    def test_grows(self):
+        """Publishing more than fits should move the arrays to a larger block."""
+        shared = SharedArrays()
+        try:
+            first, _ = shared.publish({"a": np.zeros(4)})
+            second, layout = shared.publish({"a": np.arange(1000.0)})
+            assert first != second
+            np.testing.assert_array_equal(shared.views(shared.block, layout)["a"], np.arange(1000.0))
+        finally:
+            shared.release()
+
+
+class TestProcessEngine:
+    """Test the ProcessEngine class."""
+
+    @pytest.mark.parametrize("workers", [0, -1])
+    def test_invalid_workers(self, workers: int):
+        """A worker count below one should raise a ValueError."""
+        with pytest.raises(ValueError):
+            ProcessEngine(DirectEngine(), workers=workers)
+
+    @pytest.mark.parametrize(
+        "engine",
+        [DirectEngine(tile_size=16), BarnesHutEngine(leaf_size=4), BarnesHutEngine(traversal="body")],
+        ids=["direct", "group", "body"],
+    )
+    def test_identical_for_any_worker_count(self, engine: ForceEngine, bodies: tuple[np.ndarray, np.ndarray]):
+        """Accelerations should be bit for bit identical to the engine's, whatever the number of workers."""
+        positions, masses = bodies
+        expected = engine.accelerations(positions, masses, 6.6743e-11)
+        for workers in (1, 3):
+            process_engine = ProcessEngine(engine, workers=workers, chunk_size=32)
+            try:
+                actual = process_engine.accelerations(positions, masses, 6.6743e-11)
+            finally:
+                process_engine.close()
+            np.testing.assert_array_equal(actual, expected)
+
+    def test_targets(self, bodies: tuple[np.ndarray, np.ndarray]):
+        """Only the requested targets should be returned, in the order requested, over repeated evaluations."""
+        positions, masses = bodies
+        engine = BarnesHutEngine()
+        targets = np.array([250, 7, 120, 2])
+        process_engine = ProcessEngine(engine, workers=2, chunk_size=2)
+        try:
+            for _ in range(2):
+                actual = process_engine.accelerations(positions, masses, 1.0, targets)
+                np.testing.assert_array_equal(actual, engine.accelerations(positions, masses, 1.0)[targets])
+                positions = positions * 1.5
+            assert process_engine.last_tree is engine.last_tree
+        finally:
+            process_engine.close()
+
+    def test_decimal(self):
+        """Decimal arrays cannot be shared and should raise a ValueError."""
+        positions = np.array([[0, 0], [1, 0]], dtype=object)
+        with pytest.raises(ValueError):
+            ProcessEngine(DirectEngine()).accelerations(positions, np.array([1, 1], dtype=object), 1)
+
+    def test_simulation_processes(self):
+        """A simulation with worker processes should step exactly like one without."""
+        expected = Simulation.from_dict(CONFIG)
+        simulation = Simulation.from_dict({**CONFIG, "processes": 2})
+        try:
+            assert isinstance(simulation.force_engine, ProcessEngine)
+            for _ in range(3):
+                expected.step()
+                simulation.step()
+        finally:
+            simulation.force_engine.close()
+
+        np.testing.assert_array_equal(simulation.state.positions, expected.state.positions)
+
+    def test_simulation_unsupported_engine(self):
+        """Worker processes with decimal precision should raise a ValueError."""
+        with pytest.raises(ValueError):
+            Simulation("Test", 1, 1, [], precision="decimal", engine="direct", processes=2)
+
+
+class TestThreadEngine:
+    """Test the ThreadEngine class."""
+
+    def test_invalid_chunk_size(self):
+        """A chunk size below one should raise a ValueError."""
+        with pytest.raises(ValueError):
+            ThreadEngine(DirectEngine(), chunk_size=0)
+
+    @pytest.mark.parametrize(
+        "engine",
+        [DirectEngine(tile_size=16), BarnesHutEngine(leaf_size=4), BarnesHutEngine(traversal="body")],
+        ids=["direct", "group", "body"],
+    )
+    def test_identical_for_any_worker_count(self, engine: ForceEngine, bodies: tuple[np.ndarray, np.ndarray]):
+        """Accelerations should be bit for bit identical to the engine's, whatever the number of threads."""
+        positions, masses = bodies
+        expected = engine.accelerations(positions, masses, 6.6743e-11)
+        for workers in (1, 4):
+            thread_engine = ThreadEngine(engine, workers=workers, chunk_size=32)
+            try:
+                actual = thread_engine.accelerations(positions, masses, 6.6743e-11)
+            finally:
+                thread_engine.close()
+            np.testing.assert_array_equal(actual, expected)
+
+    def test_targets(self, bodies: tuple[np.ndarray, np.ndarray]):
+        """Only the requested targets should be returned, in the order requested."""
+        positions, masses = bodies
+        engine = BarnesHutEngine()
+        targets = np.array([250, 7, 120, 2])
+        thread_engine = ThreadEngine(engine, workers=2, chunk_size=2)
+        actual = thread_engine.accelerations(positions, masses, 1.0, targets)
+        thread_engine.close()
+
+        np.testing.assert_array_equal(actual, engine.accelerations(positions, masses, 1.0)[targets])
+
+    def test_simulation_threads(self):
+        """A simulation with threads should step exactly like one without."""
+        expected = Simulation.from_dict(CONFIG)
+        simulation = Simulation.from_dict({**CONFIG, "threads": 2})
+        assert isinstance(simulation.force_engine, ThreadEngine)
+        for _ in range(3):
+            expected.step()
+            simulation.step()
+        simulation.force_engine.close()
+
+        np.testing.assert_array_equal(simulation.state.positions, expected.state.positions)
+
+    def test_set_threads(self):
+        """Setting the threads should replace worker processes from the config."""
+        simulation = Simulation.from_dict({**CONFIG, "processes": 2})
+        simulation.set_threads(3)
+
+        assert simulation.processes == 0
+        assert isinstance(simulation.force_engine, ThreadEngine)
+        assert simulation.force_engine.workers == 3
+        simulation.set_threads(0)
+        assert isinstance(simulation.force_engine, DirectEngine)
+
+    def test_set_no_threads_keeps_processes(self):
+        """Setting no threads should keep the worker processes from the config."""
+        simulation = Simulation.from_dict({**CONFIG, "processes": 2})
+        simulation.set_threads(0)
+
+        assert simulation.processes == 2
+        assert isinstance(simulation.force_engine, ProcessEngine)
+        simulation.force_engine.close()
+
+    def test_processes_and_threads(self):
+        """Configuring both worker processes and threads should raise a ValueError."""
+        with pytest.raises(ValueError):
+            Simulation.from_dict({**CONFIG, "processes": 2, "threads": 2})
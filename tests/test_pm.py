@@ -0,0 +1,99 @@
+import math
+
+import numpy as np
+import pytest
+from conftest import relative_errors
+
+from gravity_sim.direct import DirectEngine
+from gravity_sim.pm import PMEngine
+from gravity_sim.simulation import Simulation
+
+
+class TestPMEngine:
+    """Test the PMEngine class."""
+
+    @pytest.mark.parametrize("options", [{"grid_size": 3}, {"split": 0}, {"cutoff": -1}])
+    def test_invalid_options(self, options: dict):
+        """A grid smaller than 4 or a non positive split or cutoff should raise a ValueError."""
+        with pytest.raises(ValueError):
+            PMEngine(**options)
+
+    def test_erfc(self):
+        """The erfc approximation should match math.erfc."""
+        values = np.linspace(0, 6, 50)
+        expected = [math.erfc(value) for value in values]
+
+        np.testing.assert_allclose(PMEngine.erfc(values), expected, atol=2e-7)
+
+    def test_distant_pair(self):
+        """Two bodies many cells apart should attract each other with the inverse square law."""
+        positions = np.array([[0.0, 0.0], [3.0, 4.0]])
+        masses = np.array([2.0, 1.0])
+        actual = PMEngine(grid_size=128).accelerations(positions, masses, 1.0)
+
+        np.testing.assert_allclose(actual, [[0.6 / 25, 0.8 / 25], [-1.2 / 25, -1.6 / 25]], rtol=1e-2)
+
+    def test_finer_grid_more_accurate(self, bodies: tuple[np.ndarray, np.ndarray]):
+        """The error compared to direct summation should fall as the grid gets finer."""
+        positions, masses = bodies
+        expected = DirectEngine().accelerations(positions, masses, 1.0)
+        coarse = PMEngine(grid_size=64).accelerations(positions, masses, 1.0)
+        fine = PMEngine(grid_size=512).accelerations(positions, masses, 1.0)
+
+        assert np.median(relative_errors(fine, expected)) < np.median(relative_errors(coarse, expected)) / 2
+
+    def test_p3m(self, bodies: tuple[np.ndarray, np.ndarray]):
+        """The short range correction should make forces accurate well below the grid spacing."""
+        positions, masses = bodies
+        expected = DirectEngine().accelerations(positions, masses, 1.0)
+        actual = PMEngine(grid_size=128, p3m=True).accelerations(positions, masses, 1.0)
+
+        errors = relative_errors(actual, expected)
+        assert np.median(errors) < 5e-3
+        assert np.percentile(errors, 99) < 5e-2
+
+    def test_momentum_conserved(self, bodies: tuple[np.ndarray, np.ndarray]):
+        """The total force should be close to zero, as every pairwise force has an opposite."""
+        positions, masses = bodies
+        accelerations = PMEngine(grid_size=128, p3m=True).accelerations(positions, masses, 1.0)
+        total = np.abs((accelerations * masses[:, np.newaxis]).sum(axis=0))
+        scale = np.abs(accelerations * masses[:, np.newaxis]).sum(axis=0)
+
+        assert np.all(total < 1e-3 * scale)
+
+    def test_targets(self, bodies: tuple[np.ndarray, np.ndarray]):
+        """Only the requested targets should be returned, in the order requested."""
+        positions, masses = bodies
+        engine = PMEngine(grid_size=64)
+        full = engine.accelerations(positions, masses, 1.0)
+        actual = engine.accelerations(positions, masses, 1.0, targets=np.array([5, 999, 20]))
+
+        np.testing.assert_array_equal(actual, full[[5, 999, 20]])
+
+    def test_coincident_bodies(self):
+        """Bodies all at one position should exert no net force on each other."""
+        positions = np.zeros((3, 2))
+        actual = PMEngine(grid_size=16, p3m=True).accelerations(positions, np.ones(3), 1.0)
+
+        np.testing.assert_allclose(actual, np.zeros((3, 2)), atol=1e-12)
+
+    def test_simulation_engine(self):
+        """The pm engine should be selectable in a config with its options."""
+        config = {
+            "name": "Test",
+            "timestep": 1,
+            "engine": "pm",
+            "engine_options": {"grid_size": 64, "p3m": True},
+            "objects": [
+                {"name": "A", "mass": 1e24, "position": [0, 0], "velocity": [0, 0]},
+                {"name": "B", "mass": 1e22, "position": [1e8, 0], "velocity": [0, 0]},
+            ],
+        }
+        simulation = Simulation.from_dict(config)
+        simulation.step()
+
+        assert isinstance(simulation.force_engine, PMEngine)
+        assert simulation.force_engine.p3m
+        assert simulation.state.velocities[1, 0] < 0
+        with pytest.raises(ValueError):
+            Simulation.from_dict({**config, "precision": "decimal"})
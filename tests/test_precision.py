@@ -0,0 +1,132 @@
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from gravity_sim.benchmarks.precision import benchmark_precisions, fastest_within
+from gravity_sim.checkpoint import Checkpoint
+from gravity_sim.precision import Precision
+from gravity_sim.simulation import Simulation
+from gravity_sim.state import BodyState
+
+SAVES = Path(__file__).parent.parent / "saves"
+
+
+def make_simulation(precision: str, engine: str = "direct") -> Simulation:
+    """Return a simulation of three bodies with the given precision and engine."""
+    return Simulation.from_dict(
+        {
+            "name": "Test",
+            "timestep": 100,
+            "steps": 2,
+            "engine": engine,
+            "precision": precision,
+            "objects": [
+                {"name": "Sun", "mass": 1.989e30, "position": [0, 0], "velocity": [0, 0]},
+                {"name": "Earth", "mass": 5.972e24, "position": [149_597_870_700, 0], "velocity": [0, 29_780]},
+                {"name": "Mars", "mass": 6.417e23, "position": [0, 227_939_366_000], "velocity": [-24_077, 0]},
+            ],
+        }
+    )
+
+
+class TestPrecision:
+    """Test the Precision class."""
+
+    def test_unknown(self):
+        """An unknown precision should raise a ValueError."""
+        with pytest.raises(ValueError):
+            Precision("float16")
+
+    @pytest.mark.parametrize("name, expected", [("decimal", Decimal), ("float64", np.float64), ("float32", np.float32)])
+    def test_scalar(self, name: str, expected: type):
+        """Scalars should be converted to the type of the precision."""
+        assert isinstance(Precision(name).scalar(1.5), expected)
+
+    def test_decimal_scalar_from_float(self):
+        """Floats should convert to the Decimal of their shortest representation."""
+        assert Precision("decimal").scalar(0.1) == Decimal("0.1")
+
+    def test_decimal_array(self):
+        """Decimal arrays should be object arrays of Decimal."""
+        array = Precision("decimal").array([[1, 2.5], [3, 4]])
+
+        assert array.dtype == object
+        assert array.shape == (2, 2)
+        assert array[0, 1] == Decimal("2.5")
+
+    def test_state(self):
+        """A state should store its arrays in its precision."""
+        state = BodyState([[0, 0], [1, 1]], [[0, 0], [0, 0]], [1, 2], precision="float32")
+
+        assert state.positions.dtype == np.float32
+        assert state.masses.dtype == np.float32
+
+
+class TestSimulationPrecision:
+    """Test simulations with each precision."""
+
+    @pytest.mark.parametrize(
+        "precision, tolerance, engine",
+        [
+            ("decimal", 1e-12, "direct"),
+            ("float32", 1e-5, "barnes_hut"),
+            ("float32", 1e-5, "direct"),
+        ],
+    )
+    def test_matches_float64(self, precision: str, tolerance: float, engine: str):
+        """Each precision should follow the same orbits as float64, to within its accuracy."""
+        expected = make_simulation("float64", engine)
+        simulation = make_simulation(precision, engine)
+        for _ in range(5):
+            expected.step()
+            simulation.step()
+
+        assert simulation.state.positions.dtype == simulation.precision.dtype
+        np.testing.assert_allclose(
+            simulation.state.positions.astype(np.float64), expected.state.positions, rtol=tolerance, atol=1
+        )
+
+    @pytest.mark.parametrize("engine", ["barnes_hut", "fmm", "pm"])
+    def test_decimal_unsupported_engine(self, engine: str):
+        """Engines other than direct summation should reject decimal precision."""
+        with pytest.raises(ValueError, match="direct"):
+            make_simulation("decimal", engine)
+
+    def test_set_precision(self):
+        """Changing precision should convert the state and keep objects bound to it."""
+        simulation = make_simulation("float64")
+        earth = simulation.get_object(1)
+        simulation.set_precision("decimal")
+        simulation.step()
+
+        assert simulation.state.positions.dtype == object
+        assert earth.position.x == simulation.state.positions[1, 0]
+
+    def test_decimal_checkpoint(self, tmp_path):
+        """Decimal states should be restored exactly from a checkpoint."""
+        simulation = make_simulation("decimal")
+        simulation.step()
+        filename = str(tmp_path / "test.ckpt")
+        Checkpoint.save(simulation, filename)
+        loaded = Checkpoint.load(filename)
+
+        assert loaded.precision == simulation.precision
+        assert loaded.state.positions.tolist() == simulation.state.positions.tolist()
+
+
+class TestPrecisionBenchmark:
+    """Test the precision benchmark."""
+
+    def test_benchmark(self):
+        """The benchmark should measure drift and error against decimal and pick the fastest passing backend."""
+        results = benchmark_precisions(str(SAVES / "half_solar_system.yaml"), steps=3)
+        by_name = {result.precision: result for result in results}
+
+        assert [result.precision for result in results] == list(Precision.NAMES)
+        assert by_name["decimal"].position_error == 0
+        assert by_name["float32"].position_error > by_name["float64"].position_error
+        assert fastest_within(results, 1, 1) is max(results, key=lambda result: result.steps_per_second)
+        assert fastest_within(results, 1, 0).position_error == 0
+        assert fastest_within(results, -1, -1) is None
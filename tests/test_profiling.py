@@ -0,0 +1,103 @@
+import pstats
+
+import pytest
+
+from gravity_sim.cli import handle_cli
+from gravity_sim.profiling import collapsed_stacks, profile_steps, write_profile
+from gravity_sim.simulation import Simulation
+
+CONFIG = {
+    "name": "Test",
+    "timestep": 100,
+    "engine": "linear_barnes_hut",
+    "objects": [
+        {"name": "A", "mass": 1e24, "position": [0, 0], "velocity": [0, 0]},
+        {"name": "B", "mass": 1e22, "position": [1e8, 0], "velocity": [0, 1000]},
+        {"name": "C", "mass": 1e20, "position": [0, -3e8], "velocity": [500, 0]},
+    ],
+}
+
+
+def function_names(stats: pstats.Stats) -> set[str]:
+    """Return the names of every function in a profile."""
+    return {name for _, _, name in stats.stats}
+
+
+class TestProfiling:
+    """Test profiling simulations."""
+
+    def test_profile_steps(self):
+        """The whole step should be profiled."""
+        simulation = Simulation.from_dict(CONFIG)
+        stats = profile_steps(simulation, 3)
+
+        assert simulation.step_count == 3
+        assert {"step", "calc_accelerations", "evaluate"} <= function_names(stats)
+
+    def test_force_only(self):
+        """Only force evaluation should be profiled, and the simulation should be left unchanged."""
+        simulation = Simulation.from_dict({**CONFIG, "integrator": "leapfrog"})
+        stats = profile_steps(simulation, 2, force_only=True)
+
+        assert "calc_accelerations" in function_names(stats)
+        assert "step" not in function_names(stats)
+        assert "calc_accelerations" not in vars(simulation)
+
+    def test_collapsed_stacks(self):
+        """Stacks should start at the step and add up to about the total time of the profile."""
+        stats = profile_steps(Simulation.from_dict(CONFIG), 5)
+        stacks = collapsed_stacks(stats)
+        total = sum(stats.stats[function][2] for function in stats.stats) * 1e6
+
+        step_stacks = [stack for stack in stacks if stack.startswith("simulation.py")]
+        assert step_stacks
+        assert any("evaluate" in stack for stack in step_stacks)
+        assert sum(stacks.values()) == pytest.approx(total, rel=0.05)
+
+    def test_write_profile(self, tmp_path):
+        """A readable .pstats file and a collapsed stack file with one stack and count per line should be written."""
+        stats = profile_steps(Simulation.from_dict(CONFIG), 2)
+        pstats_file, collapsed_file = write_profile(stats, str(tmp_path / "profile"))
+
+        assert "step" in function_names(pstats.Stats(pstats_file))
+        with open(collapsed_file) as file:
+            for line in file:
+                stack, count = line.rsplit(" ", 1)
+                assert stack and int(count) > 0
+
+
+class TestProfileCli:
+    """Test parsing the profile command."""
+
+    def test_profile(self):
+        """The profile command should be parsed with its output defaulting to the config's name."""
+        args = handle_cli(["profile", "saves/galaxy.yaml", "--steps", "5", "--force-only"])
+
+        assert args.command == "profile"
+        assert args.steps == 5
+        assert args.force_only
+        assert args.output == "galaxy"
+
+    def test_run(self):
+        """Other arguments should run a simulation."""
+        args = handle_cli(["saves/galaxy.yaml", "--headless", "--steps", "5"])
+
+        assert args.command == "run"
+        assert args.headless
+
+    def test_checkpoint_requires_headless(self):
+        """Checkpointing without --headless should exit with an error, as windows never save checkpoints."""
+        with pytest.raises(SystemExit):
+            handle_cli(["saves/galaxy.yaml", "--checkpoint", "galaxy.ckpt"])
+        with pytest.raises(SystemExit):
+            handle_cli(["saves/galaxy.yaml", "--checkpoint", "galaxy.ckpt", "--resume"])
+
+    def test_checkpoint_extension(self):
+        """Checkpoints not ending in .ckpt should exit with an error, as they could not be opened as config files."""
+        with pytest.raises(SystemExit):
+            handle_cli(["saves/galaxy.yaml", "--headless", "--steps", "1", "--checkpoint", "galaxy.save"])
+
+    def test_invalid_steps(self):
+        """A step count below one should exit with an error."""
+        with pytest.raises(SystemExit):
+            handle_cli(["profile", "saves/galaxy.yaml", "--steps", "0"])
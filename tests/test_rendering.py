@@ -0,0 +1,161 @@
+import numpy as np
+import pygame
+
+from gravity_sim.rendering import (
+    DensityRenderer,
+    PointRenderer,
+    density_palette,
+    label_indices,
+    to_screen,
+    to_world,
+    use_density_map,
+    visible,
+)
+
+RED = (255, 0, 0)
+BLUE = (0, 0, 255)
+
+
+def make_surface() -> pygame.Surface:
+    """Return a black 32 bit surface to draw on."""
+    surface = pygame.Surface((100, 80), depth=32)
+    surface.fill((0, 0, 0))
+    return surface
+
+
+class TestTransform:
+    """Test transforming positions to the screen."""
+
+    def test_to_screen(self):
+        """Points should be scaled, moved relative to the camera, flipped and centered."""
+        positions = np.array([[0.0, 0.0], [10.0, 5.0]])
+        points = to_screen(positions, 2.0, (4.0, -6.0), (100, 80))
+
+        np.testing.assert_array_equal(points, [[46.0, 34.0], [66.0, 24.0]])
+        np.testing.assert_array_equal(positions, [[0.0, 0.0], [10.0, 5.0]])
+
+    def test_to_world(self):
+        """Screen coordinates should transform back to the positions drawn there."""
+        positions = np.array([[0.0, 0.0], [10.0, 5.0], [-3.5, 7.25]])
+        points = to_screen(positions, 2.0, (4.0, -6.0), (100, 80))
+
+        np.testing.assert_allclose(to_world(points, 2.0, (4.0, -6.0), (100, 80)), positions)
+
+    def test_visible(self):
+        """Only points on the screen or within the margin of it should be visible."""
+        points = np.array([[50.0, 40.0], [-5.0, 40.0], [50.0, 90.0], [-20.0, 40.0]])
+
+        assert visible(points, (100, 80)).tolist() == [True, False, False, False]
+        assert visible(points, (100, 80), margin=10).tolist() == [True, True, True, False]
+
+
+class TestLabels:
+    """Test choosing which bodies to label."""
+
+    def test_one_per_cell(self):
+        """Only the first body in the order should be labelled in each cell, in the order given."""
+        points = np.array([[5.0, 5.0], [8.0, 2.0], [50.0, 50.0], [15.0, 5.0], [55.0, 58.0]])
+        order = np.array([1, 0, 4, 3, 2])
+
+        assert label_indices(points, (100, 80), order, cell_size=10).tolist() == [1, 4, 3]
+
+    def test_culling(self):
+        """Bodies off the screen should only be labelled within the margin."""
+        points = np.array([[-5.0, 5.0], [50.0, 40.0], [150.0, 40.0], [50.0, -30.0]])
+        order = np.arange(4)
+
+        assert label_indices(points, (100, 80), order, cell_size=10).tolist() == [1]
+        assert label_indices(points, (100, 80), order, cell_size=10, margin=10).tolist() == [0, 1]
+        assert label_indices(points, (100, 80), order, cell_size=10, margin=60).tolist() == [0, 1, 2, 3]
+
+    def test_no_bodies(self):
+        """No bodies should give no labels."""
+        assert len(label_indices(np.zeros((0, 2)), (100, 80), np.arange(0), cell_size=10)) == 0
+
+
+class TestPointRenderer:
+    """Test the PointRenderer class."""
+
+    def test_sprites(self):
+        """Bodies should be drawn as circles of their colors."""
+        surface = make_surface()
+        renderer = PointRenderer([RED, BLUE, RED], radius=3)
+        drawn = renderer.draw(surface, np.array([[10.0, 10.0], [50.0, 40.0], [500.0, 40.0]]))
+
+        assert drawn == 2
+        assert surface.get_at((10, 10))[:3] == RED
+        assert surface.get_at((12, 10))[:3] == RED
+        assert surface.get_at((50, 40))[:3] == BLUE
+        assert surface.get_at((30, 30))[:3] == (0, 0, 0)
+        assert len(renderer.colors) == 2
+
+    def test_dots(self):
+        """Past the sprite limit, bodies should be stamped as dots into the pixels."""
+        surface = make_surface()
+        renderer = PointRenderer([RED, BLUE, RED])
+        renderer.SPRITE_LIMIT = 1
+        drawn = renderer.draw(surface, np.array([[10.0, 10.0], [50.0, 40.0], [99.5, 0.0]]))
+
+        assert drawn == 3
+        assert surface.get_at((10, 10))[:3] == RED
+        assert surface.get_at((11, 11))[:3] == RED
+        assert surface.get_at((50, 40))[:3] == BLUE
+        assert surface.get_at((99, 0))[:3] == RED
+        assert surface.get_at((13, 10))[:3] == (0, 0, 0)
+        assert not surface.get_locked()
+
+    def test_black_bodies(self):
+        """Black bodies should still be drawn, the transparent key should be another color."""
+        surface = make_surface()
+        surface.fill((255, 255, 255))
+        PointRenderer([(0, 0, 0)], radius=2).draw(surface, np.array([[20.0, 20.0]]))
+
+        assert surface.get_at((20, 20))[:3] == (0, 0, 0)
+        assert surface.get_at((30, 20))[:3] == (255, 255, 255)
+
+
+class TestDensityMap:
+    """Test drawing bodies as a density map."""
+
+    def test_level_of_detail(self):
+        """The density map should be used below the pixels per body threshold and left above a higher one."""
+        size = (100, 100)
+
+        assert not use_density_map(100, size, showing=False)
+        assert use_density_map(250, size, showing=False)
+        assert use_density_map(150, size, showing=True)
+        assert not use_density_map(100, size, showing=True)
+        assert not use_density_map(0, size, showing=True)
+
+    def test_density(self):
+        """The weight of the bodies in each cell should be summed, ignoring bodies off the screen."""
+        renderer = DensityRenderer(cell_size=2)
+        points = np.array([[0.5, 0.5], [1.5, 1.0], [5.0, 3.0], [-1.0, 0.0], [10.0, 0.0]])
+        density = renderer.density(points, (10, 6), np.array([1.0, 2.0, 4.0, 8.0, 16.0]))
+
+        assert density.shape == (5, 3)
+        assert density[0, 0] == 3.0
+        assert density[2, 1] == 4.0
+        assert density.sum() == 7.0
+        assert renderer.density(points, (10, 6)).sum() == 3
+
+    def test_shade(self):
+        """Levels should be log scaled from the lightest occupied cell to the heaviest, with empty cells black."""
+        levels = DensityRenderer().shade(np.array([[0.0, 1.0], [np.e**2, np.e**4]]))
+
+        assert levels.tolist() == [[0, 51], [153, 255]]
+        assert DensityRenderer().shade(np.zeros((2, 2))).tolist() == [[0, 0], [0, 0]]
+        assert density_palette()[0].tolist() == [0, 0, 0]
+        assert density_palette()[255].tolist() == [255, 255, 255]
+
+    def test_draw(self):
+        """The densest cell should be drawn white and empty cells black."""
+        surface = make_surface()
+        points = np.array([[10.0, 10.0]] * 10 + [[50.0, 40.0], [500.0, 40.0]])
+        drawn = DensityRenderer(cell_size=2).draw(surface, points)
+
+        assert drawn == 11
+        assert surface.get_at((10, 10))[:3] == (255, 255, 255)
+        assert surface.get_at((11, 11))[:3] == (255, 255, 255)
+        assert surface.get_at((50, 40))[:3] != (0, 0, 0)
+        assert surface.get_at((30, 30))[:3] == (0, 0, 0)
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from gravity_sim.replay import Replay
+from gravity_sim.simulation import Simulation
+from gravity_sim.trajectory import TrajectoryReader, TrajectoryWriter
+
+
+class TestReplay:
+    """Test the Replay class."""
+
+    @pytest.fixture
+    def reader(self, tmp_path) -> TrajectoryReader:
+        """Fixture to record a trajectory of 5 frames, 100 simulated seconds apart."""
+        simulation = Simulation.from_dict(
+            {
+                "name": "Test",
+                "timestep": 100,
+                "objects": [
+                    {"name": "Sun", "mass": 1.989e30, "position": [0, 0], "velocity": [0, 0]},
+                    {"name": "Earth", "mass": 5.972e24, "position": [149_597_870_700, 0], "velocity": [0, 29_780]},
+                ],
+            }
+        )
+        filename = str(tmp_path / "run.traj")
+        with TrajectoryWriter(filename, simulation) as writer:
+            for _ in range(5):
+                writer.record(simulation)
+                simulation.step()
+        return TrajectoryReader(filename)
+
+    def test_advance(self, reader: TrajectoryReader):
+        """Advancing should move by the speed and pause at the end."""
+        replay = Replay(reader, speed=3)
+        replay.advance()
+        assert replay.frame == 3
+        replay.advance()
+        assert replay.frame == 4
+        assert replay.paused
+
+    def test_reverse(self, reader: TrajectoryReader):
+        """Reversed playback should move backwards and pause at the start."""
+        replay = Replay(reader, speed=2)
+        replay.seek(3)
+        replay.reverse()
+        replay.advance()
+        replay.advance()
+
+        assert replay.position == 0
+        assert replay.paused
+
+    def test_interpolation(self, reader: TrajectoryReader):
+        """Positions and time between two frames should be interpolated."""
+        replay = Replay(reader, speed=0.25)
+        replay.seek(1)
+        replay.advance()
+
+        expected = reader.positions(1) * 0.75 + reader.positions(2) * 0.25
+        np.testing.assert_allclose(replay.positions(), expected)
+        assert replay.time == pytest.approx(125)
+
+    @pytest.mark.parametrize("position, expected", [(-3, 0), (2.5, 2.5), (10, 4)])
+    def test_seek_clamped(self, reader: TrajectoryReader, position: float, expected: float):
+        """Seeking should clamp to the trajectory."""
+        replay = Replay(reader)
+        replay.seek(position)
+
+        assert replay.position == expected
+
+    def test_seek_fraction_and_time(self, reader: TrajectoryReader):
+        """Seeking by fraction and time should move to the matching frame."""
+        replay = Replay(reader)
+        replay.seek_fraction(0.5)
+        assert replay.frame == 2
+        replay.seek_time(350)
+        assert replay.frame == 3
+
+    def test_step_frames(self, reader: TrajectoryReader):
+        """Stepping should move whole frames from the current frame."""
+        replay = Replay(reader)
+        replay.seek(1.5)
+        replay.step_frames(1)
+
+        assert replay.position == 2
+
+    def test_change_speed(self, reader: TrajectoryReader):
+        """Changing speed should multiply the playback speed."""
+        replay = Replay(reader, speed=2)
+        replay.change_speed(1.5)
+
+        assert replay.speed == 3
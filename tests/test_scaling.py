@@ -0,0 +1,116 @@
+import json
+
+import numpy as np
+import pytest
+
+from gravity_sim.benchmarks.scaling import (
+    PhaseResult,
+    benchmark_scaling,
+    compare,
+    generate_scenario,
+    load_results,
+    main,
+    predict_seconds,
+    save_results,
+    scaling_exponent,
+)
+
+
+class TestScalingBenchmark:
+    """Test the scaling benchmark."""
+
+    def test_scenario(self):
+        """The scenario should have the requested number of bodies in circular orbits around the star."""
+        simulation = generate_scenario(50, engine="direct")
+        state = simulation.state
+        radii = np.hypot(state.positions[1:, 0], state.positions[1:, 1])
+        speeds = np.hypot(state.velocities[1:, 0], state.velocities[1:, 1])
+
+        assert len(state) == 50
+        np.testing.assert_allclose(speeds, np.sqrt(6.6743e-11 * state.masses[0] / radii))
+        np.testing.assert_allclose(
+            np.sum(state.positions[1:] * state.velocities[1:], axis=1) / (radii * speeds), 0, atol=1e-12
+        )
+
+    def test_benchmark(self):
+        """Every phase should be timed for each engine and size, without a build phase for direct."""
+        results = benchmark_scaling(("direct", "barnes_hut"), (10, 30), repeats=2)
+        phases = {(result.engine, result.bodies): set() for result in results}
+        for result in results:
+            phases[result.engine, result.bodies].add(result.phase)
+            assert len(result.samples) == 2
+
+        assert phases == {
+            ("direct", 10): {"force", "integrate", "step"},
+            ("direct", 30): {"force", "integrate", "step"},
+            ("barnes_hut", 10): {"build", "force", "integrate", "step"},
+            ("barnes_hut", 30): {"build", "force", "integrate", "step"},
+        }
+
+    def test_skips_slow_sizes(self):
+        """Sizes expected to take longer than the limit should not be run."""
+        results = benchmark_scaling(("direct",), (10, 100), repeats=1, max_seconds=0)
+
+        assert {result.bodies for result in results} == {10}
+
+    def test_predict_and_exponent(self):
+        """Step times should be extrapolated from the two largest sizes, never below linear."""
+        results = [PhaseResult("direct", 1000, "step", [1.0]), PhaseResult("direct", 10000, "step", [100.0])]
+
+        assert scaling_exponent(results, "direct") == pytest.approx(2)
+        assert predict_seconds(results, "direct", 100000) == pytest.approx(10000)
+        assert predict_seconds(results[:1], "direct", 10000) == pytest.approx(10)
+        assert predict_seconds(results, "fmm", 10) is None
+
+    def test_save_and_load(self, tmp_path):
+        """Results should be read back as they were written."""
+        path = tmp_path / "results.json"
+        results = [PhaseResult("fmm", 100, "force", [0.5, 0.25, 1.0])]
+        save_results(results, str(path), repeats=3)
+
+        assert load_results(str(path)) == results
+        assert json.loads(path.read_text())["results"][0]["median"] == 0.5
+
+    def test_compare(self):
+        """Only slowdowns beyond the threshold whose runs do not overlap the baseline's are regressions."""
+        baseline = [
+            PhaseResult("pm", 10, "step", [1.0, 1.1, 1.2]),
+            PhaseResult("pm", 10, "force", [1.0, 1.1, 1.2]),
+            PhaseResult("pm", 10, "integrate", [1.0, 1.1, 1.2]),
+        ]
+        results = [
+            PhaseResult("pm", 10, "step", [1.3, 1.4, 1.5]),
+            PhaseResult("pm", 10, "force", [1.15, 1.5, 1.6]),
+            PhaseResult("pm", 10, "integrate", [0.5, 0.6, 0.7]),
+            PhaseResult("pm", 100, "step", [5.0]),
+        ]
+        comparisons = compare(results, baseline, threshold=0.1)
+
+        assert [comparison.regression for comparison in comparisons] == [True, False, False]
+        assert [comparison.improvement for comparison in comparisons] == [False, False, True]
+
+    def test_main_regression(self, tmp_path, capsys):
+        """The command line should write the results and exit with status 1 when a phase regressed."""
+        baseline = tmp_path / "baseline.json"
+        save_results([PhaseResult("direct", 10, "step", [0.0])], str(baseline), repeats=1)
+        output = tmp_path / "results.json"
+
+        with pytest.raises(SystemExit) as exit_info:
+            main(
+                [
+                    "--engines",
+                    "direct",
+                    "--sizes",
+                    "10",
+                    "--repeats",
+                    "1",
+                    "--output",
+                    str(output),
+                    "--baseline",
+                    str(baseline),
+                ]
+            )
+
+        assert exit_info.value.code == 1
+        assert "Regression: direct step with 10 bodies" in capsys.readouterr().out
+        assert {result.phase for result in load_results(str(output))} == {"force", "integrate", "step"}
@@ -0,0 +1,181 @@
+import time
+
+import numpy as np
+import pytest
+
+from gravity_sim.simulation import Simulation
+from gravity_sim.simulation_worker import SimulationWorker, Snapshot
+
+CONFIG = {
+    "name": "Test",
+    "timestep": 100,
+    "engine": "direct",
+    "objects": [
+        {"name": "A", "mass": 1e24, "position": [0, 0], "velocity": [0, 0]},
+        {"name": "B", "mass": 1e22, "position": [1e8, 0], "velocity": [0, 1000]},
+        {"name": "C", "mass": 1e20, "position": [0, -3e8], "velocity": [500, 0]},
+    ],
+}
+
+
+def wait_for(condition, timeout: float = 5.0) -> None:
+    """Wait until a condition holds, failing the test after a timeout."""
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline, "Timed out waiting for the worker."
+        time.sleep(0.001)
+
+
+class TestSimulationWorker:
+    """Test the SimulationWorker class."""
+
+    def test_initial_snapshot(self):
+        """Before starting, both snapshots should hold the initial state."""
+        simulation = Simulation.from_dict(CONFIG)
+        worker = SimulationWorker(simulation)
+        previous, latest = worker.snapshots()
+
+        assert previous is latest
+        assert latest.step == 0
+        np.testing.assert_array_equal(worker.positions(), simulation.state.positions)
+
+    def test_negative_rate(self):
+        """Negative step rates should be rejected."""
+        with pytest.raises(ValueError):
+            SimulationWorker(Simulation.from_dict(CONFIG), steps_per_second=-1)
+
+    def test_steps_and_publishes(self):
+        """A running worker should step the simulation and publish a snapshot of every step."""
+        simulation = Simulation.from_dict(CONFIG)
+        with SimulationWorker(simulation, steps_per_second=0) as worker:
+            wait_for(lambda: worker.latest.step >= 3)
+        previous, latest = worker.snapshots()
+
+        assert latest.step == simulation.step_count
+        assert previous.step == latest.step - 1
+        np.testing.assert_array_equal(latest.positions, simulation.state.positions)
+        assert latest.positions is not simulation.state.positions
+
+    def test_interpolation(self):
+        """Positions should move from the previous to the latest snapshot over the time between them."""
+        worker = SimulationWorker(Simulation.from_dict(CONFIG))
+        worker.publish(Snapshot(0, 0.0, np.zeros((1, 2)), published=10.0))
+        worker.publish(Snapshot(1, 100.0, np.ones((1, 2)), published=12.0))
+
+        np.testing.assert_array_equal(worker.positions(now=12.0), [[0.0, 0.0]])
+        np.testing.assert_array_equal(worker.positions(now=13.0), [[0.5, 0.5]])
+        np.testing.assert_array_equal(worker.positions(now=20.0), [[1.0, 1.0]])
+
+    def test_pause(self):
+        """A paused worker should stop stepping, and resume without interpolating over the pause."""
+        simulation = Simulation.from_dict(CONFIG)
+        with SimulationWorker(simulation, steps_per_second=0) as worker:
+            wait_for(lambda: worker.latest.step >= 1)
+            worker.set_paused(True)
+            time.sleep(0.01)
+            paused_at = simulation.step_count
+            time.sleep(0.05)
+            assert simulation.step_count == paused_at
+
+            worker.set_paused(False)
+            previous, latest = worker.snapshots()
+            assert latest.step == previous.step == paused_at
+            np.testing.assert_array_equal(worker.positions(), latest.positions)
+            wait_for(lambda: worker.latest.step > paused_at)
+
+    def test_pacing(self):
+        """Steps should be limited to the step rate."""
+        simulation = Simulation.from_dict(CONFIG)
+        with SimulationWorker(simulation, steps_per_second=20):
+            time.sleep(0.3)
+
+        assert 2 <= simulation.step_count <= 8
+
+    def test_submit(self):
+        """Commands should run between steps while running and immediately otherwise."""
+        simulation = Simulation.from_dict(CONFIG)
+        worker = SimulationWorker(simulation)
+        worker.submit(lambda: simulation.set_timestep(50))
+        assert simulation.timestep == 50
+
+        with worker:
+            worker.set_paused(True)
+            worker.submit(lambda: simulation.set_timestep(25))
+            wait_for(lambda: simulation.timestep == 25)
+
+    def test_slow_step(self):
+        """Positions should be available while a slow step is running."""
+        simulation = Simulation.from_dict(CONFIG)
+        step = simulation.step
+
+        def slow_step():
+            time.sleep(0.3)
+            step()
+
+        simulation.step = slow_step
+        with SimulationWorker(simulation) as worker:
+            time.sleep(0.05)
+            start = time.perf_counter()
+            worker.positions()
+            assert time.perf_counter() - start < 0.05
+
+    def test_error(self):
+        """Errors while stepping should be raised by check_error()."""
+        simulation = Simulation.from_dict(CONFIG)
+
+        def failing_step():
+            raise ArithmeticError("Step failed.")
+
+        simulation.step = failing_step
+        with SimulationWorker(simulation) as worker:
+            wait_for(lambda: not worker.running)
+        with pytest.raises(RuntimeError):
+            worker.check_error()
+
+    @pytest.mark.parametrize("engine", ["barnes_hut", "fmm"])
+    def test_capture_tree(self, engine: str):
+        """The squares of the engine's tree should be captured when requested."""
+        simulation = Simulation.from_dict({**CONFIG, "engine": engine})
+        worker = SimulationWorker(simulation)
+        worker.capture_tree = True
+        simulation.step()
+        worker.publish(worker.take_snapshot())
+
+        centers, half_widths = worker.latest.tree
+        assert centers.shape == (len(half_widths), 2)
+        assert len(half_widths) > 0
+
+    def test_spatial_index(self):
+        """Snapshots should keep the engine's LinearQuadTree, padded to find bodies between the snapshots."""
+        simulation = Simulation.from_dict({**CONFIG, "engine": "barnes_hut"})
+        worker = SimulationWorker(simulation)
+        simulation.step()
+        worker.publish(worker.take_snapshot())
+        simulation.step()
+        worker.publish(worker.take_snapshot())
+        latest = worker.latest
+
+        assert latest.index is simulation.last_quadtree
+        for fraction in (0.0, 0.5, 1.0):
+            positions = worker.positions(
+                latest.published + fraction * (latest.published - worker.snapshots()[0].published)
+            )
+            for body, position in enumerate(positions):
+                assert body in latest.index.query_radius(position, 0.0, latest.index_paddings)
+
+    def test_built_spatial_index(self):
+        """Engines without a LinearQuadTree should get one built once for each snapshot."""
+        simulation = Simulation.from_dict(CONFIG)
+        worker = SimulationWorker(simulation)
+        simulation.step()
+        worker.publish(worker.take_snapshot())
+        latest = worker.latest
+
+        assert simulation.last_quadtree is None
+        assert worker.snapshots()[0].index is not latest.index
+        for fraction in (0.0, 0.5, 1.0):
+            positions = worker.positions(
+                latest.published + fraction * (latest.published - worker.snapshots()[0].published)
+            )
+            for body, position in enumerate(positions):
+                assert body in latest.index.query_radius(position, 0.0, latest.index_paddings)
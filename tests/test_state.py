@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from gravity_sim.object import Object
+from gravity_sim.state import BodyState
+from gravity_sim.vector import Vector
+
+
+class TestBodyState:
+    """Test the BodyState class."""
+
+    @pytest.fixture
+    def state(self) -> BodyState:
+        """Fixture to create a state with two bodies."""
+        return BodyState(
+            positions=[[0, 0], [10, -5]],
+            velocities=[[1, 2], [0, 0]],
+            masses=[2, 0],
+        )
+
+    def test_init(self, state: BodyState):
+        """Init should create contiguous float64 arrays and zeroed forces."""
+        assert len(state) == 2
+        for array in (state.positions, state.velocities, state.masses, state.forces):
+            assert array.dtype == np.float64
+            assert array.flags["C_CONTIGUOUS"]
+        assert state.positions.shape == (2, 2)
+        assert not state.forces.any()
+
+    def test_init_mismatched_lengths(self):
+        """Arrays describing different numbers of bodies should raise a ValueError."""
+        with pytest.raises(ValueError):
+            BodyState(positions=[[0, 0]], velocities=[[0, 0], [1, 1]], masses=[1])
+
+    def test_from_objects(self):
+        """A state should be created from the objects' positions, velocities and masses."""
+        objects = [
+            Object("A", 5, position=Vector(1, 2), velocity=Vector(3, 4)),
+            Object("B", 7, position=Vector(-1, -2), velocity=Vector(0, 1)),
+        ]
+        state = BodyState.from_objects(objects)
+
+        assert state.positions.tolist() == [[1, 2], [-1, -2]]
+        assert state.velocities.tolist() == [[3, 4], [0, 1]]
+        assert state.masses.tolist() == [5, 7]
+
+    def test_accelerations_zero_mass(self, state: BodyState):
+        """Bodies with zero mass should have zero acceleration."""
+        state.forces[:] = [[4, 2], [1, 1]]
+
+        assert state.accelerations().tolist() == [[2, 1], [0, 0]]
+
+    def test_step(self, state: BodyState):
+        """Stepping should update velocities before positions."""
+        state.forces[0] = [2, 0]
+        state.step(2)
+
+        assert state.velocities[0].tolist() == [3, 2]
+        assert state.positions[0].tolist() == [6, 4]
+
+    def test_reset_forces(self, state: BodyState):
+        """reset_forces should set every force to zero."""
+        state.forces[:] = 3
+        state.reset_forces()
+
+        assert not state.forces.any()
+
+    def test_bounds(self, state: BodyState):
+        """Bounds should return the minimum and maximum corners of the bodies."""
+        min_corner, max_corner = state.bounds()
+
+        assert min_corner.tolist() == [0, -5]
+        assert max_corner.tolist() == [10, 0]
@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+
+from gravity_sim.checkpoint import Checkpoint
+from gravity_sim.headless import HeadlessRunner
+from gravity_sim.simulation import Simulation
+from gravity_sim.trajectory import TrajectoryReader, TrajectoryWriter
+
+
+class TestTrajectory:
+    """Test the TrajectoryWriter and TrajectoryReader classes."""
+
+    @pytest.fixture
+    def simulation(self) -> Simulation:
+        """Fixture to create a simulation of two bodies."""
+        return Simulation.from_dict(
+            {
+                "name": "Test",
+                "timestep": 100,
+                "objects": [
+                    {"name": "Sun", "mass": 1.989e30, "position": [0, 0], "velocity": [0, 0], "color": [255, 204, 0]},
+                    {
+                        "name": "Earth",
+                        "mass": 5.972e24,
+                        "position": [149_597_870_700, 0],
+                        "velocity": [0, 29_780],
+                        "color": [0, 100, 255],
+                    },
+                ],
+            }
+        )
+
+    def test_round_trip(self, simulation: Simulation, tmp_path):
+        """Frames written should be read back exactly, including after the file grows."""
+        filename = tmp_path / "run.traj"
+        expected = []
+        with TrajectoryWriter(str(filename), simulation, capacity=2) as writer:
+            for _ in range(5):
+                writer.record(simulation)
+                expected.append(simulation.state.positions.copy())
+                simulation.step()
+
+        reader = TrajectoryReader(str(filename))
+        assert len(reader) == 5
+        assert reader.names == ["Sun", "Earth"]
+        assert reader.colors == [(255, 204, 0), (0, 100, 255)]
+        for index, positions in enumerate(expected):
+            np.testing.assert_array_equal(reader.positions(index), positions)
+            assert reader.frame(index)["step"] == index
+        np.testing.assert_array_equal(reader.frame(4)["velocities"], reader.frames["velocities"][4])
+
+    def test_file_trimmed(self, simulation: Simulation, tmp_path):
+        """Unused preallocated frames should be removed on close."""
+        filename = tmp_path / "run.traj"
+        writer = TrajectoryWriter(str(filename), simulation, capacity=100)
+        writer.record(simulation)
+        writer.close()
+
+        assert filename.stat().st_size == writer.data_offset + writer.frame_dtype.itemsize
+
+    def test_find_frame(self, simulation: Simulation, tmp_path):
+        """find_frame should return the last frame at or before a time."""
+        filename = tmp_path / "run.traj"
+        with TrajectoryWriter(str(filename), simulation) as writer:
+            for _ in range(3):
+                writer.record(simulation)
+                simulation.step()
+
+        reader = TrajectoryReader(str(filename))
+        assert reader.find_frame(-1) is None
+        assert reader.find_frame(0) == 0
+        assert reader.find_frame(150) == 1
+        assert reader.find_frame(1e9) == 2
+
+    def test_record_after_close(self, simulation: Simulation, tmp_path):
+        """Recording to a closed writer should raise a RuntimeError."""
+        writer = TrajectoryWriter(str(tmp_path / "run.traj"), simulation)
+        writer.close()
+
+        with pytest.raises(RuntimeError):
+            writer.record(simulation)
+
+    def test_invalid_file(self, tmp_path):
+        """Opening a file that is not a trajectory should raise a ValueError."""
+        filename = tmp_path / "other.traj"
+        filename.write_bytes(b"not a trajectory file at all, just some text" * 4)
+
+        with pytest.raises(ValueError):
+            TrajectoryReader(str(filename))
+
+    def test_headless_recording(self, simulation: Simulation, tmp_path):
+        """A headless run should record the initial state and then every record_every steps."""
+        filename = tmp_path / "run.traj"
+        with TrajectoryWriter(str(filename), simulation) as writer:
+            HeadlessRunner(simulation, recorder=writer, record_every=3).run(steps=7)
+
+        reader = TrajectoryReader(str(filename))
+        assert reader.frames["step"].tolist() == [0, 3, 6]
+
+    def test_append_resumed_run(self, simulation: Simulation, tmp_path):
+        """Resuming should keep the frames from before the checkpoint and record the later ones again."""
+        filename = str(tmp_path / "run.traj")
+        checkpoint = str(tmp_path / "run.ckpt")
+        with TrajectoryWriter(filename, simulation) as writer:
+            runner = HeadlessRunner(simulation, recorder=writer, checkpoint_file=checkpoint, checkpoint_every=4)
+            runner.record()
+            for _ in range(6):
+                runner.advance()
+        # The run stopped at step 6, after its last checkpoint at step 4
+        recorded = np.array(TrajectoryReader(filename).frames[:4])
+
+        resumed = Checkpoint.load(checkpoint)
+        with TrajectoryWriter(filename, resumed, capacity=2, append=True) as writer:
+            HeadlessRunner(resumed, recorder=writer).run(steps=4)
+
+        reader = TrajectoryReader(filename)
+        assert reader.frames["step"].tolist() == list(range(9))
+        np.testing.assert_array_equal(reader.frames[:4], recorded)
+        np.testing.assert_array_equal(reader.positions(8), resumed.state.positions)
+
+    def test_append_different_bodies(self, simulation: Simulation, tmp_path):
+        """Appending to a trajectory of a different number of bodies should raise a ValueError."""
+        filename = str(tmp_path / "run.traj")
+        TrajectoryWriter(filename, simulation).close()
+        other = Simulation.from_dict(
+            {
+                "name": "Other",
+                "timestep": 100,
+                "objects": [{"name": "Sun", "mass": 1.989e30, "position": [0, 0], "velocity": [0, 0]}],
+            }
+        )
+
+        with pytest.raises(ValueError):
+            TrajectoryWriter(filename, other, append=True)